@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import RedirectResponse
 
+from Api.conditional import ConditionalGetMiddleware
 from Api.lifespan import lifespan, lifespan_dev
 from Api.models.ServerInfo import ServerInfo
 from Api.routers import commands, devices, images, scenes, websockets, macros, bluetooth, system
@@ -13,6 +14,8 @@ def app_generator(dev: bool = False):
     else:
         app = FastAPI(lifespan=lifespan)
 
+    app.add_middleware(ConditionalGetMiddleware)
+
     app.mount("/ui", StaticFiles(directory="web", html=True), name="ui")
     app.include_router(commands.router)
     app.include_router(devices.router)
@@ -0,0 +1,109 @@
+import argparse
+import random
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from Api.models import Command, CommandWithRelationships, Device, DeviceWithRelationships, Macro, \
+    MacroWithRelationships, Scene, SceneWithRelationships
+from Api.models.CommandGroupType import CommandGroupType
+from Api.models.CommandType import CommandType
+from Api.models.RemoteButton import RemoteButton
+from Api.models.UserImage import UserImage
+
+# Run with `python -m Api.benchmark` from the repository root. That the list endpoints stay within their query
+# budget is checked by `python -m Api.check_queries`.
+
+LIST_ENDPOINTS = {
+    "GET /commands/": (Command, CommandWithRelationships),
+    "GET /devices/": (Device, DeviceWithRelationships),
+    "GET /macros/": (Macro, MacroWithRelationships),
+    "GET /scenes/": (Scene, SceneWithRelationships),
+}
+
+
+def seed(engine, devices: int, commands_per_device: int, rng: random.Random):
+    """
+    A database like a large install: devices with images, their commands, macros across devices and scenes.
+    """
+    with Session(engine) as session:
+        images = [UserImage(filename=f"image{i}.png", path=f"images/image{i}.png") for i in range(5)]
+        device_rows = [Device(name=f"Device {i}", image=rng.choice(images)) for i in range(devices)]
+        session.add_all(device_rows)
+        command_rows = [
+            Command(
+                name=f"Command {i}",
+                button=rng.choice(list(RemoteButton)),
+                type=CommandType.NETWORK,
+                command_group=CommandGroupType.OTHER,
+                host="http://localhost",
+                device=device
+            )
+            for device in device_rows for i in range(commands_per_device)
+        ]
+        session.add_all(command_rows)
+        session.flush()
+
+        macro_rows = []
+        for i in range(devices // 2):
+            commands = rng.sample(command_rows, 8)
+            macro = Macro(name=f"Macro {i}", command_ids=[command.id for command in commands], delays=[100] * 7)
+            macro.commands = list({command.id: command for command in commands}.values())
+            macro.devices = list({command.device_id: command.device for command in commands}.values())
+            macro_rows.append(macro)
+        session.add_all(macro_rows)
+
+        for i in range(devices // 4):
+            start_macro, stop_macro = rng.sample(macro_rows, 2)
+            session.add(Scene(
+                name=f"Scene {i}",
+                image=rng.choice(images),
+                devices=rng.sample(device_rows, 4),
+                start_macro=start_macro,
+                stop_macro=stop_macro,
+                macros=rng.sample(macro_rows, 2)
+            ))
+        session.commit()
+
+
+def list_endpoint(engine, model, response_model, options) -> tuple[int, float]:
+    """
+    Queries and serializes a list like its endpoint does, returning the number of queries and the time it took.
+    """
+    queries = 0
+
+    def count(*_):
+        nonlocal queries
+        queries += 1
+
+    adapter = TypeAdapter(list[response_model])
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        start = time.perf_counter()
+        with Session(engine) as session:
+            rows = session.exec(select(model).options(*options)).all()
+            adapter.dump_python(adapter.validate_python(rows))
+        return queries, time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("Api.benchmark")
+    parser.add_argument("-d", "--devices", default=40, type=int, help="Devices in the test database.")
+    parser.add_argument("-c", "--commands", default=15, type=int, help="Commands per device.")
+    args = parser.parse_args()
+
+    benchmark_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(benchmark_engine)
+    seed(benchmark_engine, args.devices, args.commands, random.Random(0))
+
+    print(f"List endpoints ({args.devices} devices, {args.devices * args.commands} commands)")
+    for name, (table, response) in LIST_ENDPOINTS.items():
+        lazy_queries, lazy_time = list_endpoint(benchmark_engine, table, response, ())
+        eager_queries, eager_time = list_endpoint(benchmark_engine, table, response, response.load_options())
+        print(f"  {name:<16} lazy {lazy_queries:5d} queries {lazy_time * 1000:8.1f} ms, "
+              f"eager {eager_queries:2d} queries {eager_time * 1000:7.1f} ms")
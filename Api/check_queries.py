@@ -0,0 +1,50 @@
+import argparse
+import random
+import sys
+
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, create_engine
+
+from Api.benchmark import LIST_ENDPOINTS, list_endpoint, seed
+
+# Run with `python -m Api.check_queries` from the repository root. Exits with 1 if a list endpoint takes more queries
+# than the budget, like it would if a relationship it serializes was loaded lazily for every row.
+
+# Most queries a list endpoint may take, no matter how many rows there are. Eager loading only takes more queries
+# every 500 rows, when selectinload splits its IN clause.
+QUERY_BUDGET = 8
+
+
+def count_queries(devices: int, commands_per_device: int) -> dict[str, int]:
+    """
+    Queries each list endpoint takes with its load options on a fresh database of the given size.
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    try:
+        SQLModel.metadata.create_all(engine)
+        seed(engine, devices, commands_per_device, random.Random(0))
+        return {
+            name: list_endpoint(engine, table, response, response.load_options())[0]
+            for name, (table, response) in LIST_ENDPOINTS.items()
+        }
+    finally:
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("Api.check_queries")
+    parser.add_argument("-d", "--devices", default=40, type=int, help="Devices in the test database.")
+    parser.add_argument("-c", "--commands", default=15, type=int, help="Commands per device.")
+    args = parser.parse_args()
+
+    over_budget = []
+    for name, queries in count_queries(args.devices, args.commands).items():
+        print(f"  {name:<16} {queries:2d} queries")
+        if queries > QUERY_BUDGET:
+            over_budget.append(name)
+
+    if over_budget:
+        print(f"Over the budget of {QUERY_BUDGET} queries: {', '.join(over_budget)}")
+        sys.exit(1)
+    print(f"All list endpoints stay within {QUERY_BUDGET} queries ({args.devices} devices, "
+          f"{args.devices * args.commands} commands)")
@@ -0,0 +1,86 @@
+import re
+from collections import OrderedDict
+
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.responses import Response
+
+from DbManager.DbManager import table_versions
+
+# Tables a scene is serialized from, including its devices, macros and their commands
+SCENE_TABLES = ("scene", "device", "macro", "command", "userimage")
+
+# GET routes whose responses only depend on these tables (and the status of the controller, if True)
+CONDITIONAL_ROUTES = [
+    (re.compile(r"/commands/(\d+)?"), ("command", "device", "macro"), False),
+    (re.compile(r"/devices/(\d+)?"), ("device", "command", "scene", "macro", "userimage"), False),
+    (re.compile(r"/macros/(\d+)?"), ("macro", "command", "scene", "device"), False),
+    (re.compile(r"/scenes/(\d+)?"), SCENE_TABLES, False),
+    (re.compile(r"/images/"), ("userimage",), False),
+    (re.compile(r"/system/status"), SCENE_TABLES, True),
+]
+
+# Serialized responses kept at most
+CACHE_SIZE = 128
+
+
+class ConditionalGetMiddleware(BaseHTTPMiddleware):
+    """
+    Strong ETags and If-None-Match for the GET routes in CONDITIONAL_ROUTES.
+
+    The ETag of a response is made of the versions of the tables it depends on, so it is known before the route runs.
+    A request with a matching If-None-Match gets a 304 without touching the database, and the serialized body of the
+    latest response of every URL is kept and sent again as long as the versions didn't change.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        # ETag, body and headers of the latest response by URL, least recently used first
+        self.cache: OrderedDict[str, tuple[str, bytes, dict]] = OrderedDict()
+
+    @staticmethod
+    def etag(request: Request) -> str | None:
+        for pattern, tables, uses_status in CONDITIONAL_ROUTES:
+            if pattern.fullmatch(request.url.path):
+                versions = table_versions.get(*tables)
+                if uses_status:
+                    controller = getattr(request.state, "controller", None)
+                    versions += (controller.status_version if controller is not None else 0,)
+                return f'"{table_versions.epoch}-{"-".join(map(str, versions))}"'
+        return None
+
+    @staticmethod
+    def _if_none_match(request: Request) -> list[str]:
+        # If-None-Match uses the weak comparison
+        return [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        if request.method != "GET":
+            return await call_next(request)
+        etag = self.etag(request)
+        if etag is None:
+            return await call_next(request)
+
+        if etag in self._if_none_match(request):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        url = f"{request.url.path}?{request.url.query}"
+        cached = self.cache.get(url)
+        if cached is not None and cached[0] == etag:
+            self.cache.move_to_end(url)
+            return Response(cached[1], headers=cached[2])
+
+        response = await call_next(request)
+        if response.status_code != 200 or response.headers.get("content-type") != "application/json":
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = dict(response.headers)
+        # Otherwise something was committed while the response was made, and it could be from either version
+        if self.etag(request) == etag:
+            headers["etag"] = etag
+            self.cache[url] = (etag, body, headers)
+            self.cache.move_to_end(url)
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return Response(body, status_code=response.status_code, headers=headers)
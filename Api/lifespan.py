@@ -5,6 +5,8 @@ from fastapi import FastAPI
 from Api import logger
 from DbManager.DbManager import create_db_and_tables, run_migrations
 from RemoteController.RemoteController import RemoteController
+from RfManager.RfManager import IRQ_PIN, LOW_POWER
+from RfManager.RfRemote import RfRemote
 from ZeroconfManager.ZeroconfManager import ZeroconfManager
 
 import json
@@ -17,17 +19,28 @@ async def lifespan(_: FastAPI):
     create_db_and_tables()
     logger.info("Database initialized")
 
-    addresses: list[bytes] | None = None
+    remotes: list[RfRemote] = []
 
     try:
         with open("config/rf_addresses.json", "r") as file:
             address_data = file.read()
 
-        address_strings = json.loads(address_data)
-        addresses = list(map(lambda x: bytes.fromhex(x), address_strings))
+        remotes = RfRemote.from_config(json.loads(address_data))
     except FileNotFoundError:
         logger.warning("File \"rf_addresses.json\" was not found in config folder. Starting without RF addresses...")
 
+    rf_irq_pin: int | None = IRQ_PIN
+    rf_low_power: bool = LOW_POWER
+
+    try:
+        with open("config/rf_listener.json", "r") as file:
+            listener_data = file.read()
+            rf_listener = json.loads(listener_data)
+
+        rf_irq_pin = rf_listener.get("irq_pin", IRQ_PIN)
+        rf_low_power = rf_listener.get("low_power", LOW_POWER)
+    except FileNotFoundError:
+        logger.info("File \"rf_listener.json\" was not found in config folder. Polling the RF receiver without its IRQ pin...")
 
     ha_url: str | None = None
     ha_token: str | None = None
@@ -47,7 +60,13 @@ async def lifespan(_: FastAPI):
             "Couldn't get credentials from \"ha_credentials.json\". Make sure you have both \"url\" and \"token\" set."
         )
 
-    controller = await RemoteController.create(rf_addresses=addresses, ha_url=ha_url, ha_token=ha_token)
+    controller = await RemoteController.create(
+        rf_remotes=remotes,
+        ha_url=ha_url,
+        ha_token=ha_token,
+        rf_irq_pin=rf_irq_pin,
+        rf_low_power=rf_low_power
+    )
     logger.info("Controller initialized")
 
     zeroconf = ZeroconfManager()
@@ -0,0 +1,90 @@
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from sqlmodel import Session, SQLModel, select
+from starlette.responses import JSONResponse, Response
+
+# Most items a single page may contain
+MAX_LIMIT = 500
+
+# Header with the cursor of the next page, missing on the last one
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class ListQuery:
+    """
+    Query parameters shared by all list endpoints.
+
+    Without any of them, a list endpoint returns every item with all its relationships, like it always did. With
+    limit, it returns one page ordered by id, and the cursor for the next page in the X-Next-Cursor header. With
+    fields, it only returns these columns (and the id) of every item, without any relationships.
+    """
+
+    def __init__(
+            self,
+            limit: Annotated[int | None, Query(ge=1, le=MAX_LIMIT, description="Items per page, all if omitted")] = None,
+            cursor: Annotated[int | None, Query(description="Cursor of the page, from the X-Next-Cursor header")] = None,
+            fields: Annotated[str | None, Query(description="Comma separated columns to include, e.g. name,type")] = None
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+    @staticmethod
+    def columns(model: type[SQLModel]) -> dict[str, object]:
+        """
+        Columns of a table that can be requested with fields, those excluded from the API (like raw IR codes) aren't.
+        """
+        return {
+            name: column for name, column in model.__table__.columns.items()
+            if name in model.model_fields and not model.model_fields[name].exclude
+        }
+
+    def exec(self, session: Session, model: type[SQLModel], filters: list = (), load_options=(),
+             response: Response | None = None):
+        """
+        Selects the items of a list endpoint matching all filters. Returns them, or a JSONResponse with the requested
+        fields.
+        """
+        filters = list(filters)
+        if self.cursor is not None:
+            filters.append(model.id > self.cursor)
+
+        if self.fields is None:
+            statement = self._paginate(select(model).where(*filters), model)
+            items = session.exec(statement.options(*load_options)).all()
+            items, next_cursor = self._page(items, lambda item: item.id)
+            if response is not None and next_cursor is not None:
+                response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+            return items
+
+        columns = self.columns(model)
+        unknown = [field for field in self.fields if field not in columns]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields {', '.join(unknown)}, available are {', '.join(columns)}."
+            )
+        names = ["id", *[field for field in dict.fromkeys(self.fields) if field != "id"]]
+        statement = self._paginate(select(*[columns[name] for name in names]).where(*filters), model)
+        rows = session.exec(statement).all()
+        rows, next_cursor = self._page(rows, lambda row: row[0])
+
+        headers = {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else None
+        return JSONResponse(jsonable_encoder([dict(zip(names, row)) for row in rows]), headers=headers)
+
+    def _paginate(self, statement, model: type[SQLModel]):
+        if self.limit is None:
+            return statement
+        # One more than requested tells whether there is another page
+        return statement.order_by(model.id).limit(self.limit + 1)
+
+    def _page(self, items: list, get_id) -> tuple[list, int | None]:
+        if self.limit is None or len(items) <= self.limit:
+            return items, None
+        items = items[:self.limit]
+        return items, get_id(items[-1])
+
+
+ListQueryDep = Annotated[ListQuery, Depends()]
@@ -1,16 +1,20 @@
 from typing import TYPE_CHECKING, Optional, Annotated, Dict
 
-from sqlalchemy import Column, JSON, event
+from sqlalchemy import Column, JSON, LargeBinary, event
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import SQLModel, Field, Relationship, Session
 
 from Api import logger
 from Api.models.CommandGroupType import CommandGroupType
 from Api.models.CommandType import CommandType
 from Api.models.IntegrationAction import IntegrationAction
+from Api.models.IrProtocol import IrProtocol
 from Api.models.Macro import CommandMacroLink
 from Api.models.NetworkRequestType import NetworkRequestType
 from Api.models.RemoteButton import RemoteButton
 from DbManager.DbManager import engine
+from IrManager.IrCompiler import compile_code, FREQ
+from IrManager.IrProtocols import compile_protocol
 
 if TYPE_CHECKING:
     from Api.models.Device import Device
@@ -18,9 +22,9 @@ if TYPE_CHECKING:
 
 class CommandBase(SQLModel):
     name: str
-    button: RemoteButton
-    type: CommandType
-    command_group: CommandGroupType
+    button: RemoteButton = Field(index=True)
+    type: CommandType = Field(index=True)
+    command_group: CommandGroupType = Field(index=True)
     device_id: int | None = Field(default=None)
     host: str | None = Field(default=None)
     method: NetworkRequestType | None = Field(default=None)
@@ -30,12 +34,26 @@ class CommandBase(SQLModel):
     bt_media_action: str | None = Field(default=None)
     integration_action: IntegrationAction | None = Field(default=None)
     integration_entity: str | None = Field(default=None)
+    # Pause between repeats of an IR command while its button is held, in ms
+    ir_repeat_gap: int | None = Field(default=None)
+
+class CommandPost(CommandBase):
+    # IR commands can be given by protocol, address and command, recorded ones are created via WebSocket instead
+    ir_protocol: IrProtocol | None = Field(default=None)
+    ir_address: int | None = Field(default=None)
+    ir_command: int | None = Field(default=None)
 
 class Command(CommandBase, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    device_id: int | None = Field(default=None, foreign_key="device.id")
+    device_id: int | None = Field(default=None, foreign_key="device.id", index=True)
     device: "Device" = Relationship(back_populates="commands")
     ir_action:  Annotated[list[int], Field(default=[], sa_column=Column(JSON), exclude=True)]
+    # Recognized IR codes are stored as protocol, address and command instead of ir_action
+    ir_protocol: IrProtocol | None = Field(default=None, exclude=True)
+    ir_address: int | None = Field(default=None, exclude=True)
+    ir_command: int | None = Field(default=None, exclude=True)
+    # ir_action or ir_protocol compiled by IrManager.IrCompiler, kept in sync by update_ir_compiled
+    ir_compiled: Annotated[bytes | None, Field(default=None, sa_column=Column(LargeBinary), exclude=True)]
     bt_action: str | None = Field(default=None)
     bt_media_action: str | None = Field(default=None)
     host: str | None = Field(default=None)
@@ -55,8 +73,24 @@ class CommandWithRelationships(CommandBase):
     device: Optional["Device"] = None
     macros: list["Macro"] = []
 
+    @staticmethod
+    def load_options():
+        # Loads everything serialized up front, instead of one query per command and relationship
+        return joinedload(Command.device), selectinload(Command.macros)
+
 
 
+@event.listens_for(Command, "before_insert")
+@event.listens_for(Command, "before_update")
+def update_ir_compiled(mapper, connection, command: Command):
+    command.ir_compiled = None
+    if command.ir_protocol is not None:
+        command.ir_compiled = compile_protocol(command.ir_protocol, command.ir_address, command.ir_command).to_bytes()
+    elif command.ir_action:
+        try:
+            command.ir_compiled = compile_code(command.ir_action, FREQ).to_bytes()
+        except ValueError as e:
+            logger.warning(f"Couldn't compile IR action of command {command.name}: {e}")
 
 @event.listens_for(Session, "deleted_to_detached")
 def after_delete_command(emitting_session, instance):
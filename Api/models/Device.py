@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING
 
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import SQLModel, Field, Relationship
 
 from Api.models.Macro import Macro
@@ -34,4 +35,14 @@ class DeviceWithRelationships(DeviceBase):
     commands: list["Command"]
     scenes: list[Scene] = []
     image: UserImage | None = None
-    macros: list[Macro] = []
\ No newline at end of file
+    macros: list[Macro] = []
+
+    @staticmethod
+    def load_options():
+        # Loads everything serialized up front, instead of one query per device and relationship
+        return (
+            selectinload(Device.commands),
+            selectinload(Device.scenes),
+            joinedload(Device.image),
+            selectinload(Device.macros)
+        )
\ No newline at end of file
@@ -0,0 +1,11 @@
+from enum import Enum
+
+class IrProtocol(str, Enum):
+    NEC = "nec"
+    NEC_EXTENDED = "nec_extended"
+    SAMSUNG = "samsung"
+    SONY12 = "sony12"
+    SONY15 = "sony15"
+    SONY20 = "sony20"
+    RC5 = "rc5"
+    RC6 = "rc6"
@@ -1,6 +1,7 @@
 from typing import TYPE_CHECKING
 
 from sqlalchemy import Column, JSON
+from sqlalchemy.orm import selectinload
 from sqlmodel import SQLModel, Field, Relationship
 
 if TYPE_CHECKING:
@@ -18,7 +19,7 @@ class SceneMacroLink(SQLModel, table=True):
 
 class DeviceMacroLink(SQLModel, table=True):
     device_id: int | None = Field(default=None, foreign_key="macro.id", primary_key=True)
-    macro_id: int | None = Field(default=None, foreign_key="device.id", primary_key=True)
+    macro_id: int | None = Field(default=None, foreign_key="device.id", primary_key=True, index=True)
 
 class MacroBase(SQLModel):
     name: str | None = Field(default=None)
@@ -26,6 +27,8 @@ class MacroBase(SQLModel):
 class MacroPost(MacroBase):
     command_ids: list[int] = Field(default=[])
     delays: list[int] = Field(default=[])
+    # Consecutive commands with the same group are sent at the same time, empty to send one after another
+    groups: list[int] = Field(default=[])
     scene_ids: list[int] = Field(default=[])
 
 class Macro(MacroBase, table=True):
@@ -33,6 +36,7 @@ class Macro(MacroBase, table=True):
     commands: list["Command"] = Relationship(back_populates="macros", link_model=CommandMacroLink)
     command_ids: list[int] = Field(default=[], sa_column=Column(JSON))
     delays: list[int] = Field(default=[], sa_column=Column(JSON))
+    groups: list[int] | None = Field(default=[], sa_column=Column(JSON))
     scenes_start: list["Scene"] = Relationship(
         back_populates="start_macro",
         sa_relationship_kwargs={"foreign_keys": "Scene.start_macro_id"}
@@ -53,11 +57,18 @@ class MacroWithCommands(MacroBase):
     commands: list["Command"] = []
     command_ids: list[int] = []
     delays: list[int] = []
+    groups: list[int] | None = []
 
 class MacroWithRelationships(MacroBase):
     id: int | None
     commands: list["Command"] = []
     command_ids: list[int] = []
     delays: list[int] = []
+    groups: list[int] | None = []
     scenes: list["Scene"] = []
-    devices: list["Device"] = []
\ No newline at end of file
+    devices: list["Device"] = []
+
+    @staticmethod
+    def load_options():
+        # Loads everything serialized up front, instead of one query per macro and relationship
+        return selectinload(Macro.commands), selectinload(Macro.scenes), selectinload(Macro.devices)
\ No newline at end of file
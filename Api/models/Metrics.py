@@ -0,0 +1,58 @@
+from sqlmodel import SQLModel, Field
+
+
+class LatencySummary(SQLModel):
+    count: int = 0
+    mean_ms: float | None = None
+    p50_ms: float | None = None
+    p95_ms: float | None = None
+    max_ms: float | None = None
+
+class IrMetrics(SQLModel):
+    queue_latency: LatencySummary = Field(default=LatencySummary())
+    frames_sent: int = 0
+    chains_sent: int = 0
+    wave_cache_hits: int = 0
+    wave_cache_misses: int = 0
+    cached_waves: int = 0
+
+class RfMetrics(SQLModel):
+    # From the IRQ of a payload to its button press reaching the event loop, only measured with the IRQ pin
+    press_latency: LatencySummary = Field(default=LatencySummary())
+    # From the listener reading a payload to its button press reaching the event loop
+    dispatch_latency: LatencySummary = Field(default=LatencySummary())
+    payloads_received: int = 0
+    wakeups: int = 0
+    # Listener wakeups during the last minute and whether it is in its low power profile (needs the IRQ pin)
+    wakeups_per_minute: int = 0
+    asleep: bool = False
+    irq: bool = False
+    # Events dropped by RemoteController.EventShaper
+    repeats_coalesced: int = 0
+    presses_debounced: int = 0
+
+class QueueLaneMetrics(SQLModel):
+    # Tasks queued but not started yet
+    depth: int = 0
+    running: int = 0
+    completed: int = 0
+    cancelled: int = 0
+    # From being queued to starting
+    wait_time: LatencySummary = Field(default=LatencySummary())
+
+class CacheMetrics(SQLModel):
+    hits: int = 0
+    misses: int = 0
+    # Entries currently cached
+    commands: int = 0
+    devices: int = 0
+    macros: int = 0
+    scenes: int = 0
+    plans: int = 0
+
+class SystemMetrics(SQLModel):
+    ir: IrMetrics | None = Field(default=None)
+    rf: RfMetrics | None = Field(default=None)
+    # By lane
+    queue: dict[str, QueueLaneMetrics] | None = Field(default=None)
+    cache: CacheMetrics | None = Field(default=None)
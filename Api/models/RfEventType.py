@@ -0,0 +1,9 @@
+from enum import Enum
+
+
+class RfEventType(str, Enum):
+    PRESS = "press"
+    REPEAT = "repeat"
+    RELEASE = "release"
+    SLEEP = "sleep"
+    WAKE = "wake"
@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING, Optional
 
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import SQLModel, Field, Relationship
 
 from Api.models.UserImage import UserImage
@@ -12,7 +13,7 @@ if TYPE_CHECKING:
 
 class SceneDeviceLink(SQLModel, table=True):
     scene_id: int | None = Field(default=None, foreign_key="device.id", primary_key=True)
-    device_id: int | None = Field(default=None, foreign_key="scene.id", primary_key=True)
+    device_id: int | None = Field(default=None, foreign_key="scene.id", primary_key=True, index=True)
 
 class SceneBase(SQLModel):
     name: str | None = Field(index=True)
@@ -57,6 +58,17 @@ class SceneWithRelationships(SceneBase):
     bluetooth_address: str | None = None
     keymap: str | None = None
 
+    @staticmethod
+    def load_options():
+        # Loads everything serialized up front, instead of one query per scene and relationship
+        return (
+            selectinload(Scene.devices),
+            joinedload(Scene.image),
+            joinedload(Scene.start_macro).selectinload(Macro.commands),
+            joinedload(Scene.stop_macro).selectinload(Macro.commands),
+            selectinload(Scene.macros).selectinload(Macro.commands)
+        )
+
 class SceneWithRelationshipsAndFullDevices(SceneBase):
     id: int | None
     devices: list["DeviceWithRelationships"] = []
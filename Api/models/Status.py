@@ -31,7 +31,14 @@ class DeviceStates(SQLModel):
 
         self.states[device_id] = current_state
 
+class RemoteStatus(SQLModel):
+    current_scene: SceneWithRelationships | None = Field(default=None)
+    scene_status: SceneStatus | None = Field(default=None)
+
 class StatusReport(SQLModel):
+    # Scene that changed last on any remote
     current_scene: SceneWithRelationships | None = Field(default=None)
     scene_status: SceneStatus | None = Field(default=None)
+    # Scene of every remote, by remote name
+    remotes: dict[str, RemoteStatus] = Field(default={})
     devices: DeviceStates = Field(default=DeviceStates())
\ No newline at end of file
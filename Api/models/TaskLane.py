@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class TaskLane(str, Enum):
+    RELEASE = "release"
+    INTERACTIVE = "interactive"
+    SCENE = "scene"
+    BACKGROUND = "background"
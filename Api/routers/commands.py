@@ -1,12 +1,17 @@
 from fastapi import APIRouter, HTTPException
-from sqlmodel import select
 from starlette.requests import Request
+from starlette.responses import Response
 
-from Api.models.Command import Command, CommandBase, CommandWithRelationships
+from Api.listing import ListQueryDep
+
+from Api.models.Command import Command, CommandPost, CommandWithRelationships
+from Api.models.CommandGroupType import CommandGroupType
 from Api.models.Device import Device
 from Api.models.CommandType import CommandType
 from Api.models.IntegrationAction import IntegrationAction
+from Api.models.RemoteButton import RemoteButton
 from DbManager.DbManager import SessionDep
+from IrManager.IrProtocols import validate
 
 router = APIRouter(
     prefix="/commands",
@@ -15,10 +20,15 @@ router = APIRouter(
 )
 
 @router.post("/", tags=["Commands"], response_model=CommandWithRelationships)
-def create_command(command: CommandBase, session: SessionDep) -> CommandWithRelationships:
+def create_command(command: CommandPost, session: SessionDep) -> CommandWithRelationships:
     db_command = Command.model_validate(command)
-    if db_command.type == CommandType.IR and not db_command.ir_action:
-        raise HTTPException(status_code=400, detail="IR commands can only be created via WebSocket. Please use the /ws/commands endpoint.")
+    if db_command.type == CommandType.IR and db_command.ir_protocol is None:
+        raise HTTPException(status_code=400, detail="IR commands can only be created via WebSocket (or by protocol, address and command). Please use the /ws/commands endpoint.")
+    elif db_command.type == CommandType.IR:
+        try:
+            validate(db_command.ir_protocol, db_command.ir_address, db_command.ir_command)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     elif db_command.type == CommandType.NETWORK and not db_command.host:
         raise HTTPException(status_code=400, detail="Network commands require a host to be set.")
     elif db_command.type == CommandType.NETWORK and not db_command.method:
@@ -42,9 +52,25 @@ def create_command(command: CommandBase, session: SessionDep) -> CommandWithRela
     return db_command
 
 @router.get("/", tags=["Commands"], response_model=list[CommandWithRelationships])
-def list_commands(session: SessionDep) -> list[CommandWithRelationships]:
-    commands = session.exec(select(Command)).all()
-    return commands
+def list_commands(
+        session: SessionDep,
+        query: ListQueryDep,
+        response: Response,
+        device_id: int | None = None,
+        type: CommandType | None = None,
+        button: RemoteButton | None = None,
+        command_group: CommandGroupType | None = None
+) -> list[CommandWithRelationships]:
+    filters = []
+    if device_id is not None:
+        filters.append(Command.device_id == device_id)
+    if type is not None:
+        filters.append(Command.type == type)
+    if button is not None:
+        filters.append(Command.button == button)
+    if command_group is not None:
+        filters.append(Command.command_group == command_group)
+    return query.exec(session, Command, filters, CommandWithRelationships.load_options(), response)
 
 @router.get("/{command_id}", tags=["Commands"], response_model=CommandWithRelationships)
 def show_command(command_id: int, session: SessionDep) -> CommandWithRelationships:
@@ -1,7 +1,10 @@
 from fastapi import APIRouter, HTTPException
-from sqlmodel import select
+from starlette.responses import Response
 
-from Api.models.Device import DeviceWithRelationships, DevicePost, Device, DeviceBase
+from Api.listing import ListQueryDep
+
+from Api.models.Device import DeviceWithRelationships, DevicePost, Device
+from Api.models.DeviceType import DeviceType
 from Api.models.UserImage import UserImage
 from DbManager.DbManager import SessionDep
 
@@ -12,9 +15,10 @@ router = APIRouter(
 )
 
 @router.get("/", tags=["Devices"], response_model=list[DeviceWithRelationships])
-def list_devices(session: SessionDep) -> list[Device]:
-    devices = session.exec(select(Device)).all()
-    return devices
+def list_devices(session: SessionDep, query: ListQueryDep, response: Response,
+                 type: DeviceType | None = None) -> list[Device]:
+    filters = [Device.type == type] if type is not None else []
+    return query.exec(session, Device, filters, DeviceWithRelationships.load_options(), response)
 
 
 @router.get("/{device_id}", tags=["Devices"], response_model=DeviceWithRelationships)
@@ -1,8 +1,9 @@
 from starlette.requests import Request
+from starlette.responses import Response
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import select
 
+from Api.listing import ListQueryDep
 from Api.models import Command, Scene, Device
 from Api.models.Macro import Macro, MacroPost, MacroWithRelationships
 from DbManager.DbManager import SessionDep
@@ -15,9 +16,9 @@ router = APIRouter(
 )
 
 @router.get("/", tags=["Macros"], response_model=list[MacroWithRelationships])
-def list_macros(session: SessionDep):
-    macros = session.exec(select(Macro)).all()
-    return macros
+def list_macros(session: SessionDep, query: ListQueryDep, response: Response, device_id: int | None = None):
+    filters = [Macro.devices.any(Device.id == device_id)] if device_id is not None else []
+    return query.exec(session, Macro, filters, MacroWithRelationships.load_options(), response)
 
 @router.get("/{macro_id}", tags=["Macros"], response_model=MacroWithRelationships)
 def get_macro(macro_id: int, session: SessionDep) -> MacroWithRelationships:
@@ -36,6 +37,9 @@ def create_macro(macro: MacroPost, session: SessionDep):
     if (len(macro.command_ids) != (len(macro.delays) + 1)) and len(macro.command_ids) > 0:
         raise HTTPException(status_code=400, detail="You have to include one delay for all but the last command (len(command_ids) == len(delays)+1).")
 
+    if len(macro.groups) > 0 and len(macro.groups) != len(macro.command_ids):
+        raise HTTPException(status_code=400, detail="You have to include a group for every command or none at all (len(command_ids) == len(groups)).")
+
     session.add(db_macro)
 
     device_ids: [int] = []
@@ -63,6 +67,7 @@ def create_macro(macro: MacroPost, session: SessionDep):
         db_macro.devices.append(device_db)
 
     db_macro.delays = macro.delays
+    db_macro.groups = macro.groups
     db_macro.command_ids = macro.command_ids
     session.commit()
     session.refresh(db_macro)
@@ -80,6 +85,9 @@ def update_macro(macro_id: int, macro: MacroPost, session: SessionDep) -> MacroW
     if (len(macro.command_ids) != (len(macro.delays) + 1)) and len(macro.command_ids) > 0:
         raise HTTPException(status_code=400, detail="You have to include one delay for all but the last command (len(command_ids) == len(delays)+1).")
 
+    if len(macro.groups) > 0 and len(macro.groups) != len(macro.command_ids):
+        raise HTTPException(status_code=400, detail="You have to include a group for every command or none at all (len(command_ids) == len(groups)).")
+
     macro_db.commands = []
 
     device_ids: [int] = []
@@ -109,6 +117,7 @@ def update_macro(macro_id: int, macro: MacroPost, session: SessionDep) -> MacroW
         macro_db.devices.append(device_db)
 
     macro_db.delays = macro.delays
+    macro_db.groups = macro.groups
 
     macro_data = macro.model_dump(exclude_unset=True)
     macro_db.sqlmodel_update(macro_data)
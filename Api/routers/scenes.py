@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from sqlmodel import select
 from starlette.requests import Request
+from starlette.responses import Response
 
+from Api.listing import ListQueryDep
 from Api.models import Macro
 from Api.models.Device import Device
 from Api.models.Scene import SceneWithRelationships, ScenePost, Scene, SceneWithRelationshipsAndFullDevices
@@ -72,9 +74,10 @@ def create_scene(scene: ScenePost, session: SessionDep) -> Scene:
 
 
 @router.get("/", tags=["Scenes"], response_model=list[SceneWithRelationships])
-def list_scenes(session: SessionDep) -> list[Scene]:
-    scenes = session.exec(select(Scene)).all()
-    return scenes
+def list_scenes(session: SessionDep, query: ListQueryDep, response: Response,
+                device_id: int | None = None) -> list[Scene]:
+    filters = [Scene.devices.any(Device.id == device_id)] if device_id is not None else []
+    return query.exec(session, Scene, filters, SceneWithRelationships.load_options(), response)
 
 
 @router.patch("/{scene_id}", tags=["Scenes"])
@@ -159,20 +162,20 @@ def get_scene(scene_id: int, session: SessionDep) -> Scene:
     return scene
 
 
-@router.post("/{scene_id}/start", tags=["Scenes"])
-async def start_scene(scene_id: int, request: Request):
+@router.post("/{scene_id}/start", tags=["Scenes"], description="Starts the scene for the given remote, or for all remotes if none is given.")
+async def start_scene(scene_id: int, request: Request, remote: str | None = None):
     controller: RemoteController = request.state.controller
 
-    await controller.start_scene(scene_id)
+    await controller.start_scene(scene_id, remote)
 
     return f"Started scene {scene_id}"
 
 
-@router.post("/{scene_id}/set_current", tags=["Scenes"], description="Sets the given scene as current scene **without** executing its start macro.")
-async def set_current_scene(scene_id: int, request: Request):
+@router.post("/{scene_id}/set_current", tags=["Scenes"], description="Sets the given scene as current scene of the given remote (or all remotes) **without** executing its start macro.")
+async def set_current_scene(scene_id: int, request: Request, remote: str | None = None):
     controller: RemoteController = request.state.controller
 
-    await controller.set_current_scene(scene_id)
+    await controller.set_current_scene(scene_id, remote)
     return f"Set scene {scene_id} as current scene."
 
 @router.get("/{scene_id}/keymap_suggestions", tags=["Scenes"], description="Generates a suggested keymap based on the associated devices and remote.")
@@ -186,9 +189,9 @@ async def suggest_keymap(scene_id: int, session: SessionDep, request: Request):
 
     return controller.suggest_keymap(scene)
 
-@router.post("/stop", tags=["Scenes"])
-async def stop_current_scene(request: Request):
+@router.post("/stop", tags=["Scenes"], description="Stops the scene of the given remote, or those of all remotes if none is given.")
+async def stop_current_scene(request: Request, remote: str | None = None):
     controller: RemoteController = request.state.controller
 
-    await controller.stop_current_scene()
+    await controller.stop_current_scene(remote=remote)
     return "Stopped current scene."
\ No newline at end of file
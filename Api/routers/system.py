@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from starlette.requests import Request
 
+from Api.models.Metrics import SystemMetrics
 from Api.models.Status import StatusReport
 from RemoteController.RemoteController import RemoteController
 
@@ -14,4 +15,10 @@ router = APIRouter(
 def get_current_system_status(request: Request) -> StatusReport:
     controller: RemoteController = request.state.controller
 
-    return controller.get_current_status()
\ No newline at end of file
+    return controller.get_current_status()
+
+@router.get("/metrics", tags=["System"], response_model=SystemMetrics, description="Latency and throughput counters of the hardware managers.")
+def get_system_metrics(request: Request) -> SystemMetrics:
+    controller: RemoteController = request.state.controller
+
+    return controller.get_metrics()
\ No newline at end of file
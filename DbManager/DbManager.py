@@ -3,16 +3,21 @@ import subprocess
 from typing import Annotated
 
 from fastapi import Depends
-from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel import Session, SQLModel
 from pathlib import Path
 
+from DbManager.StorageProfile import StorageProfile
+from DbManager.TableVersions import TableVersions
+
 Path("config").mkdir(parents=True, exist_ok=True)
 
 sqlite_file_name = "./config/database.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 
-connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args)
+storage_profile = StorageProfile.load()
+engine = storage_profile.create_engine(sqlite_url)
+
+table_versions = TableVersions()
 
 
 # from https://github.com/sqlalchemy/alembic/discussions/1483
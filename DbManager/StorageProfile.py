@@ -0,0 +1,113 @@
+import json
+import logging
+
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlmodel import create_engine
+
+# Settings of the named profiles, each of them can be overridden in config/database.json
+PROFILES = {
+    # SQLite's defaults: every commit is synced to storage before it returns
+    "durable": {
+        "journal_mode": "delete",
+        "synchronous": "full",
+        "mmap_size": 0,
+        "cache_size": -2000,
+        "busy_timeout": 5000,
+    },
+    # Commits are appended to the write-ahead log and only synced at checkpoints, which saves most of the fsyncs that
+    # are slow on SD cards. A power loss may undo the latest commits, but never corrupts the database.
+    "sd_card": {
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -8000,
+        "busy_timeout": 5000,
+    },
+}
+
+DEFAULT_PROFILE = "sd_card"
+
+# Connections kept open, and how many more may be opened when all of them are in use
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+
+
+class StorageProfile:
+    """
+    SQLite settings applied to every connection of an engine, and the pool it keeps its connections in.
+
+    mmap_size is in bytes, cache_size in pages if positive and in KiB if negative (like the pragmas) and
+    busy_timeout in ms.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(
+            self,
+            profile: str = DEFAULT_PROFILE,
+            pool_size: int = POOL_SIZE,
+            max_overflow: int = MAX_OVERFLOW,
+            pool_pre_ping: bool = True,
+            **overrides
+    ):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown storage profile {profile}, available are {', '.join(PROFILES)}")
+        unknown = overrides.keys() - PROFILES[profile].keys()
+        if unknown:
+            raise ValueError(f"Unknown storage settings {', '.join(unknown)}")
+        settings = PROFILES[profile] | overrides
+
+        self.profile = profile
+        self.journal_mode: str = settings["journal_mode"]
+        self.synchronous: str = settings["synchronous"]
+        self.mmap_size: int = settings["mmap_size"]
+        self.cache_size: int = settings["cache_size"]
+        self.busy_timeout: int = settings["busy_timeout"]
+
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_pre_ping = pool_pre_ping
+
+    @classmethod
+    def load(cls, path: str = "config/database.json") -> "StorageProfile":
+        try:
+            with open(path, "r") as file:
+                config = json.loads(file.read())
+            return cls(**config)
+        except FileNotFoundError:
+            cls.logger.debug(f"\"{path}\" not found, using storage profile {DEFAULT_PROFILE}")
+            return cls()
+
+    def pragmas(self) -> list[str]:
+        return [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA mmap_size={int(self.mmap_size)}",
+            f"PRAGMA cache_size={int(self.cache_size)}",
+            f"PRAGMA busy_timeout={int(self.busy_timeout)}",
+        ]
+
+    def _on_connect(self, dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for pragma in self.pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+
+    def create_engine(self, url: str) -> Engine:
+        connect_args = {"check_same_thread": False}
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            # Every connection to an in-memory database would get a database of its own
+            engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+        else:
+            engine = create_engine(
+                url,
+                connect_args=connect_args,
+                poolclass=QueuePool,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_pre_ping=self.pool_pre_ping
+            )
+        event.listen(engine, "connect", self._on_connect)
+        self.logger.debug(f"Using storage profile {self.profile} ({'; '.join(self.pragmas())}) for {url}")
+        return engine
@@ -0,0 +1,50 @@
+import threading
+from uuid import uuid4
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+
+class TableVersions:
+    """
+    Version of every table, incremented by every commit that added, changed or deleted any of its rows.
+
+    Versions only change when something was committed, so anything derived from the contents of some tables (like
+    a serialized response) is still valid as long as their versions are the same.
+    """
+
+    def __init__(self):
+        self.versions: dict[str, int] = {}
+        # Distinguishes versions of different runs, as all of them start at 0
+        self.epoch = uuid4().hex[:8]
+        # Commits happen on the threads of the routers
+        self.lock = threading.Lock()
+
+        event.listen(Session, "after_flush", self._after_flush)
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_rollback", self._after_rollback)
+
+    def get(self, *tables: str) -> tuple[int, ...]:
+        return tuple(self.versions.get(table, 0) for table in tables)
+
+    def bump(self, tables: set[str]):
+        with self.lock:
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+
+    @staticmethod
+    def _after_flush(session: Session, _):
+        tables = session.info.setdefault("changed_tables", set())
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            table = getattr(instance, "__table__", None)
+            if table is not None:
+                tables.add(table.name)
+
+    def _after_commit(self, session: Session):
+        tables = session.info.pop("changed_tables", None)
+        if tables:
+            self.bump(tables)
+
+    @staticmethod
+    def _after_rollback(session: Session):
+        session.info.pop("changed_tables", None)
@@ -0,0 +1,128 @@
+import argparse
+import random
+import threading
+import time
+from pathlib import Path
+
+from sqlmodel import Session, SQLModel, select
+
+from Api.models import Command, Device
+from Api.models.CommandGroupType import CommandGroupType
+from Api.models.CommandType import CommandType
+from Api.models.RemoteButton import RemoteButton
+from DbManager.StorageProfile import PROFILES, StorageProfile
+from Metrics.LatencyStats import LatencyStats
+
+# Run with `python -m DbManager.benchmark` from the repository root, on the storage the database is kept on.
+
+# A recorded NEC code, like an IR command stored after learning it
+RECORDED_CODE = [9000, 4500] + [560, 560, 560, 1690] * 16 + [560]
+
+DEVICES = 10
+
+
+def database_files(path: Path, profile: str) -> list[Path]:
+    database = path / f"benchmark_{profile}.db"
+    return [database, database.with_name(database.name + "-wal"), database.with_name(database.name + "-shm")]
+
+
+def record(engine, index: int, rng: random.Random) -> float:
+    """
+    Stores a command like recording an IR code does, returning the time the commit took.
+    """
+    with Session(engine) as session:
+        session.add(Command(
+            name=f"Recorded {index}",
+            button=rng.choice(list(RemoteButton)),
+            type=CommandType.IR,
+            command_group=CommandGroupType.OTHER,
+            device_id=rng.randrange(DEVICES) + 1,
+            ir_action=RECORDED_CODE
+        ))
+        start = time.perf_counter()
+        session.commit()
+        return time.perf_counter() - start
+
+
+def read(engine, rng: random.Random, commands: int):
+    """
+    Reads like the routers do, a single command and the commands of a device.
+    """
+    with Session(engine) as session:
+        session.get(Command, rng.randrange(commands) + 1)
+        session.exec(select(Command).where(Command.device_id == rng.randrange(DEVICES) + 1)).all()
+
+
+def bench_profile(profile: StorageProfile, path: Path, writes: int, reads: int):
+    files = database_files(path, profile.profile)
+    for file in files:
+        file.unlink(missing_ok=True)
+
+    engine = profile.create_engine(f"sqlite:///{files[0]}")
+    try:
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add_all([Device(name=f"Device {i}") for i in range(DEVICES)])
+            session.commit()
+        rng = random.Random(0)
+
+        commits = LatencyStats(writes)
+        start = time.perf_counter()
+        for index in range(writes):
+            commits.add(record(engine, index, rng))
+        write_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(reads):
+            read(engine, rng, writes)
+        read_time = time.perf_counter() - start
+
+        # Routers reading while commands are recorded
+        read_latency = LatencyStats(reads)
+        done = threading.Event()
+
+        def writer():
+            writer_rng = random.Random(1)
+            index = writes
+            while not done.is_set():
+                record(engine, index, writer_rng)
+                index += 1
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            for _ in range(reads):
+                start = time.perf_counter()
+                read(engine, rng, writes)
+                read_latency.add(time.perf_counter() - start)
+        finally:
+            done.set()
+            thread.join()
+    finally:
+        engine.dispose()
+        for file in files:
+            file.unlink(missing_ok=True)
+
+    commit_summary = commits.summary()
+    read_summary = read_latency.summary()
+    print(f"  {profile.profile:<10} writes {writes / write_time:8.1f} commits/s "
+          f"(p50 {commit_summary.p50_ms:7.3f} ms, p95 {commit_summary.p95_ms:7.3f} ms), "
+          f"reads {reads / read_time:8.1f}/s, "
+          f"reads while writing p95 {read_summary.p95_ms:7.3f} ms, max {read_summary.max_ms:7.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("DbManager.benchmark")
+    parser.add_argument("--path", default="./config",
+                        help="Directory for the test databases, on the storage to measure.")
+    parser.add_argument("-w", "--writes", default=200, type=int, help="Commits per profile.")
+    parser.add_argument("-r", "--reads", default=1000, type=int, help="Reads per profile.")
+    parser.add_argument("--profile", action="append", choices=list(PROFILES),
+                        help="Storage profile to measure, can be repeated. All of them if omitted.")
+    args = parser.parse_args()
+
+    benchmark_path = Path(args.path)
+    benchmark_path.mkdir(parents=True, exist_ok=True)
+    print(f"Storage profiles ({benchmark_path.resolve()})")
+    for profile_name in args.profile or PROFILES:
+        bench_profile(StorageProfile(profile_name), benchmark_path, args.writes, args.reads)
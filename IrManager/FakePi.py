@@ -0,0 +1,242 @@
+import threading
+import time
+from typing import Callable
+
+import pigpio
+
+
+def code_edges(code: [int], start_tick: int = 0, level: int = 0) -> list[tuple[int, int]]:
+    """
+    (tick, level) edges of a mark/space list as seen by a receiver, which is active low.
+    """
+    edges = [(start_tick, level)]
+    tick = start_tick
+    for duration in code:
+        tick = (tick + duration) & 0xFFFFFFFF
+        level ^= 1
+        edges.append((tick, level))
+    return edges
+
+
+class FakeCallback:
+
+    def __init__(self, pi: "FakePi", gpio: int, func: Callable[[int, int, int], None]):
+        self.pi = pi
+        self.gpio = gpio
+        self.func = func
+
+    def cancel(self):
+        if self in self.pi.callbacks:
+            self.pi.callbacks.remove(self)
+
+
+class FakePi:
+    """
+    Stand-in for pigpio.pi that keeps waves in memory and simulates their transmission time.
+
+    Recorded edge streams can be replayed into callbacks from a separate thread, like pigpio does, and every chain
+    sent is kept with its start time, so the emitted timeline can be inspected.
+
+    Used by IrManager.benchmark, so IR performance can be measured without a Raspberry Pi.
+    """
+
+    max_pulses = 12000
+    max_cbs = 25016
+
+    def __init__(self):
+        self.waves: dict[int, list[pigpio.pulse]] = {}
+        self.next_wave_id = 0
+        self.pending: list[pigpio.pulse] = []
+        self.tx_end = 0.0
+        self.modes: dict[int, int] = {}
+
+        self.callbacks: list[FakeCallback] = []
+        self.watchdogs: dict[int, int] = {}
+
+        # Start time (perf_counter) and data of every chain sent, time of every wave_tx_stop
+        self.chains: list[tuple[float, list[int]]] = []
+        self.tx_stops: list[float] = []
+
+    def stop(self):
+        pass
+
+    def set_mode(self, gpio: int, mode: int):
+        self.modes[gpio] = mode
+
+    def set_glitch_filter(self, gpio: int, steady: int):
+        pass
+
+    def set_watchdog(self, gpio: int, wdog_timeout: int):
+        self.watchdogs[gpio] = wdog_timeout
+
+    def callback(self, gpio: int, edge: int, func: Callable[[int, int, int], None]) -> FakeCallback:
+        callback = FakeCallback(self, gpio, func)
+        self.callbacks.append(callback)
+        return callback
+
+    def replay(self, gpio: int, edges: [tuple[int, int]], realtime: bool = False) -> threading.Thread:
+        """
+        Feeds (tick, level) edges to the callbacks of gpio from a new thread and returns it.
+
+        An armed watchdog fires before any pause longer than its timeout and after the last edge. Unless realtime
+        is set, edges are fed as fast as possible.
+        """
+        def run():
+            started = time.perf_counter()
+            for index, (tick, level) in enumerate(edges):
+                if realtime:
+                    delay = pigpio.tickDiff(edges[0][0], tick) / 1_000_000 - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                self._notify(gpio, level, tick)
+
+                watchdog = self.watchdogs.get(gpio, 0)
+                following = edges[index + 1][0] if index + 1 < len(edges) else None
+                if watchdog and (following is None or pigpio.tickDiff(tick, following) > watchdog * 1000):
+                    self._notify(gpio, pigpio.TIMEOUT, (tick + watchdog * 1000) & 0xFFFFFFFF)
+
+        thread = threading.Thread(target=run, name="FakePi replay")
+        thread.start()
+        return thread
+
+    def _notify(self, gpio: int, level: int, tick: int):
+        for callback in list(self.callbacks):
+            if callback.gpio == gpio:
+                callback.func(gpio, level, tick)
+
+    def wave_clear(self):
+        self.waves = {}
+        self.pending = []
+        self.tx_end = 0.0
+
+    def wave_get_max_pulses(self) -> int:
+        return self.max_pulses
+
+    def wave_get_max_cbs(self) -> int:
+        return self.max_cbs
+
+    def wave_add_new(self):
+        self.pending = []
+
+    def wave_add_generic(self, pulses: [pigpio.pulse]) -> int:
+        self.pending.extend(pulses)
+        return len(self.pending)
+
+    def wave_get_pulses(self) -> int:
+        return len(self.pending)
+
+    def wave_get_cbs(self) -> int:
+        return 2 * len(self.pending)
+
+    def wave_create(self) -> int:
+        if len(self.waves) >= 250:
+            raise pigpio.error("'No more waveforms'")
+        while self.next_wave_id in self.waves:
+            self.next_wave_id = (self.next_wave_id + 1) % 250
+        wave_id = self.next_wave_id
+        self.waves[wave_id] = self.pending
+        self.pending = []
+        return wave_id
+
+    def wave_delete(self, wave_id: int):
+        del self.waves[wave_id]
+
+    def wave_chain(self, data: [int]):
+        started = time.perf_counter()
+        self.chains.append((started, list(data)))
+        self.tx_end = started + self.chain_duration(data) / 1_000_000
+
+    def chain_duration(self, data: [int]) -> float:
+        """
+        Length of a chain in µs, following the loop and delay commands of pigpio.wave_chain.
+        """
+        duration = 0
+        loop_start = None
+        i = 0
+        while i < len(data):
+            if data[i] != 255:
+                duration += sum(pulse.delay for pulse in self.waves[data[i]])
+                i += 1
+                continue
+            command = data[i + 1]
+            if command == 0:
+                loop_start = duration
+                i += 2
+            elif command == 1:
+                count = data[i + 2] + (data[i + 3] << 8)
+                duration += (duration - loop_start) * (count - 1)
+                i += 4
+            elif command == 2:
+                duration += data[i + 2] + (data[i + 3] << 8)
+                i += 4
+            elif command == 3:
+                # Loop forever, until wave_tx_stop is called
+                return float("inf")
+            else:
+                raise pigpio.error(f"Unsupported chain command {command}")
+        return duration
+
+    def chain_timeline(self, data: [int]) -> [int]:
+        """
+        Mark/space list (in µs) a chain emits. A loop running forever is only followed once.
+        """
+        timeline = []
+
+        def emit(carrier: bool, micros: int):
+            # Starts with a mark, so an even index is a mark
+            if len(timeline) % 2 == (0 if carrier else 1):
+                timeline.append(micros)
+            elif timeline:
+                timeline[-1] += micros
+
+        def emit_wave(wave_id: int):
+            for pulse in self.waves[wave_id]:
+                emit(bool(pulse.gpio_on or pulse.gpio_off), pulse.delay)
+
+        loop_start = None
+        i = 0
+        while i < len(data):
+            if data[i] != 255:
+                emit_wave(data[i])
+                i += 1
+                continue
+            command = data[i + 1]
+            if command == 0:
+                loop_start = i + 2
+                i += 2
+            elif command == 1:
+                count = data[i + 2] + (data[i + 3] << 8)
+                body = data[loop_start:i]
+                for _ in range(count - 1):
+                    self._emit_chain_part(body, emit, emit_wave)
+                i += 4
+            elif command == 2:
+                emit(False, data[i + 2] + (data[i + 3] << 8))
+                i += 4
+            elif command == 3:
+                break
+            else:
+                raise pigpio.error(f"Unsupported chain command {command}")
+
+        # Trailing spaces aren't part of the code
+        if len(timeline) % 2 == 0 and timeline:
+            timeline.pop()
+        return timeline
+
+    @staticmethod
+    def _emit_chain_part(data: [int], emit, emit_wave):
+        i = 0
+        while i < len(data):
+            if data[i] != 255:
+                emit_wave(data[i])
+                i += 1
+            else:
+                emit(False, data[i + 2] + (data[i + 3] << 8))
+                i += 4
+
+    def wave_tx_busy(self) -> int:
+        return 1 if time.perf_counter() < self.tx_end else 0
+
+    def wave_tx_stop(self):
+        self.tx_stops.append(time.perf_counter())
+        self.tx_end = 0.0
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from array import array
+from asyncio import AbstractEventLoop, Queue
+from bisect import bisect_left, bisect_right
+
+import pigpio
+
+# Gap (in ms) that separates two codes
+PRE = 20
+# Time (in ms) without edges after which a code is considered complete
+POST = 20
+# Ignore level changes shorter than this (in µs)
+GLIT = 100
+PRE_US = PRE * 1000
+
+# Edges kept in the ring buffer, a lot more than the longest code
+CAPTURE_SIZE = 4096
+
+
+def normalise(code: list) -> None:
+    """
+    Replaces similar durations (within ±20%) of a recorded code by their average, in place.
+
+    Marks and spaces are handled separately. Going through the code in order, each entry that isn't part of a
+    group yet starts a new one with all later, ungrouped entries of the same kind that are similar to it.
+
+    Gives the same result as the nested loops this replaces, but sorts the durations once and finds the members of
+    a group by bisection, so it takes O(n log n) instead of O(n²) for long codes like those of AC remotes.
+    """
+    for parity in (0, 1):
+        indices = sorted(range(parity, len(code), 2), key=code.__getitem__)
+        values = [code[i] for i in indices]
+
+        # Positions in indices that are already grouped are skipped by following next_free, like a union-find
+        next_free = list(range(len(indices) + 1))
+        position = [0] * len(indices)
+        for pos, index in enumerate(indices):
+            position[index >> 1] = pos
+
+        def find(pos: int) -> int:
+            root = pos
+            while next_free[root] != root:
+                root = next_free[root]
+            while next_free[pos] != root:
+                next_free[pos], pos = root, next_free[pos]
+            return root
+
+        def take(pos: int):
+            next_free[pos] = pos + 1
+
+        for i in range(parity, len(code), 2):
+            pos = position[i >> 1]
+            if find(pos) != pos:
+                continue
+            take(pos)
+
+            v = values[pos]
+            # Entries with c * 0.8 < v < c * 1.2, same comparison as before so the bounds match exactly
+            low = bisect_right(values, v, key=lambda c: c * 1.2)
+            high = bisect_left(values, v, key=lambda c: c * 0.8)
+
+            members = []
+            pos = find(low)
+            while pos < high:
+                members.append(indices[pos])
+                take(pos)
+                pos = find(pos + 1)
+
+            # Add up in code order, so floats are summed exactly like before
+            members.sort()
+            tot = v
+            for j in members:
+                tot = tot + code[j]
+            newv = tot / (len(members) + 1.0)
+
+            code[i] = newv
+            for j in members:
+                code[j] = newv
+
+
+class IrCapture:
+    """
+    Captures codes received on a GPIO.
+
+    Edges are written to a preallocated ring buffer from the pigpio callback thread. Once a code is complete, only
+    its position in the buffer is handed to the event loop with call_soon_threadsafe, so nothing else is allocated,
+    locked or awaited on the pigpio thread and no edges are lost while the event loop is busy.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(self, pi: pigpio.pi, gpio: int, loop: AbstractEventLoop | None = None, size: int = CAPTURE_SIZE):
+        self.pi = pi
+        self.gpio = gpio
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+
+        self.edges = array("I", bytes(4 * size))
+        self.size = size
+        # Number of edges written so far, the buffer index is written % size
+        self.written = 0
+
+        # Start and end (in written) of complete codes
+        self.codes: Queue[tuple[int, int]] = Queue()
+
+        # Only touched by the pigpio thread
+        self.last_tick = None
+        self.in_code = False
+        self.code_start = 0
+
+        self.callback = None
+
+    def start(self):
+        self.pi.set_mode(self.gpio, pigpio.INPUT)
+        self.pi.set_glitch_filter(self.gpio, GLIT)
+        self.callback = self.pi.callback(self.gpio, pigpio.EITHER_EDGE, self._edge)
+
+    def stop(self):
+        if self.callback is not None:
+            self.callback.cancel()
+            self.callback = None
+        self.pi.set_watchdog(self.gpio, 0)
+
+    def clear(self):
+        """
+        Drops codes that were received but not read yet.
+        """
+        while not self.codes.empty():
+            self.codes.get_nowait()
+
+    async def get(self) -> [int]:
+        """
+        Waits for the next complete code and returns its edges (in µs).
+        """
+        while True:
+            start, end = await self.codes.get()
+            if self.written - start > self.size:
+                self.logger.warning(f"Dropped a code of {end - start} edges, the capture buffer overflowed")
+                continue
+            return self._read(start, end)
+
+    def _read(self, start: int, end: int) -> [int]:
+        start %= self.size
+        end %= self.size
+        if start <= end:
+            return self.edges[start:end].tolist()
+        return self.edges[start:].tolist() + self.edges[:end].tolist()
+
+    def _end_of_code(self):
+        self.in_code = False
+        self.pi.set_watchdog(self.gpio, 0)
+        self.loop.call_soon_threadsafe(self.codes.put_nowait, (self.code_start, self.written))
+
+    def _edge(self, _, level: int, tick: int):
+        # Runs on the pigpio thread
+        if level == pigpio.TIMEOUT:
+            if self.in_code:
+                self._end_of_code()
+            else:
+                self.pi.set_watchdog(self.gpio, 0)
+            return
+
+        if self.last_tick is not None:
+            edge = pigpio.tickDiff(self.last_tick, tick)
+            if edge > PRE_US:  # Start or end of a code
+                if self.in_code:
+                    self._end_of_code()
+                else:
+                    self.in_code = True
+                    self.code_start = self.written
+                    self.pi.set_watchdog(self.gpio, POST)
+            elif self.in_code:
+                self.edges[self.written % self.size] = edge
+                self.written += 1
+        self.last_tick = tick
@@ -0,0 +1,231 @@
+import struct
+from array import array
+from functools import lru_cache
+from math import gcd
+
+# Carrier frequency in kHz
+FREQ = 38
+
+# NEC frames and repeat frames start every 108 ms (in µs)
+NEC_PERIOD = 108_000
+
+# Version of the format written by CompiledIrCode.to_bytes
+FORMAT_VERSION = 2
+
+# version, frequency, flags, number of marks, number of spaces, length of the chain
+HEADER = struct.Struct("<BBBHHH")
+# Header of version 1, which stored the number of marks and spaces in a byte and couldn't hold 256 of them
+HEADER_V1 = struct.Struct("<BBBBBH")
+
+# Durations are stored as uint32 instead of uint16 if this flag is set
+FLAG_WIDE = 0x01
+
+
+def _carrier_cycle_delays(frequency: int, cycles: int, dutycycle: float) -> array:
+    """
+    Computes the on/off delays of the given cycles of a carrier in one batch.
+    """
+    cycle = 1000.0 / frequency
+    on = int(round(cycle * dutycycle))
+
+    targets = [round(c * cycle) for c in range(cycles + 1)]
+
+    delays = array("I", bytes(8 * cycles))
+    delays[0::2] = array("I", [on]) * cycles
+    delays[1::2] = array("I", [b - a - on for a, b in zip(targets, targets[1:])])
+    return delays
+
+
+@lru_cache(maxsize=32)
+def carrier_period(frequency: int, dutycycle: float = 0.5) -> array | None:
+    """
+    Returns the on/off delays of the shortest run of cycles after which the carrier repeats itself exactly.
+
+    None is returned if rounding would make the pattern drift (cycle boundaries falling exactly on .5 µs).
+    """
+    cycles = frequency // gcd(1000, frequency)
+    if any(2 * (1000 * c % frequency) == frequency for c in range(1, cycles + 1)):
+        return None
+    return _carrier_cycle_delays(frequency, cycles, dutycycle)
+
+
+def carrier_tiles(frequency: int, micros: int, dutycycle: float = 0.5) -> tuple[array, int, int]:
+    """
+    Describes a carrier burst as (period, repeats, rest), the burst being period * repeats + period[:rest].
+
+    This allows building the pulses for a mark from a single period instead of one cycle at a time.
+    """
+    cycles = int(round(micros / (1000.0 / frequency)))
+    period = carrier_period(frequency, dutycycle)
+    if period is None:
+        return _carrier_cycle_delays(frequency, cycles, dutycycle), 1, 0
+    repeats, rest = divmod(cycles, len(period) // 2)
+    return period, repeats, 2 * rest
+
+
+@lru_cache(maxsize=512)
+def carrier_delays(frequency: int, micros: int, dutycycle: float = 0.5) -> array:
+    """
+    Returns the alternating on/off delays of a carrier burst with the given frequency (in kHz) and length.
+
+    The result matches the pulses of the old per-cycle loop, but is tiled from a precomputed period of the carrier
+    and shared between all codes using the same mark.
+    """
+    period, repeats, rest = carrier_tiles(frequency, micros, dutycycle)
+    return period * repeats + period[:rest]
+
+
+class CompiledIrCode:
+    """
+    Compact representation of a mark/space list.
+
+    Every distinct mark and space duration is stored once, the chain refers to them by index. Even positions of the
+    chain index into marks, odd positions into spaces.
+    """
+
+    __slots__ = ("frequency", "marks", "spaces", "chain")
+
+    def __init__(self, frequency: int, marks: array, spaces: array, chain: array):
+        self.frequency = frequency
+        self.marks = marks
+        self.spaces = spaces
+        self.chain = chain
+
+    def __eq__(self, other):
+        if not isinstance(other, CompiledIrCode):
+            return NotImplemented
+        return (self.frequency == other.frequency and self.marks == other.marks
+                and self.spaces == other.spaces and self.chain == other.chain)
+
+    def __hash__(self):
+        return hash((self.frequency, self.marks.tobytes(), self.spaces.tobytes(), self.chain.tobytes()))
+
+    def __len__(self):
+        return len(self.chain)
+
+    def timings(self) -> [int]:
+        """
+        Expands the code back into the mark/space list it was compiled from.
+        """
+        return [
+            self.spaces[index] if i & 1 else self.marks[index]
+            for i, index in enumerate(self.chain)
+        ]
+
+    @property
+    def duration(self) -> int:
+        """
+        Length of the whole code in microseconds.
+        """
+        return sum(self.timings())
+
+    def pulse_table(self, mark: int) -> array:
+        """
+        Returns the carrier on/off delays for the mark with the given index.
+        """
+        return carrier_delays(self.frequency, self.marks[mark])
+
+    def to_bytes(self) -> bytes:
+        wide = max(max(self.marks, default=0), max(self.spaces, default=0)) > 0xFFFF
+        typecode = "I" if wide else "H"
+
+        header = HEADER.pack(
+            FORMAT_VERSION,
+            self.frequency,
+            FLAG_WIDE if wide else 0,
+            len(self.marks),
+            len(self.spaces),
+            len(self.chain)
+        )
+        marks = array(typecode, self.marks)
+        spaces = array(typecode, self.spaces)
+
+        # array uses the native byte order, the stored format is always little endian
+        if struct.pack("=H", 1) != struct.pack("<H", 1):
+            marks.byteswap()
+            spaces.byteswap()
+
+        return header + marks.tobytes() + spaces.tobytes() + self.chain.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CompiledIrCode":
+        headers = {FORMAT_VERSION: HEADER, 1: HEADER_V1}
+        header = headers.get(data[0]) if data else None
+        if header is None:
+            raise ValueError(f"Unsupported compiled IR code version {data[0] if data else None}")
+        _, frequency, flags, mark_count, space_count, chain_length = header.unpack_from(data)
+
+        typecode = "I" if flags & FLAG_WIDE else "H"
+        size = array(typecode).itemsize
+        offset = header.size
+
+        marks = array(typecode, data[offset:offset + mark_count * size])
+        offset += mark_count * size
+        spaces = array(typecode, data[offset:offset + space_count * size])
+        offset += space_count * size
+        chain = array("B", data[offset:offset + chain_length])
+
+        if struct.pack("=H", 1) != struct.pack("<H", 1):
+            marks.byteswap()
+            spaces.byteswap()
+
+        if len(chain) != chain_length:
+            raise ValueError("Compiled IR code is truncated")
+
+        return cls(frequency, array("I", marks), array("I", spaces), chain)
+
+
+def compile_code(code: [int], frequency: int) -> CompiledIrCode:
+    """
+    Compiles a mark/space list (as stored in Command.ir_action) into a CompiledIrCode.
+    """
+    code = [int(duration) for duration in code]
+    mark_durations = code[0::2]
+    space_durations = code[1::2]
+
+    # dict.fromkeys deduplicates while keeping the order of first appearance
+    marks = {duration: index for index, duration in enumerate(dict.fromkeys(mark_durations))}
+    spaces = {duration: index for index, duration in enumerate(dict.fromkeys(space_durations))}
+    if len(marks) > 256 or len(spaces) > 256:
+        raise ValueError("IR code uses more than 256 distinct marks or spaces")
+
+    chain = array("B", bytes(len(code)))
+    chain[0::2] = array("B", map(marks.__getitem__, mark_durations))
+    chain[1::2] = array("B", map(spaces.__getitem__, space_durations))
+
+    return CompiledIrCode(frequency, array("I", marks), array("I", spaces), chain)
+
+
+def nec_repeat_frame(code: CompiledIrCode) -> CompiledIrCode | None:
+    """
+    Returns the NEC repeat frame (leader mark, half a leader space, one bit mark) for NEC codes, None for others.
+    """
+    if len(code.chain) != 67:
+        return None
+
+    leader_mark = code.marks[code.chain[0]]
+    leader_space = code.spaces[code.chain[1]]
+    if not (9000 * 0.8 < leader_mark < 9000 * 1.2 and 4500 * 0.8 < leader_space < 4500 * 1.2):
+        return None
+
+    return compile_code([leader_mark, leader_space // 2, code.marks[code.chain[-1]]], code.frequency)
+
+
+@lru_cache(maxsize=256)
+def _compile_cached(code: tuple[int, ...], frequency: int) -> CompiledIrCode:
+    return compile_code(code, frequency)
+
+
+def compile_cached(code: [int], frequency: int) -> CompiledIrCode:
+    """
+    Same as compile_code, but reuses the result for codes that were compiled before.
+    """
+    return _compile_cached(tuple(code), frequency)
+
+
+@lru_cache(maxsize=256)
+def load_cached(data: bytes) -> CompiledIrCode:
+    """
+    Same as CompiledIrCode.from_bytes, but reuses the result for data that was loaded before.
+    """
+    return CompiledIrCode.from_bytes(data)
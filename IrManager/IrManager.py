@@ -7,128 +7,103 @@ from typing import Callable, Awaitable
 import pigpio
 from starlette.websockets import WebSocketDisconnect, WebSocket, WebSocketState
 
+from Api.models.Metrics import IrMetrics
 from Api.models.WebsocketResponses import WebsocketIrResponse
+from IrManager.IrCapture import IrCapture, normalise
+from IrManager.IrCompiler import CompiledIrCode, compile_cached, nec_repeat_frame, FREQ, NEC_PERIOD
+from IrManager.IrTransmitter import IrTransmitter, DEFAULT_GAP, DEFAULT_REPEAT_GAP
+from IrManager.WaveCache import WaveCache
 
 AsyncCallback = Callable[[str], Awaitable[None]]
 
-PRE = 20
-POST = 20
 RXGPIO = 17
-GLIT = 100
-PRE_US = PRE * 1000
 
 TXGPIO = 18
-FREQ = 38
+
+# Repeat held NEC codes with the short NEC repeat frame instead of the full code. Most NEC devices accept both, but
+# some only react to one of them.
+NEC_REPEAT_FRAMES = False
 
 
 class IrManager:
 
     logger = logging.getLogger(__package__)
     recording_task: Task|None = None
-    sending_task: Task|None = None
 
-    def __init__(self):
+    def __init__(self, pi: pigpio.pi | None = None):
         self.logger.info("Connecting...")
-        self.pi = pigpio.pi()
+        self.pi = pi if pi is not None else pigpio.pi()
         self.logger.info("Done")
 
-        self.repeating = False
+        self.pi.set_mode(TXGPIO, pigpio.OUTPUT)  # IR TX connected to this GPIO.
+        self.wave_cache = WaveCache(self.pi, TXGPIO, FREQ)
+        self.transmitter = IrTransmitter(self.pi, self.wave_cache)
 
         atexit.register(self.cleanup)
 
     def cleanup(self):
         self.logger.info("Disconnecting from GPIO...")
+        self.wave_cache.clear()
         self.pi.stop()
 
-    async def send_and_repeat(self, code: [int]):
-        self.cancel_sending()
-        self.sending_task = asyncio.create_task(self._send_and_repeat(code))
+    async def send_and_repeat(self, code: list[int] | CompiledIrCode, gap: int | None = None, device=None):
+        """
+        Sends the code and keeps repeating it until stop_repeating is called. gap is the pause between repeats in µs.
+        Returns once the code has been sent once, while the repeats keep running.
+        """
+        if not isinstance(code, CompiledIrCode):
+            code = compile_cached(code, FREQ)
+
+        repeat = nec_repeat_frame(code) if NEC_REPEAT_FRAMES and gap is None else None
+        if repeat is not None:
+            await self.transmitter.send_and_repeat(
+                code,
+                gap=NEC_PERIOD - code.duration,
+                repeat=repeat,
+                repeat_gap=NEC_PERIOD - repeat.duration,
+                device=device
+            )
+        else:
+            await self.transmitter.send_and_repeat(
+                code,
+                gap=gap if gap is not None else DEFAULT_REPEAT_GAP,
+                device=device
+            )
 
-    def cancel_sending(self):
-        if self.sending_task is not None and not self.sending_task.cancelled():
-            self.sending_task.cancel()
-            self.sending_task = None
+    def stop_repeating(self):
+        self.transmitter.stop_repeat()
 
-    async def _send_and_repeat(self, code: [int]):
-        while True:
-            try:
-                await self.send_command(code)
-            except Exception as e:
-                self.cancel_sending()
-                self.logger.exception(e)
-            await asyncio.sleep(0.25)
+    def warm_cache(self, codes: [list[int] | CompiledIrCode]):
+        try:
+            self.wave_cache.warm([
+                code if isinstance(code, CompiledIrCode) else compile_cached(code, FREQ)
+                for code in codes
+            ])
+        except pigpio.error as e:
+            self.logger.warning(f"Couldn't warm wave cache: {e}")
 
-    def stop_repeating(self):
-        self.cancel_sending()
-
-
-    async def send_command(self, code: [int]):
-        def carrier(gpio, frequency, micros, dutycycle=0.5):
-            """
-            Generate cycles of carrier on gpio with frequency and dutycycle.
-            """
-            nonlocal wf
-            wf = []
-            cycle = 1000.0 / frequency
-            cycles = int(round(micros / cycle))
-            on = int(round(cycle * dutycycle))
-            sofar = 0
-            for c in range(cycles):
-                target = int(round((c + 1) * cycle))
-                sofar += on
-                off = target - sofar
-                sofar += off
-                wf.append(pigpio.pulse(1 << gpio, 0, on))
-                wf.append(pigpio.pulse(0, 1 << gpio, off))
-            return wf
 
-        self.pi.set_mode(TXGPIO, pigpio.OUTPUT)  # IR TX connected to this GPIO.
+    async def send_command(self, code: list[int] | CompiledIrCode, gap: int = DEFAULT_GAP, device=None):
+        """
+        Sends the code once. Frames for the same device (like its id) keep gap (in µs) between them, frames for
+        different devices a shorter pause.
+        """
+        if not isinstance(code, CompiledIrCode):
+            code = compile_cached(code, FREQ)
 
-        self.pi.wave_add_new()
-
-        # Check marks
-        marks = {}
-        for i in range(0, len(code), 2):
-            if code[i] not in marks:
-                marks[code[i]] = -1
-
-        for i in marks:
-            wf = carrier(TXGPIO, FREQ, i)
-            self.pi.wave_add_generic(wf)
-            wid = self.pi.wave_create()
-            marks[i] = wid
-
-        # Check spaces
-        spaces = {}
-        for i in range(1, len(code), 2):
-            if code[i] not in spaces:
-                spaces[code[i]] = -1
-
-        for i in spaces:
-            self.pi.wave_add_generic([pigpio.pulse(0, 0, i)])
-            wid = self.pi.wave_create()
-            spaces[i] = wid
-
-        # Create wave
-        wave = [0] * len(code)
-        for i in range(0, len(code)):
-            if i & 1:  # Space
-                wave[i] = spaces[code[i]]
-            else:  # Mark
-                wave[i] = marks[code[i]]
-
-        self.pi.wave_chain(wave)
-
-        while self.pi.wave_tx_busy():
-            await asyncio.sleep(0.05)
-
-        for i in marks:
-            self.pi.wave_delete(marks[i])
-        for i in spaces:
-            self.pi.wave_delete(spaces[i])
+        await self.transmitter.send(code, gap, device=device)
 
         self.logger.debug("Sent IR command")
 
+    def metrics(self) -> IrMetrics:
+        return IrMetrics(
+            queue_latency=self.transmitter.queue_latency.summary(),
+            frames_sent=self.transmitter.frames_sent,
+            chains_sent=self.transmitter.chains_sent,
+            wave_cache_hits=self.wave_cache.hits,
+            wave_cache_misses=self.wave_cache.misses,
+            cached_waves=len(self.wave_cache.waves)
+        )
 
     async def record_command(self, name: str, websocket: WebSocket = None) -> [int]:
         #self.cancel_recording()
@@ -137,11 +112,6 @@ class IrManager:
 
     async def _record_command(self, name: str, websocket: WebSocket = None) -> [int]:
 
-        last_tick = None
-        in_code = False
-        code = []
-        code_done = False
-
         async def send_message(msg: str):
             self.logger.debug(msg)
             if websocket is not None and websocket.client_state == WebSocketState.CONNECTED:
@@ -150,62 +120,15 @@ class IrManager:
                 except  WebSocketDisconnect:
                     self.cancel_recording()
 
-        def normalise(c):
-            entries = len(c)
-            p = [0] * entries  # Set all entries not processed.
-            for i in range(entries):
-                if not p[i]:  # Not processed?
-                    v = c[i]
-                    tot = v
-                    similar = 1.0
-                    for j in range(i + 2, entries, 2):  # Find unprocessed similar.
-                        if not p[j]:  # Unprocessed.
-                            if c[j] * 0.8 < v < c[j] * 1.2:  # Similar.
-                                tot = tot + c[j]
-                                similar += 1.0
-                    newv = tot / similar
-                    c[i] = newv
-                    for j in range(i + 2, entries, 2):  # Normalise similar.
-                        if not p[j]:  # Unprocessed.
-                            if c[j] * 0.8 < v < c[j] * 1.2:  # Similar.
-                                c[j] = newv
-                                p[j] = 1
-
-        def end_of_code():
-            nonlocal code, code_done
-            if len(code) > 8:
-                normalise(code)
-                code_done = True
-            else:
-                code = []
-                asyncio.run(send_message(WebsocketIrResponse.SHORT_CODE))
+        async def next_code() -> [int]:
+            while True:
+                code = await capture.get()
+                if len(code) > 8:
+                    normalise(code)
+                    return code
+                await send_message(WebsocketIrResponse.SHORT_CODE)
                 # send_websocket_message("Short code, probably a repeat. Please try again.")
 
-        def cbf(_, level, tick):
-            nonlocal last_tick, in_code, code, code_done
-            if last_tick is not None:
-                if level != pigpio.TIMEOUT:
-                    edge = pigpio.tickDiff(last_tick, tick)
-                    if edge > PRE_US:  # Start or stop of a code.
-                        if in_code:
-                            in_code = False
-                            self.pi.set_watchdog(RXGPIO, 0)  # Cancel watchdog.
-                            end_of_code()
-                        else:
-                            if not code_done:
-                                in_code = True
-                                self.pi.set_watchdog(RXGPIO, POST)  # Start watchdog.
-                    else:
-                        if in_code:
-                            code.append(edge)
-                else:  # Timeout.
-                    self.pi.set_watchdog(RXGPIO, 0)  # Cancel watchdog.
-                    if in_code:
-                        in_code = False
-                        end_of_code()
-            if level != pigpio.TIMEOUT:
-                last_tick = tick
-
         def compare(p1, p2):
             if len(p1) != len(p2):
                 return False
@@ -219,44 +142,36 @@ class IrManager:
                 p1[i] = int(round((p1[i] + p2[i]) / 2.0))
             return True
 
-        self.pi.set_mode(RXGPIO, pigpio.INPUT) # IR RX connected to this GPIO.
-        self.pi.set_glitch_filter(RXGPIO, GLIT) # Ignore glitches.
-
-        _ = self.pi.callback(RXGPIO, pigpio.EITHER_EDGE, cbf)
-
-        code = []
-        code_done = False
-
-        await send_message(WebsocketIrResponse.PRESS_KEY)
-
-        while not code_done:
-            await asyncio.sleep(0.1)
+        capture = IrCapture(self.pi, RXGPIO) # IR RX connected to this GPIO.
+        capture.start()
 
-        press_1 = code[:]
-        match = False
-        tries = 0
+        try:
+            await send_message(WebsocketIrResponse.PRESS_KEY)
 
-        while not match:
-            code = []
-            code_done = False
-            if tries > 4:
-                await send_message(WebsocketIrResponse.TOO_MANY_RETRIES)
-                return None
+            press_1 = await next_code()
+            match = False
+            tries = 0
 
-            await send_message(WebsocketIrResponse.REPEAT_KEY)
+            while not match:
+                if tries > 4:
+                    await send_message(WebsocketIrResponse.TOO_MANY_RETRIES)
+                    return None
 
-            while not code_done:
-                await asyncio.sleep(0.1)
+                # Ignore anything received before asking for the second press
+                capture.clear()
+                await send_message(WebsocketIrResponse.REPEAT_KEY)
 
-            press_2 = code[:]
-            the_same = compare(press_1, press_2)
+                press_2 = await next_code()
+                the_same = compare(press_1, press_2)
 
-            if the_same:
-                match = True
+                if the_same:
+                    match = True
 
-            tries += 1
+                tries += 1
 
-        return press_1
+            return press_1
+        finally:
+            capture.stop()
 
     def cancel_recording(self):
         if self.recording_task is not None and not self.recording_task.cancelled():
@@ -0,0 +1,298 @@
+from Api.models.IrProtocol import IrProtocol
+from IrManager.IrCompiler import CompiledIrCode, compile_cached
+
+# Timings are in µs, frequencies in kHz.
+# Codes are mark/space lists starting with a mark and ending with the last mark, like recorded codes.
+
+NEC_LEADER = (9000, 4500)
+SAMSUNG_LEADER = (4500, 4500)
+PULSE_DISTANCE_MARK = 560
+PULSE_DISTANCE_ZERO = 560
+PULSE_DISTANCE_ONE = 1690
+
+SONY_LEADER = (2400, 600)
+SONY_ZERO = 600
+SONY_ONE = 1200
+SONY_SPACE = 600
+SONY_BITS = {IrProtocol.SONY12: (7, 5), IrProtocol.SONY15: (7, 8), IrProtocol.SONY20: (7, 13)}
+
+RC5_UNIT = 889
+RC6_UNIT = 444
+
+# Bits of the address and the command of every protocol, including the RC5 field and toggle bits and the RC6 toggle bit
+BITS = {
+    IrProtocol.NEC: (8, 8),
+    IrProtocol.NEC_EXTENDED: (16, 8),
+    IrProtocol.SAMSUNG: (16, 8),
+    IrProtocol.SONY12: (5, 7),
+    IrProtocol.SONY15: (8, 7),
+    IrProtocol.SONY20: (13, 7),
+    IrProtocol.RC5: (5, 8),
+    IrProtocol.RC6: (8, 9),
+}
+
+FREQUENCIES = {
+    IrProtocol.NEC: 38,
+    IrProtocol.NEC_EXTENDED: 38,
+    IrProtocol.SAMSUNG: 38,
+    IrProtocol.SONY12: 40,
+    IrProtocol.SONY15: 40,
+    IrProtocol.SONY20: 40,
+    IrProtocol.RC5: 36,
+    IrProtocol.RC6: 36,
+}
+
+
+def _similar(a: float, b: float) -> bool:
+    # Same tolerance as used when recording codes
+    return b != 0 and 0.8 <= a / b <= 1.2
+
+
+def _matches(code: [int], timings: [int]) -> bool:
+    return len(code) == len(timings) and all(_similar(a, b) for a, b in zip(code, timings))
+
+
+def _run_lengths(levels: [int], unit: int) -> [int]:
+    """
+    Turns a list of mark (1) / space (0) units into a mark/space list, dropping leading and trailing spaces.
+    """
+    timings = []
+    previous = 0
+    for level in levels:
+        if level == previous and timings:
+            timings[-1] += unit
+        elif level or timings:
+            timings.append(unit)
+        previous = level
+    if len(timings) % 2 == 0 and timings:
+        timings.pop()
+    return timings
+
+
+def _units(code: [int], unit: int) -> list[int] | None:
+    """
+    Turns a mark/space list into a list of mark (1) / space (0) units, None if a duration isn't a multiple of unit.
+    """
+    levels = []
+    for i, duration in enumerate(code):
+        count = round(duration / unit)
+        if count < 1 or not _similar(duration, count * unit):
+            return None
+        levels += [0 if i & 1 else 1] * count
+    return levels
+
+
+# Pulse distance coding, used by NEC and Samsung: 32 bits, least significant bit first
+
+def _encode_pulse_distance(leader: tuple[int, int], value: int) -> [int]:
+    timings = list(leader)
+    for bit in range(32):
+        timings += [PULSE_DISTANCE_MARK, PULSE_DISTANCE_ONE if value >> bit & 1 else PULSE_DISTANCE_ZERO]
+    timings.append(PULSE_DISTANCE_MARK)
+    return timings
+
+
+def _decode_pulse_distance(code: [int], leader: tuple[int, int]) -> int | None:
+    if len(code) != 67 or not (_similar(code[0], leader[0]) and _similar(code[1], leader[1])):
+        return None
+    value = 0
+    threshold = (PULSE_DISTANCE_ZERO + PULSE_DISTANCE_ONE) / 2
+    for bit in range(32):
+        if code[3 + 2 * bit] > threshold:
+            value |= 1 << bit
+    return value
+
+
+def _encode_nec(address: int, command: int, extended: bool) -> [int]:
+    if not extended:
+        address = address & 0xFF | (~address & 0xFF) << 8
+    value = address & 0xFFFF | (command & 0xFF) << 16 | (~command & 0xFF) << 24
+    return _encode_pulse_distance(NEC_LEADER, value)
+
+
+def _decode_nec(code: [int]) -> tuple[IrProtocol, int, int] | None:
+    value = _decode_pulse_distance(code, NEC_LEADER)
+    if value is None:
+        return None
+    address = value & 0xFFFF
+    command = value >> 16 & 0xFF
+    if value >> 24 != ~command & 0xFF:
+        return None
+    if address >> 8 == ~address & 0xFF:
+        return IrProtocol.NEC, address & 0xFF, command
+    return IrProtocol.NEC_EXTENDED, address, command
+
+
+def _encode_samsung(address: int, command: int) -> [int]:
+    value = address & 0xFFFF | (command & 0xFF) << 16 | (~command & 0xFF) << 24
+    return _encode_pulse_distance(SAMSUNG_LEADER, value)
+
+
+def _decode_samsung(code: [int]) -> tuple[IrProtocol, int, int] | None:
+    value = _decode_pulse_distance(code, SAMSUNG_LEADER)
+    if value is None:
+        return None
+    command = value >> 16 & 0xFF
+    if value >> 24 != ~command & 0xFF:
+        return None
+    return IrProtocol.SAMSUNG, value & 0xFFFF, command
+
+
+# Sony SIRC: pulse width coding, 7 command bits followed by 5, 8 or 13 address bits, least significant bit first
+
+def _encode_sony(protocol: IrProtocol, address: int, command: int) -> [int]:
+    command_bits, address_bits = SONY_BITS[protocol]
+    value = command & ((1 << command_bits) - 1) | (address & ((1 << address_bits) - 1)) << command_bits
+    timings = list(SONY_LEADER)
+    for bit in range(command_bits + address_bits):
+        timings += [SONY_ONE if value >> bit & 1 else SONY_ZERO, SONY_SPACE]
+    timings.pop()
+    return timings
+
+
+def _decode_sony(code: [int]) -> tuple[IrProtocol, int, int] | None:
+    if not (_similar(code[0], SONY_LEADER[0]) and _similar(code[1], SONY_LEADER[1])):
+        return None
+    for protocol, (command_bits, address_bits) in SONY_BITS.items():
+        if len(code) == 1 + 2 * (command_bits + address_bits):
+            value = 0
+            threshold = (SONY_ZERO + SONY_ONE) / 2
+            for bit in range(command_bits + address_bits):
+                if code[2 + 2 * bit] > threshold:
+                    value |= 1 << bit
+            return protocol, value >> command_bits, value & ((1 << command_bits) - 1)
+    return None
+
+
+# RC5: bi-phase coding with 889 µs half bits. Start bit, field bit (inverted 7th command bit), toggle bit,
+# 5 address bits and 6 command bits, most significant bit first. The toggle bit is kept as bit 7 of the command.
+
+def _encode_rc5(address: int, command: int) -> [int]:
+    bits = [1, 0 if command & 0x40 else 1, command >> 7 & 1]
+    bits += [address >> i & 1 for i in range(4, -1, -1)]
+    bits += [command >> i & 1 for i in range(5, -1, -1)]
+    levels = []
+    for bit in bits:
+        levels += [0, 1] if bit else [1, 0]
+    return _run_lengths(levels, RC5_UNIT)
+
+
+def _decode_rc5(code: [int]) -> tuple[IrProtocol, int, int] | None:
+    levels = _units(code, RC5_UNIT)
+    if levels is None:
+        return None
+    # The first half of the start bit is a space and can't be seen, neither can a trailing space
+    levels = [0] + levels
+    if len(levels) == 27:
+        levels.append(0)
+    if len(levels) != 28:
+        return None
+    bits = []
+    for first, second in zip(levels[0::2], levels[1::2]):
+        if first == second:
+            return None
+        bits.append(second)
+    if bits[0] != 1:
+        return None
+    address = int("".join(map(str, bits[3:8])), 2)
+    command = int("".join(map(str, bits[8:14])), 2) | (0 if bits[1] else 0x40) | bits[2] << 7
+    return IrProtocol.RC5, address, command
+
+
+# RC6 mode 0: leader, start bit, 3 mode bits, toggle bit (double length), 8 address and 8 command bits, most
+# significant bit first. Unlike RC5, a one is a mark followed by a space. The toggle bit is kept as bit 8 of the
+# command.
+
+def _encode_rc6(address: int, command: int) -> [int]:
+    levels = [1] * 6 + [0] * 2 + [1, 0] + [0, 1] * 3
+    levels += [1, 1, 0, 0] if command >> 8 & 1 else [0, 0, 1, 1]
+    for value in (address, command):
+        for i in range(7, -1, -1):
+            levels += [1, 0] if value >> i & 1 else [0, 1]
+    return _run_lengths(levels, RC6_UNIT)
+
+
+def _decode_rc6(code: [int]) -> tuple[IrProtocol, int, int] | None:
+    # The leader is too long to be split into units reliably
+    if not (_similar(code[0], 6 * RC6_UNIT) and _similar(code[1], 2 * RC6_UNIT)):
+        return None
+    levels = _units(code[2:], RC6_UNIT)
+    if levels is None:
+        return None
+    levels = [1] * 6 + [0] * 2 + levels
+    if len(levels) == 51:
+        levels.append(0)
+    if len(levels) != 52 or levels[8:10] != [1, 0] or levels[10:16] != [0, 1] * 3:
+        return None
+    if levels[16:20] == [1, 1, 0, 0]:
+        toggle = 1
+    elif levels[16:20] == [0, 0, 1, 1]:
+        toggle = 0
+    else:
+        return None
+    bits = []
+    for first, second in zip(levels[20::2], levels[21::2]):
+        if first == second:
+            return None
+        bits.append(first)
+    address = int("".join(map(str, bits[:8])), 2)
+    command = int("".join(map(str, bits[8:])), 2) | toggle << 8
+    return IrProtocol.RC6, address, command
+
+
+def validate(protocol: IrProtocol, address: int | None, command: int | None):
+    """
+    Raises a ValueError unless address and command fit into the bits the protocol has for them.
+    """
+    if protocol not in BITS:
+        raise ValueError(f"Unknown IR protocol {protocol}")
+    address_bits, command_bits = BITS[protocol]
+    if address is None or not 0 <= address < 1 << address_bits:
+        raise ValueError(f"The address of a {protocol.value} code has to be between 0 and {(1 << address_bits) - 1}")
+    if command is None or not 0 <= command < 1 << command_bits:
+        raise ValueError(f"The command of a {protocol.value} code has to be between 0 and {(1 << command_bits) - 1}")
+
+
+def encode(protocol: IrProtocol, address: int, command: int) -> [int]:
+    """
+    Generates the canonical mark/space list of a code.
+    """
+    validate(protocol, address, command)
+    match protocol:
+        case IrProtocol.NEC:
+            return _encode_nec(address, command, extended=False)
+        case IrProtocol.NEC_EXTENDED:
+            return _encode_nec(address, command, extended=True)
+        case IrProtocol.SAMSUNG:
+            return _encode_samsung(address, command)
+        case IrProtocol.SONY12 | IrProtocol.SONY15 | IrProtocol.SONY20:
+            return _encode_sony(protocol, address, command)
+        case IrProtocol.RC5:
+            return _encode_rc5(address, command)
+        case IrProtocol.RC6:
+            return _encode_rc6(address, command)
+    raise ValueError(f"Unknown IR protocol {protocol}")
+
+
+def decode(code: [int]) -> tuple[IrProtocol, int, int] | None:
+    """
+    Recognizes a recorded mark/space list, returning (protocol, address, command) or None for unknown codes.
+
+    A code is only recognized if its canonical timings match the recorded ones, so sending the decoded code
+    is equivalent to sending the raw one.
+    """
+    if len(code) < 3:
+        return None
+
+    for decoder in (_decode_nec, _decode_samsung, _decode_sony, _decode_rc5, _decode_rc6):
+        decoded = decoder(code)
+        if decoded is not None and _matches(code, encode(*decoded)):
+            return decoded
+    return None
+
+
+def compile_protocol(protocol: IrProtocol, address: int, command: int) -> CompiledIrCode:
+    """
+    Compiles the canonical timings of a code at the carrier frequency of its protocol.
+    """
+    return compile_cached(encode(protocol, address, command), FREQUENCIES[protocol])
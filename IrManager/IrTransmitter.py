@@ -0,0 +1,326 @@
+import asyncio
+import logging
+import time
+from asyncio import Future, Queue, Task
+
+import pigpio
+
+from IrManager.IrCompiler import CompiledIrCode
+from IrManager.WaveCache import WaveCache
+from Metrics.LatencyStats import LatencyStats
+
+# pigpio refuses chains longer than this (in bytes)
+MAX_CHAIN_LENGTH = 600
+# Longest delay a single chain command can express (in µs)
+MAX_CHAIN_DELAY = 0xFFFF
+
+# Pause between two frames (in µs) if the command doesn't define one. Most protocols expect at least ~40 ms.
+DEFAULT_GAP = 40_000
+# Pause between frames for different devices (in µs). Their receivers don't wait for the gap of another device's
+# protocol, it only has to keep the last mark of a frame apart from the leading mark of the next one.
+SWITCH_GAP = 10_000
+# Pause between repeats of a held button (in µs) if the command doesn't define one
+DEFAULT_REPEAT_GAP = 250_000
+
+TX_POLL_INTERVAL = 0.001
+
+
+def chain_delay(micros: int) -> [int]:
+    """
+    Chain commands pausing the transmission for the given number of µs.
+    """
+    data = []
+    while micros > 0:
+        delay = min(micros, MAX_CHAIN_DELAY)
+        data += [255, 2, delay & 0xFF, delay >> 8]
+        micros -= delay
+    return data
+
+
+def chain_loop(data: [int], count: int) -> [int]:
+    """
+    Chain commands repeating data count times. Loops can't be nested.
+    """
+    if count == 1:
+        return data
+    return [255, 0] + data + [255, 1, count & 0xFF, count >> 8]
+
+
+class IrFrame:
+    """
+    A code waiting to be sent, followed by a gap (in µs) before the next frame for the same device may start.
+    Frames for another device only wait for SWITCH_GAP. device is anything identifying the receiving device, None if
+    it isn't known, in which case the whole gap is kept.
+
+    If repeat is set, the frame is followed by repeat (separated by repeat_gap) in a loop until it is stopped.
+    """
+
+    __slots__ = ("code", "gap", "count", "repeat", "repeat_gap", "device", "future", "enqueued")
+
+    def __init__(self, code: CompiledIrCode, gap: int, future: Future, count: int = 1,
+                 repeat: CompiledIrCode | None = None, repeat_gap: int = 0, device=None):
+        self.code = code
+        self.gap = gap
+        self.device = device
+        self.count = count
+        self.repeat = repeat
+        self.repeat_gap = repeat_gap
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+
+class IrTransmitter:
+    """
+    Sends IR codes from a queue, with a single worker owning the transmitter.
+
+    Frames that pile up while a chain is on air are sent together in the next chain, separated by their gaps.
+    Adjacent frames of the same code are folded into a chain loop. Gaps are only kept in full between frames for the
+    same device.
+
+    Held buttons are repeated by a chain looping forever, so repeats are timed by pigpio instead of the event loop.
+    The loop runs until stop_repeat is called or the next frame is sent.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    worker: Task | None = None
+
+    def __init__(self, pi: pigpio.pi, wave_cache: WaveCache):
+        self.pi = pi
+        self.wave_cache = wave_cache
+        self.queue: Queue[IrFrame] = Queue()
+
+        # Time (perf_counter) the last chain ended at, the gap that has to follow it and the device of its last frame
+        self.last_end = 0.0
+        self.last_gap = 0
+        self.last_device = None
+
+        # Whether a chain looping forever is on air
+        self.repeating = False
+        # Queued frames that will start repeating once sent
+        self.pending_repeats: set[IrFrame] = set()
+        # Start of the running loop and end of the frame before it
+        self.loop_started = 0.0
+        self.first_frame_end = 0.0
+
+        self.queue_latency = LatencyStats()
+        self.frames_sent = 0
+        self.chains_sent = 0
+
+    async def send(self, code: CompiledIrCode, gap: int = DEFAULT_GAP, count: int = 1, device=None):
+        """
+        Queues the code and waits until it has been sent.
+        """
+        await self._enqueue(IrFrame(code, gap, asyncio.get_running_loop().create_future(), count, device=device))
+
+    async def send_and_repeat(self, code: CompiledIrCode, gap: int = DEFAULT_REPEAT_GAP,
+                              repeat: CompiledIrCode | None = None, repeat_gap: int | None = None, device=None):
+        """
+        Queues the code and waits until it has been sent once. It is repeated until stop_repeat is called.
+
+        A different repeat frame (like the NEC repeat code) can be passed, in that case gap is the pause between
+        the code and the first repeat and repeat_gap the pause between two repeats.
+        """
+        frame = IrFrame(
+            code,
+            gap,
+            asyncio.get_running_loop().create_future(),
+            repeat=repeat if repeat is not None else code,
+            repeat_gap=repeat_gap if repeat_gap is not None else gap,
+            device=device
+        )
+        await self._enqueue(frame)
+
+    def stop_repeat(self):
+        """
+        Stops a repeating chain immediately. Frames that haven't been sent yet will only be sent once.
+        """
+        for frame in self.pending_repeats:
+            frame.repeat = None
+        self.pending_repeats.clear()
+
+        remaining = self.first_frame_end - time.perf_counter()
+        if self.repeating and remaining > 0:
+            # Let the first frame finish, a cut off frame would be ignored. Only stop the loop that was running
+            # when the button was released, not one started in the meantime.
+            loop_started = self.loop_started
+            asyncio.get_running_loop().call_later(
+                remaining,
+                lambda: self._stop_loop() if self.loop_started == loop_started else None
+            )
+        else:
+            self._stop_loop()
+
+    def _stop_loop(self):
+        if self.repeating:
+            self.pi.wave_tx_stop()
+            self.repeating = False
+            # The last frame was most likely cut off, the usual gap is enough to separate it from the next one
+            self.last_end = time.perf_counter()
+            self.last_gap = DEFAULT_GAP
+            self.logger.debug("Stopped repeating IR code")
+
+    async def _enqueue(self, frame: IrFrame):
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self._run())
+
+        if frame.repeat is not None:
+            self.pending_repeats.add(frame)
+        self.queue.put_nowait(frame)
+        await frame.future
+
+    def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        while not self.queue.empty():
+            self.queue.get_nowait().future.cancel()
+
+    async def _run(self):
+        while True:
+            frames = [await self.queue.get()]
+            while not self.queue.empty():
+                frames.append(self.queue.get_nowait())
+
+            frames = [frame for frame in frames if not frame.future.done()]
+
+            # Any new frame ends a repeating chain, but not before its first frame is done
+            if frames and self.repeating:
+                await asyncio.sleep(max(0.0, self.first_frame_end - time.perf_counter()))
+                self._stop_loop()
+
+            while frames:
+                batch = self._take_batch(frames)
+                try:
+                    await self._transmit(batch)
+                except Exception as e:
+                    for frame in batch:
+                        if not frame.future.done():
+                            frame.future.set_exception(e)
+                else:
+                    for frame in batch:
+                        if not frame.future.done():
+                            frame.future.set_result(None)
+
+    def _take_batch(self, frames: [IrFrame]) -> [IrFrame]:
+        """
+        Removes as many frames from the start of the list as fit into one chain.
+        """
+        batch = [frames.pop(0)]
+        length = len(chain_delay(self.last_gap)) + self._chain_length(batch[0])
+        while frames and batch[-1].repeat is None and length + self._chain_length(frames[0]) <= MAX_CHAIN_LENGTH:
+            length += self._chain_length(frames[0])
+            batch.append(frames.pop(0))
+
+        # Frames that follow a repeating frame would stop it right away, so it is only sent once
+        if frames and batch[-1].repeat is not None:
+            batch[-1].repeat = None
+
+        return batch
+
+    @staticmethod
+    def _gap(gap: int, device, next_device) -> int:
+        """
+        Pause to keep after a frame for device with the given gap, before a frame for next_device.
+        """
+        if device is None or next_device is None or device == next_device:
+            return gap
+        return min(gap, SWITCH_GAP)
+
+    @staticmethod
+    def _chain_length(frame: IrFrame) -> int:
+        # Upper bound, assuming the frame is looped and followed by its gap
+        length = len(frame.code) + 8 + len(chain_delay(frame.gap))
+        if frame.repeat is not None:
+            length += len(frame.repeat) + 4 + len(chain_delay(frame.repeat_gap))
+        return length
+
+    def _build_chain(self, frames: [IrFrame]) -> tuple[[int], int]:
+        """
+        Returns the chain for the given frames and its duration in µs.
+        """
+        codes = [frame.code for frame in frames]
+        repeat = frames[-1].repeat
+        if repeat is not None:
+            codes.append(repeat)
+        chains = self.wave_cache.chains(codes)
+
+        data = []
+        duration = 0
+
+        # Keep the gap the previous chain asked for
+        wait = (self._gap(self.last_gap, self.last_device, frames[0].device)
+                - int((time.perf_counter() - self.last_end) * 1_000_000))
+        if wait > 0:
+            data += chain_delay(wait)
+            duration += wait
+
+        # Merge runs of the same code
+        runs: list[tuple[IrFrame, [int], int]] = []
+        for frame, chain in zip(frames, chains):
+            if (runs and runs[-1][0].code == frame.code and runs[-1][0].gap == frame.gap
+                    and runs[-1][0].device == frame.device and frame.repeat is None):
+                previous, previous_chain, count = runs[-1]
+                runs[-1] = (previous, previous_chain, count + frame.count)
+            else:
+                runs.append((frame, chain, frame.count))
+
+        for index, (frame, chain, count) in enumerate(runs):
+            if index == len(runs) - 1:
+                # The gap after the last frame is kept by the next chain instead
+                gap = None
+            else:
+                gap = self._gap(frame.gap, frame.device, runs[index + 1][0].device)
+
+            if gap == frame.gap:
+                data += chain_loop(chain + chain_delay(frame.gap), count)
+            else:
+                if count > 1:
+                    data += chain_loop(chain + chain_delay(frame.gap), count - 1)
+                data += chain
+                if gap is not None:
+                    data += chain_delay(gap)
+            duration += frame.code.duration * count + frame.gap * (count - 1) + (gap or 0)
+
+        if repeat is not None:
+            data += chain_delay(frames[-1].gap)
+            data += [255, 0] + chains[-1] + chain_delay(frames[-1].repeat_gap) + [255, 3]
+
+        return data, duration
+
+    async def _transmit(self, frames: [IrFrame]):
+        self.pending_repeats.difference_update(frames)
+        data, duration = self._build_chain(frames)
+
+        started = time.perf_counter()
+        self.pi.wave_chain(data)
+
+        for frame in frames:
+            self.queue_latency.add(started - frame.enqueued)
+        self.frames_sent += sum(frame.count for frame in frames)
+        self.chains_sent += 1
+
+        if len(frames) > 1:
+            self.logger.debug(f"Sent {len(frames)} frames in one chain")
+
+        if frames[-1].repeat is not None:
+            # The chain keeps running until the next frame or stop_repeat
+            self.repeating = True
+            self.loop_started = started
+            self.first_frame_end = started + duration / 1_000_000
+            self.last_gap = frames[-1].repeat_gap
+            self.last_device = frames[-1].device
+            # Only resolve once the code has been sent once, like send does. Frames queued meanwhile would have to
+            # wait for it anyway.
+            await asyncio.sleep(duration / 1_000_000)
+            return
+
+        await asyncio.sleep(duration / 1_000_000)
+
+        # Only hit if the event loop woke up early or pigpio started late, usually by less than a millisecond
+        while self.pi.wave_tx_busy():
+            await asyncio.sleep(TX_POLL_INTERVAL)
+
+        self.last_end = time.perf_counter()
+        self.last_gap = frames[-1].gap
+        self.last_device = frames[-1].device
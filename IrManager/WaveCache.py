@@ -0,0 +1,186 @@
+import logging
+from array import array
+from collections import OrderedDict
+
+import pigpio
+
+from IrManager.IrCompiler import CompiledIrCode, carrier_tiles
+
+# pigpio can't hold more than 250 waveforms at once (PI_MAX_WAVES)
+MAX_WAVES = 250
+
+
+def carrier_pulses(gpio: int, delays: array) -> [pigpio.pulse]:
+    """
+    Turns alternating on/off delays into pigpio pulses for the given gpio.
+    """
+    mask = 1 << gpio
+    pulses = [None] * len(delays)
+    pulses[0::2] = [pigpio.pulse(mask, 0, delay) for delay in delays[0::2]]
+    pulses[1::2] = [pigpio.pulse(0, mask, delay) for delay in delays[1::2]]
+    return pulses
+
+
+class WaveCache:
+    """
+    Keeps the pigpio waveforms for marks and spaces alive between sends.
+
+    Waves are keyed by (frequency, duration), spaces use a frequency of 0. Once pigpio runs low on wave memory,
+    the least recently used waves are deleted to make room for new ones.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(self, pi: pigpio.pi, gpio: int, frequency: int):
+        self.pi = pi
+        self.gpio = gpio
+        self.frequency = frequency
+
+        # (frequency, duration) -> (wave id, pulses, control blocks), ordered from least to most recently used
+        self.waves: OrderedDict[tuple[int, int], tuple[int, int, int]] = OrderedDict()
+        self.used_pulses = 0
+        self.used_cbs = 0
+        # Waves of the chain that was sent last, these must not be deleted while it is still transmitting
+        self.in_flight: set[int] = set()
+
+        # Waves survive disconnects in the pigpio daemon, so make sure there are no leftovers from a previous run
+        self.pi.wave_clear()
+        self.max_pulses = self.pi.wave_get_max_pulses()
+        self.max_cbs = self.pi.wave_get_max_cbs()
+
+        self.hits = 0
+        self.misses = 0
+        # Bumped whenever all waves are dropped at once, so wave ids handed out before can be told apart
+        self.generation = 0
+
+    def clear(self):
+        self.generation += 1
+        self.pi.wave_clear()
+        self.waves.clear()
+        self.in_flight = set()
+        self.used_pulses = 0
+        self.used_cbs = 0
+
+    def wave_ids(self, code: CompiledIrCode) -> [int]:
+        """
+        Returns the wave chain for the given code, creating any waves that aren't cached yet.
+        """
+        return self.chains([code])[0]
+
+    def chains(self, codes: [CompiledIrCode]) -> [[int]]:
+        """
+        Returns the wave chains for codes that are sent together. None of their waves are evicted for one another.
+        """
+        mark_keys = [[(code.frequency, duration) for duration in code.marks] for code in codes]
+        space_keys = [[(0, duration) for duration in code.spaces] for code in codes]
+        pinned = set()
+        for keys in mark_keys + space_keys:
+            pinned.update(keys)
+
+        for _ in range(2):
+            generation = self.generation
+            mark_ids = [[self._get(key, pinned) for key in keys] for keys in mark_keys]
+            space_ids = [[self._get(key, pinned) for key in keys] for keys in space_keys]
+            # The cache was cleared halfway through, waves created before that are gone
+            if generation == self.generation:
+                break
+
+        chains = [
+            [spaces[index] if i & 1 else marks[index] for i, index in enumerate(code.chain)]
+            for code, marks, spaces in zip(codes, mark_ids, space_ids)
+        ]
+
+        self.in_flight = set()
+        for chain in chains:
+            self.in_flight.update(chain)
+        return chains
+
+    def warm(self, codes: [CompiledIrCode]):
+        """
+        Creates waves for all durations used by the given codes, as long as that doesn't require evicting any.
+        """
+        created = 0
+        for code in codes:
+            keys = [(code.frequency, duration) for duration in code.marks]
+            keys.extend((0, duration) for duration in code.spaces)
+            for key in keys:
+                if key in self.waves:
+                    continue
+                if len(self.waves) >= MAX_WAVES:
+                    self.logger.debug(f"Wave cache is full, stopped warming after {created} waves")
+                    return
+                self.pi.wave_add_new()
+                self.pi.wave_add_generic(self._pulses(key))
+                if (self.used_pulses + self.pi.wave_get_pulses() > self.max_pulses
+                        or self.used_cbs + self.pi.wave_get_cbs() > self.max_cbs):
+                    self.pi.wave_add_new()
+                    self.logger.debug(f"Wave memory is full, stopped warming after {created} waves")
+                    return
+                self._store(key)
+                created += 1
+        self.logger.debug(f"Warmed wave cache with {created} new waves ({len(self.waves)} total)")
+
+    def _get(self, key: tuple[int, int], pinned: set[tuple[int, int]]) -> int:
+        wave = self.waves.get(key)
+        if wave is None:
+            self.misses += 1
+            wave = self._create(key, pinned)
+        else:
+            self.hits += 1
+            self.waves.move_to_end(key)
+        return wave[0]
+
+    def _pulses(self, key: tuple[int, int]) -> [pigpio.pulse]:
+        frequency, duration = key
+        if not frequency:
+            return [pigpio.pulse(0, 0, duration)]
+
+        # pigpio only reads the pulses, so one period of them can be repeated for the whole mark
+        period, repeats, rest = carrier_tiles(frequency, duration)
+        pulses = carrier_pulses(self.gpio, period)
+        return pulses * repeats + pulses[:rest]
+
+    def _store(self, key: tuple[int, int]) -> tuple[int, int, int]:
+        pulses = self.pi.wave_get_pulses()
+        cbs = self.pi.wave_get_cbs()
+        wave = (self.pi.wave_create(), pulses, cbs)
+        self.waves[key] = wave
+        self.used_pulses += pulses
+        self.used_cbs += cbs
+        return wave
+
+    def _create(self, key: tuple[int, int], pinned: set[tuple[int, int]]) -> tuple[int, int, int]:
+        self.pi.wave_add_new()
+        self.pi.wave_add_generic(self._pulses(key))
+
+        needed_pulses = self.pi.wave_get_pulses()
+        needed_cbs = self.pi.wave_get_cbs()
+        while (len(self.waves) >= MAX_WAVES
+               or self.used_pulses + needed_pulses > self.max_pulses
+               or self.used_cbs + needed_cbs > self.max_cbs):
+            if not self._evict(pinned):
+                break
+
+        try:
+            return self._store(key)
+        except pigpio.error as e:
+            # Deleted waves can leave pigpio's memory fragmented, start over with an empty cache in that case
+            self.logger.warning(f"Couldn't create wave ({e}), clearing wave cache")
+            if self.pi.wave_tx_busy():
+                self.pi.wave_tx_stop()
+            self.clear()
+            self.pi.wave_add_generic(self._pulses(key))
+            return self._store(key)
+
+    def _evict(self, pinned: set[tuple[int, int]]) -> bool:
+        busy = self.pi.wave_tx_busy()
+        for key, (wave_id, pulses, cbs) in self.waves.items():
+            if key in pinned or (busy and wave_id in self.in_flight):
+                continue
+            del self.waves[key]
+            self.pi.wave_delete(wave_id)
+            self.used_pulses -= pulses
+            self.used_cbs -= cbs
+            self.logger.debug(f"Evicted wave {wave_id} for {key} from wave cache")
+            return True
+        return False
@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import time
+import timeit
+from itertools import cycle, islice
+from pathlib import Path
+
+import pigpio
+
+from IrManager.IrCapture import IrCapture, normalise, PRE_US
+from IrManager.IrCompiler import carrier_period, carrier_tiles, compile_code, FREQ
+from IrManager.FakePi import FakePi, code_edges
+from IrManager.IrManager import IrManager, RXGPIO, TXGPIO
+from IrManager.check_normalise import legacy_normalise, random_capture
+from IrManager.IrTransmitter import DEFAULT_GAP, SWITCH_GAP
+from IrManager.WaveCache import carrier_pulses
+from Metrics.LatencyStats import LatencyStats
+
+# Run with `python -m IrManager.benchmark` from the repository root.
+
+# Time (in s) to wait for a replayed code to be captured
+CAPTURE_TIMEOUT = 5.0
+
+SAMPLE_CODES = {
+    "nec": [9000, 4500] + [560, 560, 560, 1690] * 16 + [560],
+    "sony": [2400, 600] + [1200, 600, 600, 600] * 6 + [1200],
+    "samsung": [4500, 4500] + [560, 1690, 560, 560] * 16 + [560],
+    "ac": [3500, 1750] + [430, 430, 430, 1300, 430, 430] * 36 + [430, 10000, 3500, 1750] + [430, 1300] * 64 + [430],
+}
+
+
+def load_recorded_codes(database: str) -> dict[str, list[int]]:
+    if not Path(database).exists():
+        return {}
+    with sqlite3.connect(database) as connection:
+        rows = connection.execute(
+            "SELECT id, name, ir_action FROM command WHERE type = 'IR' AND ir_action IS NOT NULL"
+        ).fetchall()
+    codes = {}
+    for command_id, name, ir_action in rows:
+        code = json.loads(ir_action)
+        if code:
+            codes[f"{command_id}:{name}"] = code
+    return codes
+
+
+def legacy_pulses(code: [int]) -> int:
+    """
+    The per-pulse loop IrManager.send_command used before codes were compiled.
+    """
+    def carrier(gpio, frequency, micros, dutycycle=0.5):
+        wf = []
+        cycle = 1000.0 / frequency
+        cycles = int(round(micros / cycle))
+        on = int(round(cycle * dutycycle))
+        sofar = 0
+        for c in range(cycles):
+            target = int(round((c + 1) * cycle))
+            sofar += on
+            off = target - sofar
+            sofar += off
+            wf.append(pigpio.pulse(1 << gpio, 0, on))
+            wf.append(pigpio.pulse(0, 1 << gpio, off))
+        return wf
+
+    pulses = 0
+    marks = {}
+    for i in range(0, len(code), 2):
+        if code[i] not in marks:
+            marks[code[i]] = -1
+    for i in marks:
+        pulses += len(carrier(TXGPIO, FREQ, i))
+
+    spaces = {}
+    for i in range(1, len(code), 2):
+        if code[i] not in spaces:
+            spaces[code[i]] = -1
+    for i in spaces:
+        pulses += len([pigpio.pulse(0, 0, i)])
+    return pulses
+
+
+def compiled_pulses(code: [int]) -> int:
+    compiled = compile_code(code, FREQ)
+    pulses = 0
+    for duration in compiled.marks:
+        period, repeats, rest = carrier_tiles(FREQ, duration)
+        wf = carrier_pulses(TXGPIO, period)
+        pulses += len(wf * repeats + wf[:rest])
+    pulses += len([pigpio.pulse(0, 0, duration) for duration in compiled.spaces])
+    return pulses
+
+
+def bench(name: str, func, number: int) -> float:
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {name:<32} {seconds * 1e6:10.1f} µs")
+    return seconds
+
+
+def bench_compiler(codes: dict[str, list[int]], number: int):
+    print("Carrier generation (per send, without wave cache)")
+    for name, code in codes.items():
+        print(f"{name} ({len(code)} entries, {legacy_pulses(code)} pulses)")
+        legacy = bench("per-pulse loop", lambda: legacy_pulses(code), number)
+
+        def cold():
+            carrier_period.cache_clear()
+            compiled_pulses(code)
+
+        compiled = bench("compiled, cold carrier period", cold, number)
+        bench("compile_code only", lambda: compile_code(code, FREQ), number)
+        size = len(compile_code(code, FREQ).to_bytes())
+        print(f"  speedup: {legacy / compiled:.1f}x, "
+              f"serialized size {size} bytes (JSON: {len(json.dumps(code))} bytes)")
+
+
+def bench_normalise(number: int):
+    print("Normalising captures")
+    rng = random.Random(0)
+
+    # That it gives the same results as the legacy implementation is checked by IrManager.check_normalise
+    for edges in (100, 300, 1000):
+        capture = random_capture(edges, rng)
+        print(f"random capture ({edges} edges)")
+        legacy = bench("nested loops", lambda: legacy_normalise(capture[:]), number)
+        current = bench("sorted, bisection", lambda: normalise(capture[:]), number)
+        print(f"  speedup: {legacy / current:.1f}x")
+
+
+def replay_edges(codes: [[int]], last_tick: int | None = None) -> list[tuple[int, int]]:
+    """
+    Edges of the codes as received one after another, separated by more than the gap between two codes.
+
+    If last_tick is given, the edges continue a previous replay that ended at that tick.
+    """
+    edges = [(0, 1)] if last_tick is None else [(last_tick, 1)]
+    for code in codes:
+        start = (edges[-1][0] + PRE_US * 2) & 0xFFFFFFFF
+        edges += code_edges(code, start)
+    return edges if last_tick is None else edges[1:]
+
+
+async def bench_recording(codes: dict[str, list[int]], number: int):
+    print("Recording (replayed edges, no real time pacing)")
+    pi = FakePi()
+    for name, code in codes.items():
+        capture = IrCapture(pi, RXGPIO)
+        capture.start()
+        # Replay only as many codes at once as the capture buffer holds, more would be dropped
+        batch = max(1, capture.size // len(code))
+        last_tick = None
+        start = time.perf_counter()
+        for offset in range(0, number, batch):
+            edges = replay_edges([code] * min(batch, number - offset), last_tick)
+            last_tick = edges[-1][0]
+            pi.replay(RXGPIO, edges).join()
+            for _ in range(min(batch, number - offset)):
+                try:
+                    received = await asyncio.wait_for(capture.get(), CAPTURE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    raise AssertionError(f"No code captured for {name}, it was dropped") from None
+                if received != code:
+                    raise AssertionError(f"Captured {received} instead of {code}")
+        elapsed = time.perf_counter() - start
+        capture.stop()
+        print(f"  {name:<32} {number * (len(code) + 1) / elapsed / 1000:8.1f} k edges/s, "
+              f"{elapsed / number * 1e6:8.1f} µs per code")
+
+    manager = IrManager(pi=pi)
+    code = next(iter(codes.values()))
+    recording = asyncio.create_task(manager.record_command("benchmark"))
+    for _ in range(2):
+        # Give the recorder time to ask for the press
+        await asyncio.sleep(0.01)
+        pi.replay(RXGPIO, replay_edges([code])).join()
+    start = time.perf_counter()
+    recorded = await recording
+    print(f"  record_command, last edge to result {(time.perf_counter() - start) * 1000:6.2f} ms, "
+          f"{'matches' if recorded and len(recorded) == len(code) else 'differs from'} the replayed code")
+
+
+async def bench_send_setup(codes: dict[str, list[int]], number: int):
+    print("Send setup (send_command call to wave_chain, warm wave cache)")
+    for name, code in codes.items():
+        pi = FakePi()
+        manager = IrManager(pi=pi)
+        manager.warm_cache([code])
+        setup = LatencyStats()
+        for _ in range(number):
+            start = time.perf_counter()
+            await manager.send_command(code, gap=0)
+            setup.add(pi.chains[-1][0] - start)
+        # Marks are a whole number of carrier cycles, so they can be off by up to half a cycle
+        timeline = pi.chain_timeline(pi.chains[-1][1])
+        if len(timeline) != len(code):
+            raise AssertionError(f"Emitted {len(timeline)} marks and spaces for {name} instead of {len(code)}")
+        error = max(abs(emitted - duration) for emitted, duration in zip(timeline, code))
+        summary = setup.summary()
+        print(f"  {name:<32} p50 {summary.p50_ms:6.3f} ms, p95 {summary.p95_ms:6.3f} ms, max {summary.max_ms:6.3f} ms, "
+              f"timing error up to {error} µs")
+
+
+async def bench_repeat_jitter(codes: dict[str, list[int]], number: int):
+    print("Held buttons (release to wave_tx_stop, after the first frame is done)")
+    rng = random.Random(0)
+    for name, code in codes.items():
+        pi = FakePi()
+        manager = IrManager(pi=pi)
+        manager.warm_cache([code])
+        jitter = LatencyStats()
+        for _ in range(min(number, 20)):
+            await manager.send_and_repeat(code)
+            await asyncio.sleep(rng.uniform(0, 0.1))
+            released = time.perf_counter()
+            expected = max(released, manager.transmitter.first_frame_end)
+            manager.stop_repeating()
+            while manager.transmitter.repeating:
+                await asyncio.sleep(0.0005)
+            jitter.add(pi.tx_stops[-1] - expected)
+        summary = jitter.summary()
+        print(f"  {name:<32} p50 {summary.p50_ms:6.3f} ms, p95 {summary.p95_ms:6.3f} ms, max {summary.max_ms:6.3f} ms")
+
+
+async def legacy_send(manager: IrManager, code: [int]):
+    """
+    Sends like IrManager.send_command did before waiting for the exact chain duration.
+    """
+    manager.pi.wave_chain(manager.wave_cache.wave_ids(compile_code(code, FREQ)))
+    while manager.pi.wave_tx_busy():
+        await asyncio.sleep(0.05)
+
+
+async def bench_completion(codes: dict[str, list[int]], commands: int):
+    print(f"Completion overhead (macro of {commands} commands, simulated transmission)")
+    manager = IrManager(pi=FakePi())
+    # Like a scene start macro, a few commands for each device. Every code is a device of its own.
+    macro = list(islice(cycle((name, code) for name, code in codes.items() for _ in range(2)), commands))
+    codes_on_air = sum(sum(code) for _, code in macro) / 1_000_000
+    gaps = sum(
+        DEFAULT_GAP if device == next_device else SWITCH_GAP
+        for (device, _), (next_device, _) in zip(macro, macro[1:])
+    ) / 1_000_000
+
+    async def sequential(send):
+        for device, code in macro:
+            await send(code, device)
+
+    async def pipelined(send):
+        await asyncio.gather(*(send(code, device) for device, code in macro))
+
+    async def uniform_gaps(code, _):
+        await manager.send_command(code)
+
+    async def device_gaps(code, device):
+        await manager.send_command(code, device=device)
+
+    for name, run, send, on_air in (
+            ("50 ms polling, no gaps", sequential, lambda code, _: legacy_send(manager, code), codes_on_air),
+            ("transmitter, 40 ms gaps", sequential, uniform_gaps, codes_on_air + DEFAULT_GAP * (len(macro) - 1) / 1_000_000),
+            ("transmitter, one by one", sequential, device_gaps, codes_on_air + gaps),
+            ("transmitter, all queued", pipelined, device_gaps, codes_on_air + gaps)):
+        manager.transmitter.queue_latency = LatencyStats()
+        # Each run starts like after a pause, without the gap of the previous one
+        manager.transmitter.last_gap = 0
+        start = time.perf_counter()
+        await run(send)
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<32} {elapsed * 1000:8.1f} ms total, "
+              f"{(elapsed - on_air) / len(macro) * 1000:6.2f} ms overhead per command")
+
+    latency = manager.transmitter.queue_latency.summary()
+    print(f"  queue latency (all queued): p50 {latency.p50_ms} ms, p95 {latency.p95_ms} ms, "
+          f"{manager.transmitter.chains_sent} chains for {manager.transmitter.frames_sent} frames in total")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("IrManager.benchmark")
+    parser.add_argument("--database", default="./config/database.db", help="Database to load recorded codes from.")
+    parser.add_argument("-n", "--number", default=50, type=int, help="Iterations per measurement.")
+    parser.add_argument("-c", "--commands", default=10, type=int, help="Commands per simulated macro.")
+    args = parser.parse_args()
+
+    benchmark_codes = load_recorded_codes(args.database) or SAMPLE_CODES
+    bench_compiler(benchmark_codes, args.number)
+    bench_normalise(args.number)
+    asyncio.run(bench_recording(benchmark_codes, args.number))
+    asyncio.run(bench_send_setup(benchmark_codes, args.number))
+    asyncio.run(bench_repeat_jitter(benchmark_codes, args.number))
+    asyncio.run(bench_completion(benchmark_codes, args.commands))
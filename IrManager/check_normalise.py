@@ -0,0 +1,123 @@
+import argparse
+import random
+import sys
+
+from IrManager.IrCapture import CAPTURE_SIZE, normalise
+
+# Run with `python -m IrManager.check_normalise` from the repository root. Exits with 1 if normalise gives a different
+# result than the nested loops it replaced for any code.
+
+
+def legacy_normalise(c):
+    """
+    The nested loops IrManager._record_command used to normalise recorded codes.
+    """
+    entries = len(c)
+    p = [0] * entries  # Set all entries not processed.
+    for i in range(entries):
+        if not p[i]:  # Not processed?
+            v = c[i]
+            tot = v
+            similar = 1.0
+            for j in range(i + 2, entries, 2):  # Find unprocessed similar.
+                if not p[j]:  # Unprocessed.
+                    if c[j] * 0.8 < v < c[j] * 1.2:  # Similar.
+                        tot = tot + c[j]
+                        similar += 1.0
+            newv = tot / similar
+            c[i] = newv
+            for j in range(i + 2, entries, 2):  # Normalise similar.
+                if not p[j]:  # Unprocessed.
+                    if c[j] * 0.8 < v < c[j] * 1.2:  # Similar.
+                        c[j] = newv
+                        p[j] = 1
+
+
+def random_capture(edges: int, rng: random.Random) -> [int]:
+    """
+    A noisy capture with a handful of distinct durations, like a recorded AC remote.
+    """
+    durations = [rng.choice((300, 430, 560, 1300, 1690, 3500, 4500, 10000)) for _ in range(12)]
+    return [int(rng.choice(durations) * rng.uniform(0.85, 1.15)) for _ in range(edges)]
+
+
+def boundary_capture(edges: int, rng: random.Random) -> [int]:
+    """
+    Durations exactly at ±20% of each other (and one µs off), where the comparison decides whether they are similar.
+    """
+    code = []
+    for _ in range(edges):
+        # A multiple of 60, so all of these are exact
+        base = rng.randrange(5, 170) * 60
+        code.append(rng.choice((
+            base,
+            base * 4 // 5, base * 6 // 5,
+            base * 4 // 5 - 1, base * 4 // 5 + 1,
+            base * 6 // 5 - 1, base * 6 // 5 + 1,
+            # base is 20% below and above these
+            base * 5 // 4, base * 5 // 6,
+        )))
+    return code
+
+
+def chained_capture(edges: int, rng: random.Random) -> [int]:
+    """
+    Durations each a bit less than 20% apart, so which group an entry ends up in depends on the order.
+    """
+    steps = [int(500 * 1.19 ** step) for step in range(8)]
+    return [rng.choice(steps) for _ in range(edges)]
+
+
+def edge_cases(rng: random.Random) -> list[list[int]]:
+    return [
+        [],
+        [9000],
+        [9000, 4500],
+        [560] * 50,
+        [1000, 1000, 800, 800, 1200, 1200],
+        [1000, 1, 1250, 1, 833, 1],
+        [800, 1000, 1200, 1000, 800, 1000],
+        boundary_capture(CAPTURE_SIZE, rng),
+        random_capture(CAPTURE_SIZE, rng),
+        chained_capture(CAPTURE_SIZE, rng),
+    ]
+
+
+def check(code: list[int]) -> bool:
+    expected, actual = code[:], code[:]
+    legacy_normalise(expected)
+    normalise(actual)
+    return expected == actual
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("IrManager.check_normalise")
+    parser.add_argument("-n", "--number", default=2000, type=int, help="Random codes per kind of capture.")
+    parser.add_argument("-s", "--seed", default=0, type=int, help="Seed of the random codes.")
+    parser.add_argument("--database", default="./config/database.db", help="Database to load recorded codes from.")
+    args = parser.parse_args()
+
+    from IrManager.benchmark import load_recorded_codes, SAMPLE_CODES
+
+    check_rng = random.Random(args.seed)
+    generators = {
+        "random": random_capture,
+        "boundary": boundary_capture,
+        "chained": chained_capture,
+    }
+    codes = [("edge case", code) for code in edge_cases(check_rng)]
+    codes += [("sample", code) for code in SAMPLE_CODES.values()]
+    codes += [("recorded", code) for code in load_recorded_codes(args.database).values()]
+    for kind, generator in generators.items():
+        for _ in range(args.number):
+            # Mostly short codes, some as long as the capture buffer allows
+            edges = check_rng.randrange(0, 100) if check_rng.random() < 0.8 else check_rng.randrange(100, CAPTURE_SIZE)
+            codes.append((kind, generator(edges, check_rng)))
+
+    mismatches = [(kind, code) for kind, code in codes if not check(code)]
+    for kind, code in mismatches[:5]:
+        print(f"normalise differs from the legacy implementation for a {kind} code of {len(code)} entries: {code}")
+    if mismatches:
+        print(f"{len(mismatches)} of {len(codes)} codes differ")
+        sys.exit(1)
+    print(f"normalise is identical to the legacy implementation on {len(codes)} codes")
@@ -0,0 +1,31 @@
+from collections import deque
+
+from Api.models.Metrics import LatencySummary
+
+
+class LatencyStats:
+    """
+    Rolling window of latency samples (in seconds).
+    """
+
+    def __init__(self, size: int = 256):
+        self.samples: deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> LatencySummary:
+        if not self.samples:
+            return LatencySummary(count=self.count)
+
+        # Samples may be added from other threads, copying the deque is atomic
+        samples = sorted(self.samples.copy())
+        return LatencySummary(
+            count=self.count,
+            mean_ms=round(sum(samples) / len(samples) * 1000, 3),
+            p50_ms=round(samples[len(samples) // 2] * 1000, 3),
+            p95_ms=round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+            max_ms=round(samples[-1] * 1000, 3)
+        )
@@ -0,0 +1,30 @@
+import time
+
+
+class RateCounter:
+    """
+    Counts events over the last window seconds, in one second buckets.
+    """
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self.counts = [0] * window
+        # Second (time.monotonic) each bucket was last used for
+        self.seconds = [-1] * window
+        self.count = 0
+
+    def add(self, now: float | None = None):
+        second = int(time.monotonic() if now is None else now)
+        bucket = second % self.window
+        if self.seconds[bucket] != second:
+            self.seconds[bucket] = second
+            self.counts[bucket] = 0
+        self.counts[bucket] += 1
+        self.count += 1
+
+    def rate(self, now: float | None = None) -> int:
+        """
+        Number of events in the last window seconds.
+        """
+        second = int(time.monotonic() if now is None else now)
+        return sum(count for count, used in zip(self.counts, self.seconds) if second - used < self.window)
@@ -1,36 +1,117 @@
 import asyncio
 import logging
+import time
+from concurrent.futures import Future
+
+from Api.models.Metrics import QueueLaneMetrics
+from Api.models.TaskLane import TaskLane
+from Metrics.LatencyStats import LatencyStats
+
+# Tasks of a lane that may run at the same time (None for no limit) and whether a new task cancels waiting ones
+LANES = {
+    TaskLane.RELEASE: (None, False),
+    TaskLane.INTERACTIVE: (1, False),
+    TaskLane.SCENE: (1, True),
+    TaskLane.BACKGROUND: (1, False),
+}
+
+
+class QueueLane:
+
+    def __init__(self, limit: int | None, supersede: bool):
+        self.semaphore = asyncio.Semaphore(limit) if limit is not None else None
+        self.supersede = supersede
+
+        # Tasks queued but not started yet, and those of them already waiting for the semaphore
+        self.depth = 0
+        self.waiting: set[asyncio.Task] = set()
+        self.running = 0
+        self.completed = 0
+        self.cancelled = 0
+
+        # Time from being queued to starting
+        self.wait_time = LatencyStats()
+
+    def metrics(self) -> QueueLaneMetrics:
+        return QueueLaneMetrics(
+            depth=self.depth,
+            running=self.running,
+            completed=self.completed,
+            cancelled=self.cancelled,
+            wait_time=self.wait_time.summary()
+        )
 
 
 class AsyncQueueManager:
+    """
+    Runs tasks in lanes, so a scene that takes a while to start doesn't hold up button presses.
+
+    Releases run right away. A release queued with enqueue_release runs once more after the presses still queued
+    at that point, so nothing they start stays held. Presses, scene changes and background tasks each run one after
+    another in their own lane. A new scene change cancels those still waiting, as only the latest one matters.
+    """
 
     def __init__(self):
         self.logger = logging.getLogger(__package__)
         self.loop = asyncio.get_event_loop()
 
-        self.sem = asyncio.Semaphore(n := 1)
+        self.lanes = {lane: QueueLane(limit, supersede) for lane, (limit, supersede) in LANES.items()}
 
-    async def _task_wrapper(self, coro):
-        await self.sem.acquire()
+    async def _task_wrapper(self, coro, lane: QueueLane, queued: float):
+        task = asyncio.current_task()
+        if lane.supersede:
+            for waiting in list(lane.waiting):
+                waiting.cancel()
+
+        lane.waiting.add(task)
+        try:
+            if lane.semaphore is not None:
+                await lane.semaphore.acquire()
+        except asyncio.CancelledError:
+            lane.cancelled += 1
+            coro.close()
+            raise
+        finally:
+            lane.waiting.discard(task)
+            lane.depth -= 1
+
+        lane.wait_time.add(time.perf_counter() - queued)
+        lane.running += 1
         try:
             await coro
         except Exception as e:
             self.logger.exception(e)
-        self.sem.release()
+        finally:
+            lane.running -= 1
+            lane.completed += 1
+            if lane.semaphore is not None:
+                lane.semaphore.release()
 
-    def enqueue_task(self, coro):
-        asyncio.run_coroutine_threadsafe(self._task_wrapper(coro), self.loop)
+    def enqueue_task(self, coro, lane: TaskLane = TaskLane.INTERACTIVE) -> Future:
+        queue_lane = self.lanes[lane]
+        queue_lane.depth += 1
+        return asyncio.run_coroutine_threadsafe(self._task_wrapper(coro, queue_lane, time.perf_counter()), self.loop)
 
-    async def _sync_task_wrapper(self, task, *args):
-        await self.sem.acquire()
-        try:
-            task(args)
-        except Exception as e:
-            self.logger.exception("message")
-        self.sem.release()
+    @staticmethod
+    async def _sync_task(task, *args):
+        task(*args)
+
+    def enqueue_sync_task(self, task, *args, lane: TaskLane = TaskLane.INTERACTIVE) -> Future:
+        return self.enqueue_task(self._sync_task(task, *args), lane)
+
+    def enqueue_release(self, task, *args) -> Future:
+        """
+        Queues task(*args) in the release lane, and once more after the presses that haven't started yet.
+
+        Presses that did start are already waiting for (or holding) the channel of their command, so task has to
+        release through the same channel to be ordered after them.
+        """
+        if self.lanes[TaskLane.INTERACTIVE].depth:
+            self.enqueue_task(task(*args), TaskLane.INTERACTIVE)
+        return self.enqueue_task(task(*args), TaskLane.RELEASE)
 
-    def enqueue_sync_task(self, task, *args):
-        asyncio.run_coroutine_threadsafe(self._sync_task_wrapper(task, args), self.loop)
+    def metrics(self) -> dict[str, QueueLaneMetrics]:
+        return {lane.value: queue_lane.metrics() for lane, queue_lane in self.lanes.items()}
 
     def stop(self):
-        self.loop.call_soon_threadsafe(self.loop.stop)
\ No newline at end of file
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from typing import Awaitable
+
+from Api.models.Command import Command
+from Api.models.CommandType import CommandType
+
+# All Bluetooth commands share the HID connection
+BLUETOOTH_CHANNEL = (CommandType.BLUETOOTH,)
+
+
+class CommandExecutor:
+    """
+    Sends commands on independent channels at the same time, while commands on the same channel keep their order.
+
+    All Bluetooth commands share a single HID connection, so they are one channel. Network, script and integration
+    commands have a channel per target device. IR commands aren't locked at all: they are queued with the
+    IrTransmitter right away, which sends them in order and batches those queued together into one chain.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(self):
+        self.channels: dict[tuple, asyncio.Lock] = {}
+
+    @staticmethod
+    def channel(command: Command) -> tuple | None:
+        if command.type == CommandType.IR:
+            return None
+        if command.type == CommandType.BLUETOOTH:
+            return BLUETOOTH_CHANNEL
+        return command.type, command.device_id
+
+    async def run(self, command: Command, send: Awaitable):
+        """
+        Awaits send once every command queued before on the same channel is done.
+        """
+        channel = self.channel(command)
+        if channel is None:
+            return await send
+        return await self.run_on(channel, send)
+
+    async def run_on(self, channel: tuple, send: Awaitable):
+        """
+        Awaits send once everything queued before on channel is done. Waiting is first come, first served.
+        """
+        lock = self.channels.setdefault(channel, asyncio.Lock())
+        async with lock:
+            return await send
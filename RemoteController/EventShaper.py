@@ -0,0 +1,79 @@
+import json
+import logging
+import time
+
+from Api.models.RfEventType import RfEventType
+from RfManager.RfEvent import RfEvent
+
+# Repeats of a held button handled per second at most
+REPEAT_RATE = 5
+# Presses of the same button closer together than this (in s) are handled once
+DEBOUNCE_WINDOW = 0.1
+
+
+class EventShaper:
+    """
+    Thins out RF events before RemoteController handles them.
+
+    Remotes send repeats a lot faster than devices can follow, so they are coalesced to repeat_rate per held button.
+    A press of a button that was pressed less than debounce_window ago is dropped, and so are repeats and releases
+    once nothing is held. Sleep and wake events are passed on unchanged.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(self, repeat_rate: float = REPEAT_RATE, debounce_window: float = DEBOUNCE_WINDOW):
+        self.repeat_interval = 1 / repeat_rate if repeat_rate > 0 else 0.0
+        self.debounce_window = debounce_window
+
+        # By (remote, button): time the last press and repeat were passed on, buttons passed on but not released
+        self.last_press: dict[tuple[str, str | None], float] = {}
+        self.last_repeat: dict[tuple[str, str | None], float] = {}
+        self.held: set[tuple[str, str | None]] = set()
+
+        self.repeats_coalesced = 0
+        self.presses_debounced = 0
+
+    @classmethod
+    def load(cls, path: str = "config/rf_events.json") -> "EventShaper":
+        try:
+            with open(path, "r") as file:
+                config = json.loads(file.read())
+            return cls(config.get("repeat_rate", REPEAT_RATE), config.get("debounce_window", DEBOUNCE_WINDOW))
+        except FileNotFoundError:
+            cls.logger.debug(f"\"{path}\" not found, using default repeat rate and debounce window")
+            return cls()
+
+    def shape(self, events: [RfEvent], now: float | None = None) -> list[RfEvent]:
+        """
+        Returns the events of a batch that should be handled.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        shaped = []
+        for event in events:
+            key = (event.remote, event.button)
+            match event.type:
+                case RfEventType.PRESS:
+                    last = self.last_press.get(key)
+                    if last is not None and now - last < self.debounce_window:
+                        self.presses_debounced += 1
+                        continue
+                    self.last_press[key] = now
+                    # The first repeat only counts after a full interval, the press already did the work
+                    self.last_repeat[key] = now
+                    self.held.add(key)
+                case RfEventType.REPEAT:
+                    if key not in self.held or now - self.last_repeat[key] < self.repeat_interval:
+                        self.repeats_coalesced += 1
+                        continue
+                    self.last_repeat[key] = now
+                case RfEventType.RELEASE:
+                    # Sent once all buttons of the remote are released
+                    released = {held for held in self.held if held[0] == event.remote}
+                    if not released:
+                        continue
+                    self.held -= released
+            shaped.append(event)
+        return shaped
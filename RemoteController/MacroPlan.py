@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from Api.models import Command, Macro
+
+
+class PlanStep:
+    """
+    A command of a macro, sent once the steps it depends on were sent and their devices had time to settle.
+    """
+
+    __slots__ = ("command_id", "device_id", "after", "delay")
+
+    def __init__(self, command_id: int, device_id: int | None, after: tuple[int, ...], delay: int):
+        self.command_id = command_id
+        self.device_id = device_id
+        # Indices of the steps this one waits for
+        self.after = after
+        # Time (in ms) the device needs after this command before its next one
+        self.delay = delay
+
+    def __repr__(self):
+        return f"PlanStep({self.command_id}, device {self.device_id}, after {self.after}, {self.delay} ms)"
+
+
+class MacroPlan:
+    """
+    Execution plan of a macro.
+
+    The delay after a command is the time its device needs to settle, so it only holds up the next command for the
+    same device. Commands for different devices are interleaved, and a macro takes as long as its slowest device
+    instead of the sum of all delays. Consecutive commands in the same group start together, like before.
+    Commands without a device form a chain of their own.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(self, steps: [PlanStep]):
+        self.steps = steps
+
+        # Time (in ms) after the start of the macro each step is sent at, ignoring transmission times
+        starts = []
+        for step in steps:
+            starts.append(max((starts[index] + steps[index].delay for index in step.after), default=0))
+        self.duration = max(starts, default=0)
+        self.serial_duration = sum(step.delay for step in steps[:-1])
+
+    @classmethod
+    def compile(cls, macro: Macro, get_command: Callable[[int], Command | None]) -> "MacroPlan":
+        groups = macro.groups or []
+        steps: list[PlanStep] = []
+        # Index of the last step for every device
+        last: dict[int | None, int] = {}
+        for index, command_id in enumerate(macro.command_ids):
+            command = get_command(command_id)
+            device_id = command.device_id if command is not None else None
+            delay = macro.delays[index] if index < len(macro.delays) else 0
+
+            after = (last[device_id],) if device_id in last else ()
+            # Starts together with the previous command, but still after the last one for its own device
+            if 0 < index < len(groups) and groups[index] == groups[index - 1]:
+                after = tuple(sorted(set(after) | set(steps[-1].after)))
+
+            steps.append(PlanStep(command_id, device_id, after, delay))
+            last[device_id] = index
+
+        plan = cls(steps)
+        cls.logger.debug(
+            f"Compiled macro {macro.name}: {plan.duration} ms instead of {plan.serial_duration} ms of delays"
+        )
+        return plan
+
+    async def execute(self, send: Callable[[int], Awaitable], include: Callable[[int], bool] | None = None):
+        """
+        Sends every step with send(command_id). Steps include returns False for are skipped, without a delay.
+
+        A failing command doesn't stop the other steps, the first exception is raised once all of them are done.
+        """
+        loop = asyncio.get_running_loop()
+        # Time (loop.time) each step's device is ready for its next command
+        ready = [loop.create_future() for _ in self.steps]
+
+        async def run(index: int, step: PlanStep):
+            try:
+                if step.after:
+                    start = max([await ready[after] for after in step.after])
+                    await asyncio.sleep(max(0.0, start - loop.time()))
+                if include is not None and not include(step.command_id):
+                    ready[index].set_result(loop.time())
+                    return
+                await send(step.command_id)
+            finally:
+                if not ready[index].done():
+                    ready[index].set_result(loop.time() + step.delay / 1000)
+
+        results = await asyncio.gather(*[run(index, step) for index, step in enumerate(self.steps)],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict
+
+from Api.models.Command import Command
+from Api.models.Scene import Scene
+from Api.models.SceneStatus import SceneStatus
+from RfManager.RfRemote import DEFAULT_REMOTE
+
+
+class RemoteContext:
+    """
+    Keymaps and scene of a single physical remote.
+
+    Remotes other than the default one look for their own keymaps first (keymap_<remote>_<name>.json and
+    keymap_scenes_<remote>.json) and fall back to the shared ones.
+
+    Keymap files are only parsed again once they changed on disk, and the commands of every keymap are looked up once
+    and kept, so switching between keymaps only swaps dictionaries.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    # Parsed keymap files by path, along with their mtime (in ns) when they were read
+    files: Dict[str, tuple[int, dict]] = {}
+
+    def __init__(self, name: str = DEFAULT_REMOTE):
+        self.name = name
+        self.keymap_name: str | None = None
+        self.keymap: Dict[str, int] = {}
+        self.keymap_scene: Dict[str, int] = {}
+        # Command of every button in keymap
+        self.commands: Dict[str, Command] = {}
+
+        # By keymap name: the parsed keymap, the repository generation and the commands it was resolved with
+        self.tables: Dict[str, tuple[dict, int, Dict[str, Command]]] = {}
+
+        # Scene started with this remote, each remote (like one per room) has a scene of its own
+        self.scene: Scene | None = None
+        self.scene_status: SceneStatus | None = None
+        # RemoteController.status_version the scene last changed at, the latest one is reported as current scene
+        self.scene_changed = 0
+
+    @classmethod
+    def read(cls, path: str) -> dict:
+        mtime = os.stat(path).st_mtime_ns
+        cached = cls.files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(path, "r") as file:
+            data = json.loads(file.read())
+        cls.files[path] = (mtime, data)
+        return data
+
+    def _path(self, remote_specific: str, shared: str) -> str:
+        if self.name != DEFAULT_REMOTE and Path(remote_specific).exists():
+            return remote_specific
+        return shared
+
+    def load(self, keymap_name: str = "default", repository=None) -> bool:
+        """
+        Activates a keymap, resolving its commands with repository (a RepositoryCache) if they weren't yet or might
+        have changed since. Returns whether they were resolved.
+        """
+        self.keymap_scene = self.read(self._path(f"config/keymap_scenes_{self.name}.json", "config/keymap_scenes.json"))
+        keymap = self.read(self._path(f"config/keymap_{self.name}_{keymap_name}.json", f"config/keymap_{keymap_name}.json"))
+
+        self.keymap = keymap
+        self.keymap_name = keymap_name
+        self.logger.debug(f"Loaded keymap {keymap_name} for remote {self.name}")
+        return repository is not None and self.refresh(repository)
+
+    def refresh(self, repository) -> bool:
+        """
+        Resolves the commands of the active keymap again if they might have changed. Returns whether they were.
+        """
+        table = self.tables.get(self.keymap_name)
+        if table is not None and table[0] is self.keymap and table[1] == repository.generation:
+            self.commands = table[2]
+            return False
+
+        commands = repository.get_commands(command_id for command_id in self.keymap.values() if command_id)
+        table = (self.keymap, repository.generation, {
+            button: commands[command_id] for button, command_id in self.keymap.items() if command_id in commands
+        })
+        self.tables[self.keymap_name] = table
+        self.commands = table[2]
+        return True
@@ -17,25 +17,46 @@ from Api.models.CommandGroupType import CommandGroupType
 from Api.models.CommandType import CommandType
 from Api.models.DeviceType import DeviceType
 from Api.models.IntegrationAction import IntegrationAction
+from Api.models.Metrics import SystemMetrics
 from Api.models.NetworkRequestType import NetworkRequestType
 from Api.models.RemoteButton import RemoteButton
+from Api.models.RfEventType import RfEventType
 from Api.models.Scene import Scene
 from Api.models.SceneStatus import SceneStatus
-from Api.models.Status import StatusReport
+from Api.models.Status import RemoteStatus, StatusReport
+from Api.models.TaskLane import TaskLane
 from Api.models.WebsocketResponses import BleDevice, WebsocketIrResponse
 from BleKeyboard.BleKeyboard import BleKeyboard
 from DbManager.DbManager import engine
+from IrManager.IrCompiler import load_cached
 from IrManager.IrManager import IrManager
+from IrManager.IrProtocols import compile_protocol, decode
 from RemoteController.AsyncQueueManager import AsyncQueueManager
-from RfManager.RfManager import RfManager
+from RemoteController.CommandExecutor import BLUETOOTH_CHANNEL, CommandExecutor
+from RemoteController.EventShaper import EventShaper
+from RemoteController.RemoteContext import RemoteContext
+from RemoteController.RepositoryCache import RepositoryCache
+from RfManager.RfEventStream import RfSubscription
+from RfManager.RfManager import IRQ_PIN, LOW_POWER, RfManager
+from RfManager.RfRemote import RfRemote, DEFAULT_REMOTE
 from HaManager.HaManager import HaManager
 
+# Network, script and integration commands re-sent while their button is held. Anything else, especially power
+# commands and toggles, is only sent once per press.
+REPEATABLE_GROUPS = {CommandGroupType.VOLUME, CommandGroupType.NAVIGATION, CommandGroupType.CHANNEL}
+REPEATABLE_BUTTONS = {RemoteButton.BRIGHTNESS_UP, RemoteButton.BRIGHTNESS_DOWN}
+REPEATABLE_ACTIONS = {IntegrationAction.BRIGHTNESS_UP, IntegrationAction.BRIGHTNESS_DOWN}
+NEVER_REPEATED_BUTTONS = {RemoteButton.POWER_TOGGLE, RemoteButton.POWER_ON, RemoteButton.POWER_OFF}
+
+
 class RemoteController:
 
     status: StatusReport = StatusReport()
+    # Incremented whenever status changes
+    status_version: int = 0
 
-    keymap: Dict[str, int] = []
-    keymap_scene: Dict[str, int] = []
+    # Keymaps and scene of every remote, by remote name
+    remotes: Dict[str, RemoteContext] = {}
 
     logger: logging
     is_dev: Boolean
@@ -44,27 +65,46 @@ class RemoteController:
     ir_manager: IrManager
     ha_manager: HaManager|None = None
     queue: AsyncQueueManager
+    executor: CommandExecutor
 
     status_callback: AsyncJsonCallback|None = None
 
-    cached_commands: {int:Command} = None
+    rf_events_task: asyncio.Task|None = None
+    event_shaper: EventShaper
+
+    # Scene changes and repeated commands that were queued and haven't finished yet
+    pending_tasks: set = set()
+
+    repository: RepositoryCache
 
     @classmethod
-    async def create(cls, rf_addresses: list[bytes], ha_url: str|None = None, ha_token: str|None = None):
+    async def create(cls, rf_remotes: list[RfRemote], ha_url: str|None = None, ha_token: str|None = None,
+                     rf_irq_pin: int|None = IRQ_PIN, rf_low_power: bool = LOW_POWER):
         self = cls()
 
+        self.remotes = {remote.name: RemoteContext(remote.name) for remote in rf_remotes}
+        if not self.remotes:
+            self.remotes = {DEFAULT_REMOTE: RemoteContext()}
+
         self.logger = logging.getLogger(__package__)
 
         self.is_dev = False
 
         self.ble_keyboard = await BleKeyboard.create()
 
-        self.rf_manager = RfManager()
-        self.rf_manager.start_listener(addresses=rf_addresses)
+        self.rf_manager = RfManager(irq_pin=rf_irq_pin, low_power=rf_low_power)
+        rf_events = self.rf_manager.subscribe()
+        self.rf_manager.start_listener(remotes=rf_remotes)
+        self.event_shaper = EventShaper.load()
 
         self.ir_manager = IrManager()
 
         self.queue = AsyncQueueManager()
+        self.pending_tasks = set()
+        self.executor = CommandExecutor()
+
+        self.repository = RepositoryCache()
+        self.repository.load()
 
         if ha_url is not None and ha_token is not None:
             self.ha_manager = HaManager(ha_url, ha_token)
@@ -74,6 +114,8 @@ class RemoteController:
         except FileNotFoundError:
             self.logger.warning("Couldn't find \"keymap_default.json\", no keymap will be active.")
 
+        self.rf_events_task = asyncio.create_task(self.handle_rf_events(rf_events))
+
         self.logger.debug("Remote controller ready")
 
         return self
@@ -86,7 +128,14 @@ class RemoteController:
 
         self.is_dev = True
 
+        self.remotes = {DEFAULT_REMOTE: RemoteContext()}
+
         self.queue = AsyncQueueManager()
+        self.pending_tasks = set()
+        self.executor = CommandExecutor()
+
+        self.repository = RepositoryCache()
+        self.repository.load()
 
         if ha_url is not None and ha_token is not None:
             self.ha_manager = HaManager(ha_url, ha_token)
@@ -102,9 +151,13 @@ class RemoteController:
 
 
     async def shutdown(self):
+        self.repository.close()
         if not self.is_dev:
             self.ir_manager.cancel_recording()
+            self.ir_manager.transmitter.stop()
             self.rf_manager.stop_listener()
+            if self.rf_events_task is not None:
+                self.rf_events_task.cancel()
             await self.ble_keyboard.disconnect()
 
     async def record_ir_command(self, data, websocket: WebSocket):
@@ -127,7 +180,12 @@ class RemoteController:
                     code = await self.ir_manager.record_command(new_command.name, websocket)
 
                     if code:
-                        db_command.ir_action = code
+                        decoded = decode(code)
+                        if decoded:
+                            db_command.ir_protocol, db_command.ir_address, db_command.ir_command = decoded
+                            self.logger.debug(f"Recognized IR code as {decoded[0].value}, storing it compactly")
+                        else:
+                            db_command.ir_action = code
 
                         session.add(db_command)
                         session.commit()
@@ -139,13 +197,12 @@ class RemoteController:
                         await websocket.send_json(WebsocketIrResponse.CANCELLED)
                         await websocket.close()
 
-    async def execute_macro(self, macro: Macro, from_start: bool = False, from_stop: bool = False):
-        for index, command_id in enumerate(macro.command_ids):
-            await self.send_command(command_id, from_start=from_start, from_stop=from_stop)
-            #await self.send_db_command(command, from_start=from_start, from_stop=from_stop)
-
-            if index < len(macro.delays):
-                await asyncio.sleep(macro.delays[index] / 1000)
+    async def execute_macro(self, macro: Macro, from_start: bool = False, from_stop: bool = False, include=None):
+        # Delays only hold up later commands for the same device, see MacroPlan
+        await self.repository.plan(macro).execute(
+            lambda command_id: self.send_command(command_id, from_start=from_start, from_stop=from_stop),
+            include=include
+        )
 
 
     async def send_db_command(self, command: Command, press_without_release = False, from_start: bool = False, from_stop: bool = False):
@@ -165,6 +222,17 @@ class RemoteController:
             if (command.button == RemoteButton.POWER_OFF or command.button == RemoteButton.POWER_TOGGLE) and not current_status.powered:
                 return
 
+        # Waits for earlier commands on the same channel only
+        await self.executor.run(command, self._send_on_channel(command, press_without_release))
+
+        # TODO: Maybe make this configurable?
+        # In my usage, this was more annoying than helpful as it lead to breakage of scenes when manually
+        # correcting things, like turning on the TV after it missed the initial command
+        if from_start or from_stop:
+            await self.set_state_for_command(command)
+
+
+    async def _send_on_channel(self, command: Command, press_without_release = False):
         match command.type:
             case CommandType.IR:
                 await self.send_ir_command(command, press_without_release=press_without_release)
@@ -177,28 +245,13 @@ class RemoteController:
             case CommandType.INTEGRATION:
                 self.send_integration_command(command)
 
-        # TODO: Maybe make this configurable?
-        # In my usage, this was more annoying than helpful as it lead to breakage of scenes when manually
-        # correcting things, like turning on the TV after it missed the initial command
-        if from_start or from_stop:
-            await self.set_state_for_command(command)
-
-
     async def send_command(self, command_id: int, press_without_release = False, from_start: bool = False, from_stop: bool = False):
-        command_db = self.cached_commands.get(command_id)
+        command_db = self.repository.get_command(command_id)
 
         if command_db:
             await self.send_db_command(command_db, press_without_release, from_start=from_start, from_stop=from_stop)
         else:
-            self.logger.debug(f"Command {command_id} is not cached, loading from db...")
-            with Session(engine) as session:
-                command_db = session.get(Command, command_id)
-                if command_db:
-                    self.cached_commands[command_id] = command_db
-                    self.logger.debug(f"Loaded and cached command {command_id} from db.")
-                    await self.send_db_command(command_db, press_without_release, from_start=from_start, from_stop=from_stop)
-                else:
-                    self.logger.error(f"Tried to send command {command_id}, which doesn't exist in the database.")
+            self.logger.error(f"Tried to send command {command_id}, which doesn't exist in the database.")
 
 
 
@@ -207,17 +260,26 @@ class RemoteController:
         if self.is_dev:
             return
 
-        ir_command = command.ir_action
+        ir_command = self._ir_code(command)
 
         if ir_command:
             if press_without_release:
-                await self.ir_manager.send_and_repeat(ir_command)
+                gap = command.ir_repeat_gap * 1000 if command.ir_repeat_gap is not None else None
+                await self.ir_manager.send_and_repeat(ir_command, gap=gap, device=command.device_id)
             else:
-                await self.ir_manager.send_command(ir_command)
+                await self.ir_manager.send_command(ir_command, device=command.device_id)
             return "Command sent"
         else:
             raise HTTPException(status_code=500, detail="Command doesn't include executable action")
 
+    @staticmethod
+    def _ir_code(command: Command):
+        if command.ir_compiled:
+            return load_cached(command.ir_compiled)
+        if command.ir_protocol is not None:
+            return compile_protocol(command.ir_protocol, command.ir_address, command.ir_command)
+        return command.ir_action
+
     async def send_bt_command(self, command: Command, press_without_release = False, release_only=False):
 
         if self.is_dev:
@@ -321,79 +383,94 @@ class RemoteController:
             case IntegrationAction.BRIGHTNESS_DOWN:
                 self.ha_manager.decrease_brightness()
 
-    async def start_scene(self, scene_id: int):
+    async def start_scene(self, scene_id: int, remote: str | None = None):
+        """
+        Starts the scene for the given remote, stopping the scene that remote started before. Without a remote, the
+        scene is started for all of them.
+        """
 
-        with Session(engine) as session:
-            scene_db = session.get(Scene, scene_id)
+        scene_db = self.repository.get_scene(scene_id)
 
-            if not scene_db:
-                raise HTTPException(status_code=404, detail="Scene not found")
+        if not scene_db:
+            raise HTTPException(status_code=404, detail="Scene not found")
+
+        contexts = self._contexts(remote)
 
-            previous_scene = self.status.current_scene
-            if previous_scene is not None and scene_db.start_macro is not None:
-                skip_power_down_for = set()
-                for command in scene_db.start_macro.commands:
-                    if command.device_id is not None and (command.button == RemoteButton.POWER_TOGGLE or command.button == RemoteButton.POWER_ON):
-                        skip_power_down_for.add(command.device_id)
+        if any(context.scene is not None for context in contexts) and scene_db.start_macro is not None:
+            skip_power_down_for = set()
+            for command in scene_db.start_macro.commands:
+                if command.device_id is not None and (command.button == RemoteButton.POWER_TOGGLE or command.button == RemoteButton.POWER_ON):
+                    skip_power_down_for.add(command.device_id)
 
-                await self.stop_current_scene(skip_power_down_for=skip_power_down_for)
+            await self.stop_current_scene(skip_power_down_for=skip_power_down_for, remote=remote)
 
-            await self._update_current_scene(new_scene=scene_db, new_scene_state=SceneStatus.STARTING)
+        await self._update_current_scene(contexts, new_scene=scene_db, new_scene_state=SceneStatus.STARTING)
 
-            bt_address = scene_db.bluetooth_address
-            if bt_address and not self.is_dev:
-                await self.ble_keyboard.unregister_services()
-                await self.ble_keyboard.connect(bt_address)
-                await self.ble_keyboard.register_services()
+        bt_address = scene_db.bluetooth_address
+        if bt_address and not self.is_dev:
+            await self.ble_keyboard.unregister_services()
+            await self.ble_keyboard.connect(bt_address)
+            await self.ble_keyboard.register_services()
 
-            if scene_db.start_macro is not None:
-                await self.execute_macro(scene_db.start_macro, from_start=True)
-                #for index, command in enumerate(scene_db.start_macro.commands):
-                #    await self.send_db_command(command, from_start=True)
-                #    if index < len(scene_db.start_macro.commands)-1:
-                #        await asyncio.sleep(scene_db.start_macro.delays[index]/1000)
+        if scene_db.start_macro is not None:
+            await self.execute_macro(scene_db.start_macro, from_start=True)
+            #for index, command in enumerate(scene_db.start_macro.commands):
+            #    await self.send_db_command(command, from_start=True)
+            #    if index < len(scene_db.start_macro.commands)-1:
+            #        await asyncio.sleep(scene_db.start_macro.delays[index]/1000)
 
-            if scene_db.keymap:
-                self.load_key_map(scene_db.keymap)
+        if scene_db.keymap:
+            self.load_key_map(scene_db.keymap, contexts)
 
-            await self._update_current_scene(new_scene=scene_db, new_scene_state=SceneStatus.ACTIVE)
+        await self._update_current_scene(contexts, new_scene=scene_db, new_scene_state=SceneStatus.ACTIVE)
 
-            self.logger.info(f"Scene {scene_db.name} started!")
+        self.logger.info(f"Scene {scene_db.name} started!")
 
     def get_current_status(self) -> StatusReport:
         return self.status
 
+    def get_metrics(self) -> SystemMetrics:
+        metrics = SystemMetrics(queue=self.queue.metrics(), cache=self.repository.metrics())
+        if not self.is_dev:
+            metrics.ir = self.ir_manager.metrics()
+            metrics.rf = self.rf_manager.metrics()
+            metrics.rf.repeats_coalesced = self.event_shaper.repeats_coalesced
+            metrics.rf.presses_debounced = self.event_shaper.presses_debounced
+        return metrics
+
     # Updates active scene without executing start commands
-    async def set_current_scene(self, scene_id: int):
+    async def set_current_scene(self, scene_id: int, remote: str | None = None):
 
-        with Session(engine) as session:
-            scene_db = session.get(Scene, scene_id)
+        scene_db = self.repository.get_scene(scene_id)
 
-            if not scene_db:
-                raise HTTPException(status_code=404, detail="Scene not found")
+        if not scene_db:
+            raise HTTPException(status_code=404, detail="Scene not found")
 
-            bt_address = scene_db.bluetooth_address
-            if bt_address:
-                await self.ble_keyboard.unregister_services()
-                await self.ble_keyboard.connect(bt_address)
-                await self.ble_keyboard.register_services()
+        contexts = self._contexts(remote)
 
-            previous_scene = self.status.current_scene
-            if previous_scene is not None and previous_scene.stop_macro is not None:
+        bt_address = scene_db.bluetooth_address
+        if bt_address:
+            await self.ble_keyboard.unregister_services()
+            await self.ble_keyboard.connect(bt_address)
+            await self.ble_keyboard.register_services()
+
+        previous_scenes = {context.scene.id: context.scene for context in contexts if context.scene is not None}
+        for previous_scene in previous_scenes.values():
+            if previous_scene.stop_macro is not None:
                 previous_scene_stop_commands = previous_scene.stop_macro.commands
                 if previous_scene_stop_commands:
                     await self.set_states_for_commands(previous_scene_stop_commands)
 
-            new_scene_commands = scene_db.start_macro.commands
-            if new_scene_commands:
-                await self.set_states_for_commands(new_scene_commands)
+        new_scene_commands = scene_db.start_macro.commands if scene_db.start_macro is not None else []
+        if new_scene_commands:
+            await self.set_states_for_commands(new_scene_commands)
 
-            await self._update_current_scene(new_scene=scene_db, new_scene_state=SceneStatus.ACTIVE)
+        await self._update_current_scene(contexts, new_scene=scene_db, new_scene_state=SceneStatus.ACTIVE)
 
-            if scene_db.keymap:
-                self.load_key_map(scene_db.keymap)
+        if scene_db.keymap:
+            self.load_key_map(scene_db.keymap, contexts)
 
-            self.logger.info(f"Set {scene_db.name} as current scene.")
+        self.logger.info(f"Set {scene_db.name} as current scene.")
 
     async def set_state_for_command(self, command: Command):
         if command.device_id is not None:
@@ -411,63 +488,82 @@ class RemoteController:
         for command in commands:
             await self.set_state_for_command(command)
 
-    async def stop_current_scene(self, skip_power_down_for=None):
+    async def stop_current_scene(self, skip_power_down_for=None, remote: str | None = None):
+        """
+        Stops the scene the given remote started, or those of all remotes without a remote. Devices that are part of
+        a scene another remote is still in aren't powered down.
+        """
         if skip_power_down_for is None:
             skip_power_down_for = set()
 
-        if not self.status.current_scene.id:
+        contexts = [context for context in self._contexts(remote) if context.scene is not None and context.scene.id]
+        if not contexts:
             raise HTTPException(status_code=404, detail="No scene active")
 
-        with Session(engine) as session:
-            scene_db = session.get(Scene, self.status.current_scene.id)
+        # Several remotes are in the same scene if it was started for all of them
+        scenes: Dict[int, list[RemoteContext]] = {}
+        for context in contexts:
+            scenes.setdefault(context.scene.id, []).append(context)
 
-            self.load_key_map("default")
+        for scene_id, scene_contexts in scenes.items():
+            scene_db = self.repository.get_scene(scene_id)
+
+            self.load_key_map("default", scene_contexts)
 
             if not scene_db:
-                raise HTTPException(status_code=404, detail=f"Couldn't find scene with ID {self.status.current_scene.id}.")
+                raise HTTPException(status_code=404, detail=f"Couldn't find scene with ID {scene_id}.")
 
-            await self._update_current_scene_status(new_scene_state=SceneStatus.STOPPING)
+            await self._update_current_scene_status(scene_contexts, new_scene_state=SceneStatus.STOPPING)
 
             bt_address = scene_db.bluetooth_address
             if bt_address and not self.is_dev:
                 await self.ble_keyboard.disconnect(bt_address)
 
             if scene_db.stop_macro is not None:
-                for index, command_id in enumerate(scene_db.stop_macro.command_ids):
-                    command = session.get(Command, command_id)
-                    if command is not None:
-                        if ((command.device_id is None or command.device_id not in skip_power_down_for)
-                                and (command.button == RemoteButton.POWER_TOGGLE or command.button == RemoteButton.POWER_OFF)):
-                            await self.send_command(command_id, from_stop=True)
-                            if index < len(scene_db.stop_macro.delays):
-                                await asyncio.sleep(scene_db.stop_macro.delays[index]/1000)
-
-            await self._update_current_scene(new_scene=None, new_scene_state=None)
-
-            self.logger.info(f"Scene {scene_db.name} stopped!")
-
+                in_use = {
+                    device.id
+                    for context in self.remotes.values() if context.scene is not None and context not in contexts
+                    for device in context.scene.devices
+                }
 
-    def load_key_map(self, keymap_name: str = "default"):
+                def powers_down(command_id: int) -> bool:
+                    command = self.repository.get_command(command_id)
+                    return (command is not None
+                            and (command.device_id is None
+                                 or (command.device_id not in skip_power_down_for and command.device_id not in in_use))
+                            and (command.button == RemoteButton.POWER_TOGGLE or command.button == RemoteButton.POWER_OFF))
 
-        with open("config/keymap_scenes.json", "r") as file:
-            keymap_scene_data = file.read()
-            self.keymap_scene = json.loads(keymap_scene_data)
+                await self.execute_macro(scene_db.stop_macro, from_stop=True, include=powers_down)
 
-        with open(f"config/keymap_{keymap_name}.json") as file:
-            keymap_data = file.read()
-            self.keymap = json.loads(keymap_data)
+            await self._update_current_scene(scene_contexts, new_scene=None, new_scene_state=None)
 
-        self.cached_commands = {}
-        for command_id in self.keymap.values():
-            if command_id:
-                with Session(engine) as session:
-                    command_db = session.get(Command, command_id)
-                    if command_db:
-                        self.cached_commands[command_id] = command_db
+            self.logger.info(f"Scene {scene_db.name} stopped!")
 
-        if not self.is_dev:
-            self.rf_manager.set_callback(self.handle_button_press)
-            self.rf_manager.set_release_callback(self.handle_button_release)
+    def _contexts(self, remote: str | None) -> list[RemoteContext]:
+        """
+        The context of the given remote, or those of all remotes if it is None.
+        """
+        if remote is None:
+            return list(self.remotes.values())
+        context = self.remotes.get(remote)
+        if context is None:
+            raise HTTPException(status_code=404, detail=f"Remote {remote} not found")
+        return [context]
+
+    def load_key_map(self, keymap_name: str = "default", remotes: list[RemoteContext] | None = None):
+
+        # Keymaps that were loaded before and didn't change are only swapped in
+        if remotes is None:
+            remotes = self.remotes.values()
+        resolved = [remote for remote in remotes if remote.load(keymap_name, self.repository)]
+
+        if not self.is_dev and resolved:
+            commands = {command.id: command for remote in resolved for command in remote.commands.values()}
+            self.ir_manager.warm_cache([
+                self._ir_code(command)
+                for command in commands.values()
+                if command.type == CommandType.IR and self._ir_code(command)
+            ])
         self.logger.debug(f"Loaded keymap {keymap_name}")
 
     def suggest_keymap(self, scene: Scene):
@@ -557,44 +653,128 @@ class RemoteController:
 
         return keymap_suggestion
 
-    def handle_button_press(self, button):
+    async def handle_rf_events(self, rf_events: RfSubscription):
+        with rf_events:
+            async for events in rf_events:
+                for event in self.event_shaper.shape(events):
+                    try:
+                        match event.type:
+                            case RfEventType.PRESS:
+                                self.handle_button_press(event.button, event.remote)
+                            case RfEventType.REPEAT:
+                                self.handle_button_repeat(event.button, event.remote)
+                            case RfEventType.RELEASE:
+                                self.handle_button_release(event.button)
+                    except Exception as e:
+                        self.logger.exception(e)
+
+    def handle_button_press(self, button, remote: str = DEFAULT_REMOTE):
+        context = self.remotes.get(remote)
+        if context is None:
+            self.logger.warning(f"Button {button} pressed on unknown remote {remote}")
+            return
+
+        # Scene buttons only change the scene of the remote they were pressed on
         if button == "Off":
-            self.queue.enqueue_task(self.stop_current_scene())
+            self._enqueue_once(("scene", remote, None), TaskLane.SCENE, self.stop_current_scene, None, remote)
             return
 
-        scene_id = self.keymap_scene.get(button)
+        scene_id = context.keymap_scene.get(button)
         if scene_id:
-            self.queue.enqueue_task(self.start_scene(scene_id))
+            self._enqueue_once(("scene", remote, scene_id), TaskLane.SCENE, self.start_scene, scene_id, remote)
+            return
+
+        # Only does something if commands were changed since the keymap was loaded
+        context.refresh(self.repository)
+        command = context.commands.get(button)
+        if command is not None:
+            self.queue.enqueue_task(self.send_db_command(command, press_without_release=True), TaskLane.INTERACTIVE)
+
+    def handle_button_repeat(self, button, remote: str = DEFAULT_REMOTE):
+        context = self.remotes.get(remote)
+        if button is None or button == "Off" or context is None or context.keymap_scene.get(button):
             return
 
-        command_id = self.keymap.get(button)
-        if command_id:
-            self.queue.enqueue_task(self.send_command(command_id, press_without_release=True))
+        context.refresh(self.repository)
+        command = context.commands.get(button)
+        if command is None or not self.is_repeatable(command):
+            return
+        self._enqueue_once(("repeat", remote, button), TaskLane.INTERACTIVE, self.send_db_command, command)
+
+    @staticmethod
+    def is_repeatable(command: Command) -> bool:
+        """
+        Whether a command is sent again on every repeat of a held button.
+        """
+        # IR and Bluetooth commands are repeated by their transport until the button is released
+        if command.type in (CommandType.IR, CommandType.BLUETOOTH):
+            return False
+        if (command.button in NEVER_REPEATED_BUTTONS or command.command_group == CommandGroupType.POWER
+                or command.integration_action == IntegrationAction.TOGGLE_LIGHT):
+            return False
+        return (command.command_group in REPEATABLE_GROUPS or command.button in REPEATABLE_BUTTONS
+                or command.integration_action in REPEATABLE_ACTIONS)
+
+    def _enqueue_once(self, key, lane: TaskLane, task, *args):
+        """
+        Queues task(*args) unless a task with the same key is still queued or running.
+        """
+        if key in self.pending_tasks:
+            self.logger.debug(f"{key} is already queued, skipping")
+            return
+        self.pending_tasks.add(key)
+        # Also called if the task is cancelled before it started
+        future = self.queue.enqueue_task(task(*args), lane)
+        future.add_done_callback(lambda _: self.pending_tasks.discard(key))
 
-    def _release_all(self, _):
+    async def _release_all(self):
         self.ir_manager.stop_repeating()
+        # A Bluetooth press that started but still waits for the channel (like while a scene sends Bluetooth
+        # commands) is sent first, otherwise its key would be released before it is pressed and stay held
+        await self.executor.run_on(BLUETOOTH_CHANNEL, self._release_keys())
+
+    async def _release_keys(self):
         self.ble_keyboard.release_keys()
         self.ble_keyboard.release_media_keys()
 
     def handle_button_release(self, _):
-        self.queue.enqueue_sync_task(self._release_all, self)
+        self.queue.enqueue_release(self._release_all)
 
     async def update_device_status(self, device_id: int, new_power_state: bool | None = None, new_input: int | None = None, toggle_power: bool | None = None):
 
         self.status.devices.set_state(device_id, new_power_state=new_power_state, new_input=new_input, toggle_power=toggle_power)
+        self.status_version += 1
 
         if self.status_callback is not None:
             await self.status_callback(self.status)
 
-    async def _update_current_scene_status(self, new_scene_state: SceneStatus | None):
-        self.status.scene_status = new_scene_state
-
-        if self.status_callback is not None:
-            await self.status_callback(self.status)
-
-    async def _update_current_scene(self, new_scene: Scene | None, new_scene_state: SceneStatus | None):
-        self.status.current_scene = new_scene
-        self.status.scene_status = new_scene_state
+    async def _update_current_scene_status(self, contexts: list[RemoteContext], new_scene_state: SceneStatus | None):
+        for context in contexts:
+            context.scene_status = new_scene_state
+        await self._publish_scenes(contexts)
+
+    async def _update_current_scene(self, contexts: list[RemoteContext], new_scene: Scene | None, new_scene_state: SceneStatus | None):
+        for context in contexts:
+            context.scene = new_scene
+            context.scene_status = new_scene_state
+        await self._publish_scenes(contexts)
+
+    async def _publish_scenes(self, changed: list[RemoteContext]):
+        self.status_version += 1
+        for context in changed:
+            context.scene_changed = self.status_version
+
+        self.status.remotes = {
+            name: RemoteStatus(current_scene=context.scene, scene_status=context.scene_status)
+            for name, context in self.remotes.items()
+        }
+        latest = max(
+            (context for context in self.remotes.values() if context.scene is not None),
+            key=lambda context: context.scene_changed,
+            default=None
+        )
+        self.status.current_scene = latest.scene if latest is not None else None
+        self.status.scene_status = latest.scene_status if latest is not None else None
 
         if self.status_callback is not None:
             await self.status_callback(self.status)
@@ -0,0 +1,215 @@
+import logging
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from Api.models import Command, Device, Macro, Scene
+from Api.models.Metrics import CacheMetrics
+from Api.models.UserImage import UserImage
+from DbManager.DbManager import engine
+from RemoteController.MacroPlan import MacroPlan
+
+# Changes to these invalidate cached entries, anything else isn't cached
+TRACKED_MODELS = (Command, Device, Macro, Scene, UserImage)
+
+
+class RepositoryCache:
+    """
+    Commands, devices, macros and scenes kept in memory, so pressing a button doesn't touch the database.
+
+    Everything is loaded in one go at startup, along with the relationships the controller uses, and detached from
+    its session. Changes committed through any session (like those of the routers) invalidate the affected entries,
+    which are loaded again the next time they are needed. Execution plans of macros are cached as well.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(self):
+        self.commands: dict[int, Command] = {}
+        self.devices: dict[int, Device] = {}
+        self.macros: dict[int, Macro] = {}
+        self.scenes: dict[int, Scene] = {}
+        self.plans: dict[int, MacroPlan] = {}
+
+        # Invalidation happens on the threads of the routers
+        self.lock = threading.Lock()
+
+        # Incremented whenever cached commands are invalidated, so anything derived from them can be rebuilt
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        event.listen(Session, "after_flush", self._after_flush)
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_rollback", self._after_rollback)
+
+    def close(self):
+        event.remove(Session, "after_flush", self._after_flush)
+        event.remove(Session, "after_commit", self._after_commit)
+        event.remove(Session, "after_rollback", self._after_rollback)
+
+    @staticmethod
+    def _command_options():
+        # Detached commands can't load their device later
+        return (selectinload(Command.device),)
+
+    @staticmethod
+    def _scene_options():
+        return (
+            selectinload(Scene.devices),
+            selectinload(Scene.image),
+            selectinload(Scene.start_macro).selectinload(Macro.commands),
+            selectinload(Scene.stop_macro).selectinload(Macro.commands),
+            selectinload(Scene.macros).selectinload(Macro.commands),
+        )
+
+    def load(self):
+        """
+        Replaces the whole cache with the current contents of the database.
+        """
+        with Session(engine) as session:
+            commands = session.exec(select(Command).options(*self._command_options())).all()
+            devices = session.exec(select(Device).options(selectinload(Device.commands))).all()
+            macros = session.exec(select(Macro).options(selectinload(Macro.commands))).all()
+            scenes = session.exec(select(Scene).options(*self._scene_options())).all()
+            session.expunge_all()
+
+        with self.lock:
+            self.commands = {command.id: command for command in commands}
+            self.devices = {device.id: device for device in devices}
+            self.macros = {macro.id: macro for macro in macros}
+            self.scenes = {scene.id: scene for scene in scenes}
+            self.plans = {}
+        self.logger.debug(
+            f"Cached {len(commands)} commands, {len(devices)} devices, {len(macros)} macros and {len(scenes)} scenes"
+        )
+
+    def _get(self, cache: dict, model, id: int, *options):
+        entry = cache.get(id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        with Session(engine) as session:
+            entry = session.exec(select(model).where(model.id == id).options(*options)).first()
+            if entry is None:
+                return None
+            session.expunge_all()
+        with self.lock:
+            cache[id] = entry
+        return entry
+
+    def get_command(self, command_id: int) -> Command | None:
+        return self._get(self.commands, Command, command_id, *self._command_options())
+
+    def get_commands(self, command_ids) -> dict[int, Command]:
+        """
+        Looks up many commands at once, those not cached with a single query (and one for their devices).
+        """
+        commands = {}
+        missing = []
+        for command_id in command_ids:
+            command = self.commands.get(command_id)
+            if command is not None:
+                commands[command_id] = command
+            else:
+                missing.append(command_id)
+        self.hits += len(commands)
+
+        if missing:
+            self.misses += len(missing)
+            with Session(engine) as session:
+                loaded = session.exec(
+                    select(Command).where(Command.id.in_(missing)).options(*self._command_options())
+                ).all()
+                session.expunge_all()
+            with self.lock:
+                for command in loaded:
+                    self.commands[command.id] = command
+                    commands[command.id] = command
+        return commands
+
+    def get_device(self, device_id: int) -> Device | None:
+        return self._get(self.devices, Device, device_id, selectinload(Device.commands))
+
+    def get_macro(self, macro_id: int) -> Macro | None:
+        return self._get(self.macros, Macro, macro_id, selectinload(Macro.commands))
+
+    def get_scene(self, scene_id: int) -> Scene | None:
+        return self._get(self.scenes, Scene, scene_id, *self._scene_options())
+
+    def macro_commands(self, macro: Macro) -> list[Command]:
+        """
+        Commands of a macro in the order they are sent, unlike Macro.commands.
+        """
+        return [command for command in map(self.get_command, macro.command_ids) if command is not None]
+
+    def plan(self, macro: Macro) -> MacroPlan:
+        if macro.id is None:
+            return MacroPlan.compile(macro, self.get_command)
+        plan = self.plans.get(macro.id)
+        if plan is None:
+            plan = MacroPlan.compile(macro, self.get_command)
+            with self.lock:
+                self.plans[macro.id] = plan
+        return plan
+
+    def metrics(self) -> CacheMetrics:
+        return CacheMetrics(
+            hits=self.hits,
+            misses=self.misses,
+            commands=len(self.commands),
+            devices=len(self.devices),
+            macros=len(self.macros),
+            scenes=len(self.scenes),
+            plans=len(self.plans)
+        )
+
+    def invalidate(self, changes: set[tuple[type, int]]):
+        with self.lock:
+            for model, id in changes:
+                if model is Command:
+                    self.commands.pop(id, None)
+                    self.generation += 1
+                    # Devices include their commands, new ones aren't known yet
+                    self.devices = {}
+                    for macro_id in [macro_id for macro_id, macro in self.macros.items() if id in macro.command_ids]:
+                        self.macros.pop(macro_id, None)
+                    # A different device changes the plans of all macros with this command
+                    self.plans = {
+                        macro_id: plan for macro_id, plan in self.plans.items()
+                        if all(step.command_id != id for step in plan.steps)
+                    }
+                elif model is Device:
+                    self.devices.pop(id, None)
+                    for command_id in [command_id for command_id, command in self.commands.items()
+                                       if command.device_id == id]:
+                        self.commands.pop(command_id, None)
+                        self.generation += 1
+                elif model is Macro:
+                    self.macros.pop(id, None)
+                    self.plans.pop(id, None)
+            # Scenes include their devices, macros, commands and image
+            if changes:
+                self.scenes = {}
+        self.logger.debug(f"Invalidated {len(changes)} cached entries")
+
+    @staticmethod
+    def _after_flush(session: Session, _):
+        changes = session.info.setdefault("repository_changes", set())
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(instance, TRACKED_MODELS) and instance.id is not None:
+                changes.add((type(instance), instance.id))
+
+    def _after_commit(self, session: Session):
+        changes = session.info.pop("repository_changes", None)
+        if changes:
+            self.invalidate(changes)
+
+    @staticmethod
+    def _after_rollback(session: Session):
+        session.info.pop("repository_changes", None)
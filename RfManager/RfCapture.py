@@ -0,0 +1,65 @@
+import struct
+import threading
+
+# Capture files start with MAGIC and the format version, followed by one record per payload: the time since the
+# previous payload (in µs), the pipe, the payload length and the payload itself.
+MAGIC = b"EQRF"
+VERSION = 1
+HEADER = struct.Struct("<4sB")
+RECORD = struct.Struct("<IBB")
+
+MAX_DELTA = 0xFFFFFFFF
+
+
+class RfCaptureWriter:
+    """
+    Logs received payloads with their arrival time to a capture file, to be replayed by RfReplay.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.last_time: float | None = None
+        self.count = 0
+        # Payloads are written by the listener thread, the capture may be closed from another one
+        self.lock = threading.Lock()
+
+    def write(self, timestamp: float, pipe: int, payload: bytes):
+        with self.lock:
+            if self.file.closed:
+                return
+            self._write(timestamp, pipe, payload)
+
+    def _write(self, timestamp: float, pipe: int, payload: bytes):
+        delta = 0 if self.last_time is None else round((timestamp - self.last_time) * 1_000_000)
+        self.last_time = timestamp
+        self.file.write(RECORD.pack(min(delta, MAX_DELTA), pipe, len(payload)))
+        self.file.write(payload)
+        self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_capture(path: str) -> list[tuple[float, int, bytes]]:
+    """
+    Reads a capture file, returning (seconds since the first payload, pipe, payload) for every payload.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not an RF capture file (version {VERSION})")
+
+    records = []
+    offset = HEADER.size
+    timestamp = 0
+    while offset < len(data):
+        delta, pipe, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        timestamp += delta
+        records.append((timestamp / 1_000_000, pipe, bytes(data[offset:offset + length])))
+        offset += length
+    return records
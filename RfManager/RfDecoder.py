@@ -0,0 +1,94 @@
+import json
+import logging
+
+from Api.models.RfEventType import RfEventType
+from RfManager.RfEvent import RfEvent
+from RfManager.RfRemote import DEFAULT_REMOTE
+
+# Control codes sent by the remote
+IDLE = 0x40044c
+SLEEP = 0x4f0300
+WAKE = 0x4f0700
+REPEAT = 0x400028
+# All buttons released
+RELEASE = 0x4f0004
+# A single button was released, always followed by RELEASE if it was the only one pressed. If multiple buttons are
+# pressed at the same time, this could be used to differentiate them (somewhat).
+BUTTON_RELEASED = (0xc10000, 0xc30000)
+
+# Table entries for codes that depend on the last pressed button, and the default for codes not in the table
+_REPEAT = RfEvent(RfEventType.REPEAT)
+_RELEASE = RfEvent(RfEventType.RELEASE)
+_UNKNOWN = RfEvent(RfEventType.PRESS)
+
+
+class RfDecoder:
+    """
+    Turns payloads into events with a single lookup of the 3 byte command in a table built at startup.
+
+    Every remote has its own decoder, as repeats and releases refer to the last button pressed on the same remote.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(self, known_commands: dict[int, str], remote: str = DEFAULT_REMOTE):
+        self.known_commands = known_commands
+        self.remote = remote
+        self.last_key: str | None = None
+
+        # None for repeats and releases before any known button was pressed
+        buttons = set(known_commands.values()) | {None}
+        self.repeat_events = {button: RfEvent(RfEventType.REPEAT, button, remote) for button in buttons}
+        self.release_events = {button: RfEvent(RfEventType.RELEASE, button, remote) for button in buttons}
+
+        self.table: dict[int, RfEvent | None] = {
+            IDLE: None,
+            SLEEP: RfEvent(RfEventType.SLEEP, remote=remote),
+            WAKE: RfEvent(RfEventType.WAKE, remote=remote),
+            REPEAT: _REPEAT,
+            RELEASE: _RELEASE,
+        }
+        for command in BUTTON_RELEASED:
+            self.table[command] = None
+        for command, button in known_commands.items():
+            self.table[command] = RfEvent(RfEventType.PRESS, button, remote)
+
+    @classmethod
+    def load(cls, path: str = "config/remote_keymap.json", remote: str = DEFAULT_REMOTE) -> "RfDecoder":
+        known_commands = {}
+        try:
+            with open(path, "r") as file:
+                keymap_json = json.loads(file.read())
+
+            for key, value in keymap_json.items():
+                known_commands[int(value["rf_command"], 16)] = key
+
+        except FileNotFoundError:
+            cls.logger.warning(f"\"{path}\" could not be opened. Listener will not respond to signals.")
+
+        return cls(known_commands, remote)
+
+    def decode(self, payload: bytes) -> RfEvent | None:
+        """
+        Returns the event for a payload, None if there is nothing to do.
+        """
+        if len(payload) < 5:
+            self.logger.warning(f"Received unexpectedly short payload: {payload.hex(':')}")
+            return None
+
+        command = int.from_bytes(payload[1:4], "big")
+        event = self.table.get(command, _UNKNOWN)
+
+        if event is None:
+            return None
+        if event is _REPEAT:
+            return self.repeat_events[self.last_key]
+        if event is _RELEASE:
+            return self.release_events[self.last_key]
+        if event is _UNKNOWN:
+            self.logger.warning(f"Unexpected payload, len: {len(payload)}, bytes: {payload.hex(':')}")
+            return None
+
+        if event.type is RfEventType.PRESS:
+            self.last_key = event.button
+        return event
@@ -0,0 +1,18 @@
+from Api.models.RfEventType import RfEventType
+from RfManager.RfRemote import DEFAULT_REMOTE
+
+
+class RfEvent:
+    """
+    Something a remote reported. Events are built once by RfDecoder and shared, so they must not be changed.
+    """
+
+    __slots__ = ("type", "button", "remote")
+
+    def __init__(self, type: RfEventType, button: str | None = None, remote: str = DEFAULT_REMOTE):
+        self.type = type
+        self.button = button
+        self.remote = remote
+
+    def __repr__(self):
+        return f"RfEvent({self.type.value}, {self.button}, {self.remote})"
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import threading
+import time
+from asyncio import AbstractEventLoop
+from collections import deque
+
+from Api.models.RfEventType import RfEventType
+from Metrics.LatencyStats import LatencyStats
+from RfManager.RfEvent import RfEvent
+
+# Events kept per subscriber before the oldest ones are dropped
+MAX_PENDING_EVENTS = 256
+
+
+class RfSubscription:
+    """
+    Async iterator over batches of RF events, all events that arrived since the last batch was taken.
+    """
+
+    def __init__(self, stream: "RfEventStream", size: int):
+        self.stream = stream
+        self.events: deque[RfEvent] = deque(maxlen=size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, events: [RfEvent]):
+        overflow = len(self.events) + len(events) - self.events.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+        self.events.extend(events)
+        self.ready.set()
+
+    def close(self):
+        self.stream.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> [RfEvent]:
+        while not self.events:
+            self.ready.clear()
+            await self.ready.wait()
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class RfEventStream:
+    """
+    Hands RF events from the listener thread to the event loop.
+
+    The listener only appends to a bounded buffer. The event loop is woken at most once per burst, and every
+    subscriber gets all events that piled up in the meantime as one batch.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(self, size: int = MAX_PENDING_EVENTS):
+        self.size = size
+        # Events, the time (perf_counter) their payload was read and arrived at, if known
+        self.pending: deque[tuple[RfEvent, float, float | None]] = deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.flush_scheduled = False
+
+        self.loop: AbstractEventLoop | None = None
+        self.subscriptions: list[RfSubscription] = []
+
+        # Time from a press payload arriving (only known from the IRQ) or being read to its event being handed to the
+        # subscribers
+        self.press_latency = LatencyStats()
+        self.dispatch_latency = LatencyStats()
+        self.events_published = 0
+
+    def subscribe(self, size: int = MAX_PENDING_EVENTS) -> RfSubscription:
+        """
+        Returns a new subscription, only events published after this call are received. Must be called on the
+        event loop.
+        """
+        self.loop = asyncio.get_running_loop()
+        subscription = RfSubscription(self, size)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: RfSubscription):
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    def publish(self, event: RfEvent, read: float, arrived: float | None = None):
+        """
+        Queues the event for the subscribers. Can be called from any thread.
+        """
+        if self.loop is None:
+            return
+
+        with self.lock:
+            self.pending.append((event, read, arrived))
+            self.events_published += 1
+            if self.flush_scheduled:
+                return
+            self.flush_scheduled = True
+
+        try:
+            self.loop.call_soon_threadsafe(self._flush)
+        except RuntimeError:
+            # The event loop was closed
+            self.flush_scheduled = False
+
+    def _flush(self):
+        with self.lock:
+            pending = list(self.pending)
+            self.pending.clear()
+            self.flush_scheduled = False
+
+        now = time.perf_counter()
+        events = []
+        for event, read, arrived in pending:
+            if event.type == RfEventType.PRESS:
+                self.dispatch_latency.add(now - read)
+                if arrived is not None:
+                    self.press_latency.add(now - arrived)
+            events.append(event)
+
+        for subscription in self.subscriptions:
+            subscription.put(events)
+
+        if len(events) > 1:
+            self.logger.debug(f"Handed {len(events)} RF events to the event loop at once")
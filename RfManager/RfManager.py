@@ -1,17 +1,43 @@
 import threading
 import time
-import json
 import logging
 
+import pigpio
+
+from Api.models.Metrics import RfMetrics
+from Api.models.RfEventType import RfEventType
+from Metrics.RateCounter import RateCounter
+from RfManager.RfCapture import RfCaptureWriter
+from RfManager.RfDecoder import RfDecoder
+from RfManager.RfEventStream import RfEventStream, RfSubscription
+from RfManager.RfRemote import RfRemote, assign_pipes
+
 # pyrf24 only has precompiled binaries for linux. If you install it via pip on another os, the import will fail,
 # even though the package seems to be installed. For development setups, this is not an issue, as RfManager is not used.
-# TODO: Find a better solution for this
-from sys import platform
-if platform == "linux":
+# Without it, RfManager can still be driven by a stand-in like RfReplay.
+try:
     from pyrf24 import RF24, RF24_2MBPS, RF24_CRC_16
+except ImportError:
+    RF24 = None
+    RF24_2MBPS = 1
+    RF24_CRC_16 = 2
 
 CSN_PIN = 0  # aka CE0 on SPI bus 0: /dev/spidev0.0
 CE_PIN = 1
+# GPIO the IRQ pin of the nRF24 is connected to, None if it isn't connected. Without it, the listener only polls.
+# Set with irq_pin in config/rf_listener.json.
+IRQ_PIN = None
+
+# Polling interval (in s) right after a payload arrived. It doubles with every empty poll, up to the idle interval.
+POLL_INTERVAL_ACTIVE = 0.001
+POLL_INTERVAL_IDLE = 0.05
+
+# Longest wait (in s) for the IRQ while every remote reported going to sleep. The IRQ still wakes the listener as soon
+# as a payload arrives, so this doesn't add any latency. Without the IRQ pin, a slower poll would delay the first press
+# after a remote woke up by up to the interval, so the listener keeps polling at the idle interval instead.
+POLL_INTERVAL_SLEEP = 1.0
+# Whether to use the sleep interval at all, set with low_power in config/rf_listener.json
+LOW_POWER = True
 
 # This is heavily based on the great work done here: https://github.com/joakimjalden/Harmoino/tree/main
 class RfManager:
@@ -19,9 +45,14 @@ class RfManager:
     logger = logging.getLogger(__package__)
     listener_thread = None
 
-    def __init__(self, callback=None, repeat_callback=None, release_callback=None):
+    def __init__(self, irq_pin: int | None = IRQ_PIN, rf=None, low_power: bool = LOW_POWER, pi=None):
 
-        self.rf = RF24(CE_PIN, CSN_PIN)
+        # Anything implementing the pyrf24.RF24 methods used here, like RfReplay
+        if rf is None:
+            if RF24 is None:
+                raise ImportError("pyrf24 is not available")
+            rf = RF24(CE_PIN, CSN_PIN)
+        self.rf = rf
 
         if not self.rf.begin():
             raise self.logger.warning("RF hardware is not responding. Listener will not respond to commands.")
@@ -31,23 +62,32 @@ class RfManager:
         self.rf.enableDynamicPayloads()
         self.rf.setCRCLength(RF24_CRC_16)
 
-        self.callback = callback
-        self.repeat_callback = repeat_callback
-        self.release_callback = release_callback
+        # Button events, consumed with subscribe()
+        self.events = RfEventStream()
 
-        try:
-            with open("config/remote_keymap.json", "r") as file:
-                keymap_data = file.read()
+        # Set by the IRQ pin, so the listener wakes up as soon as a payload arrives
+        self.irq_pin = irq_pin
+        self.irq = threading.Event()
+        self.irq_time = 0.0
+        # Anything implementing the pigpio.pi methods used for the IRQ pin, like RfReplay. A pigpio.pi if None.
+        self.gpio = pi
+        self.pi = None
+        self.irq_callback = None
 
-            keymap_json = json.loads(keymap_data)
+        self.payloads_received = 0
+        self.wakeups = 0
+        self.wakeup_rate = RateCounter()
 
-            self.known_commands = {}
+        # Names of the remotes listened to and of those that reported going to sleep
+        self.low_power = low_power
+        self.remote_names: set[str] = set()
+        self.sleeping: set[str] = set()
 
-            for key, value in keymap_json.items():
-                self.known_commands[int(value["rf_command"], 16)] = key
+        # Logs every payload received while set, see start_capture
+        self.capture: RfCaptureWriter | None = None
 
-        except FileNotFoundError:
-            self.logger.warning("\"config/remote_keymap.json\" could not be opened. Listener will not respond to signals.")
+        self.decoder = RfDecoder.load()
+        self.pipe_decoders: dict[int, RfDecoder] = {}
 
         #atexit.register(self.cleanup)
 
@@ -56,28 +96,117 @@ class RfManager:
     #    self.logger.info("Disconnecting from GPIO...")
 
 
-    def start_listener(self, addresses: [bytes], debug = False):
-        if len(addresses) == 0:
+    def start_listener(self, remotes: [RfRemote], debug = False):
+        pipes = assign_pipes(remotes)
+        if len(pipes) == 0:
             self.logger.warning("No RF addresses specified, skipping listener startup")
             return
 
+        # One decoder per remote, shared by its pipes
+        decoders = {remote.name: RfDecoder(self.decoder.known_commands, remote.name) for remote in remotes}
+        self.pipe_decoders = {pipe: decoders[remote.name] for pipe, _, remote in pipes}
+        self.remote_names = set(decoders)
+        self.sleeping = set()
+
         self.rf.powerUp()
-        self.listener_thread = threading.Thread(name='listener_thread', target=self._start_listening, args=(addresses, debug))
+        self._setup_irq()
+        self.listener_thread = threading.Thread(name='listener_thread', target=self._start_listening, args=(pipes, debug))
         self.listener_thread.start()
         self.logger.debug("Started rf listener")
 
     def stop_listener(self):
+        self.stop_capture()
         if self.listener_thread is not None:
             self.listener_thread.do_run = False
+            self.irq.set()
             self.rf.powerDown()
             self.logger.debug("Stopped rf listener")
-
-    def _start_listening(self, addresses, debug):
+        if self.irq_callback is not None:
+            self.irq_callback.cancel()
+            self.irq_callback = None
+        if self.pi is not None:
+            self.pi.stop()
+            self.pi = None
+
+    def start_capture(self, path: str):
+        """
+        Logs every payload received from now on to a capture file, which can be replayed with RfReplay.
+        """
+        self.stop_capture()
+        self.capture = RfCaptureWriter(path)
+        self.logger.info(f"Capturing RF payloads to {path}")
+
+    def stop_capture(self):
+        if self.capture is not None:
+            capture, self.capture = self.capture, None
+            capture.close()
+            self.logger.info(f"Captured {capture.count} RF payloads")
+
+    def subscribe(self) -> RfSubscription:
+        """
+        Async iterator over batches of button events. Has to be called on the event loop.
+        """
+        return self.events.subscribe()
+
+    def metrics(self) -> RfMetrics:
+        return RfMetrics(
+            press_latency=self.events.press_latency.summary(),
+            dispatch_latency=self.events.dispatch_latency.summary(),
+            payloads_received=self.payloads_received,
+            wakeups=self.wakeups,
+            wakeups_per_minute=self.wakeup_rate.rate(),
+            asleep=self.asleep,
+            irq=self.irq_callback is not None
+        )
+
+    @property
+    def asleep(self) -> bool:
+        """
+        Whether the listener is in its low power profile, because all remotes are sleeping. Only with the IRQ pin.
+        """
+        return (self.low_power and self.irq_callback is not None and bool(self.remote_names)
+                and self.remote_names <= self.sleeping)
+
+    def _setup_irq(self):
+        if self.irq_pin is None:
+            return
+        try:
+            self.pi = self.gpio if self.gpio is not None else pigpio.pi()
+            if not self.pi.connected:
+                raise ConnectionError("pigpio daemon is not running")
+            self.pi.set_mode(self.irq_pin, pigpio.INPUT)
+            self.pi.set_pull_up_down(self.irq_pin, pigpio.PUD_UP)
+            # Only raise the IRQ for received payloads
+            self.rf.maskIRQ(True, True, False)
+            self.irq_callback = self.pi.callback(self.irq_pin, pigpio.FALLING_EDGE, self._on_irq)
+            self.logger.debug(f"Waiting for RF IRQ on GPIO {self.irq_pin}")
+        except Exception as e:
+            self.logger.warning(f"Couldn't set up RF IRQ on GPIO {self.irq_pin}, polling instead: {e}")
+            self.pi = None
+
+    def _on_irq(self, _gpio, _level, _tick):
+        # Runs on the pigpio thread
+        self.irq_time = time.perf_counter()
+        self.irq.set()
+
+    def _wait(self, interval: float):
+        """
+        Sleeps until the IRQ fires or the polling interval has passed.
+        """
+        if self.irq_callback is not None:
+            self.irq.wait(interval)
+            self.irq.clear()
+        else:
+            time.sleep(interval)
+        self.wakeups += 1
+        self.wakeup_rate.add()
+
+    def _start_listening(self, pipes: list[tuple[int, bytes, RfRemote]], debug):
         self.logger.debug("Setting addresses")
 
         # Listen on the addresses specified as parameter
-        self.rf.openReadingPipe(1, addresses[0])
-        self.rf.openReadingPipe(2, addresses[1])
+        for pipe, address, _ in pipes:
+            self.rf.openReadingPipe(pipe, address)
         self.rf.startListening()
         self.logger.debug("Set addresses!")
 
@@ -85,83 +214,53 @@ class RfManager:
         try:
             self.logger.debug("Entering loop...")
             if debug:
-                self.logger.debug(f'Receiving from {addresses[0]}, {addresses[1]}')
+                for pipe, address, remote in pipes:
+                    self.logger.debug(f"Receiving from {address.hex()} ({remote.name}) on pipe {pipe}")
 
-            count = 0
-            last_key = None
+            interval = POLL_INTERVAL_ACTIVE
 
             while getattr(self.listener_thread, "do_run", True):
-                # As long as data is ready for processing, process it.
-                if self.rf.available():
+                # Arrival of the first payload, only known if the IRQ fired. The IRQ isn't raised again until the FIFO
+                # was drained, so the arrival of the payloads after it isn't known.
+                arrived = self.irq_time if self.irq_callback is not None and self.irq_time else None
+                self.irq_time = 0.0
+
+                # Drain the RX FIFO completely before waiting again
+                received = False
+                has_payload, pipe = self.rf.available_pipe()
+                while has_payload:
+                    received = True
                     # Read pipe and payload for message.
                     payload_size = self.rf.getDynamicPayloadSize()
                     payload = self.rf.read(payload_size)
-                    if len(payload) >= 5:
-                        command = 0
-                        for i in range(1, 4):
-                            command <<= 8
-                            command += payload[i]
-
-                        recognized_command = self.known_commands.get(command)
-
-                        if recognized_command:
-                            self.logger.debug(f"Button {recognized_command} pressed!")
-                            if self.callback is not None:
-                                self.callback(recognized_command)
-                            last_key = recognized_command
-
-                        elif command == 0x40044c:
-                            # Remote Idle
-                            pass
-
-                        elif command == 0x4f0300:
-                            # Remote Going to Sleep
-                            self.logger.debug("Remote going to sleep")
-
-                        elif command == 0x4f0700:
-                            # Remote Woke Up
-                            self.logger.debug("Remote woke up")
-
-                        elif command == 0x400028:
-                            # Repeat
-                            # print(f"Repeat of {last_key}")
-                            if self.repeat_callback is not None:
-                                self.repeat_callback(last_key)
-                            pass
-
-                        elif command == 0x4f0004:
-                            # All Buttons Released
-                            self.logger.debug(f"{last_key} released")
-                            if self.release_callback is not None:
-                                self.release_callback(last_key)
-
-                        elif command == 0xc10000 or command == 0xc30000:
-                            # Released Button
-                            # always followed by 0x4f0004, if released button was only pressed button
-                            # if multiple buttons are pressed at the same time, this could be used to
-                            # differentiate them (somewhat)
-                            pass
-
-                        else:
-                            self.logger.warning("Unexpected payload:")
-                            self.logger.warning(f"len: {len(payload)}, bytes: {':'.join(f'{i:02x}' for i in payload)}, count: {count}")
-
-                    else:
-                        self.logger.warning(f"Received unexpectedly short payload: {':'.join(f'{i:02x}' for i in payload)}")
-
-                # Sleep 50 ms.
-                time.sleep(0.05)
+                    self.payloads_received += 1
+                    read = time.perf_counter()
+                    if self.capture is not None:
+                        self.capture.write(read, pipe, payload)
+                    self._handle_payload(payload, pipe, read, arrived)
+                    arrived = None
+                    has_payload, pipe = self.rf.available_pipe()
+
+                # Poll tightly while payloads flow, back off while the remote is idle and even more while it sleeps
+                if received:
+                    interval = POLL_INTERVAL_ACTIVE
+                elif self.asleep:
+                    interval = POLL_INTERVAL_SLEEP
+                else:
+                    interval = min(interval * 2, POLL_INTERVAL_IDLE)
+                self._wait(interval)
 
             self.logger.debug("Exiting loop...")
         except Exception as e:
             self.logger.error(e)
             self.stop_listener()
 
-    def set_callback(self, _callback):
-        self.callback = _callback
-
-    def set_repeat_callback(self, _repeat_callback):
-        self.repeat_callback = _repeat_callback
-
-    def set_release_callback(self, _release_callback):
-        self.release_callback = _release_callback
\ No newline at end of file
+    def _handle_payload(self, payload: bytes, pipe: int, read: float, arrived: float | None = None):
+        event = self.pipe_decoders.get(pipe, self.decoder).decode(payload)
+        if event is not None:
+            self.logger.debug("RF event %s", event)
+            if event.type == RfEventType.SLEEP:
+                self.sleeping.add(event.remote)
+            else:
+                self.sleeping.discard(event.remote)
+            self.events.publish(event, read, arrived)
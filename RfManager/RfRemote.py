@@ -0,0 +1,64 @@
+import logging
+
+# Name of the remote configured by a plain list of addresses
+DEFAULT_REMOTE = "default"
+
+# Pipe 0 has an address of its own, pipes 2 to 5 share all but the first byte of their address with pipe 1
+MAX_SHARED_PIPES = 5
+
+
+class RfRemote:
+    """
+    A paired remote and the RF addresses it sends on, as reported by getRemoteAddress.py.
+    """
+
+    logger = logging.getLogger(__package__)
+
+    def __init__(self, name: str, addresses: [bytes]):
+        self.name = name
+        self.addresses = addresses
+
+    def __repr__(self):
+        return f"RfRemote({self.name}, {[address.hex() for address in self.addresses]})"
+
+    @classmethod
+    def from_config(cls, config: list | dict) -> ["RfRemote"]:
+        """
+        Parses rf_addresses.json, either a list of addresses of a single remote or a mapping of remote names to lists
+        of addresses, like {"living_room": ["08529258cb", "00529258cb"], "bedroom": ["0a1b2c3d4e", "001b2c3d4e"]}.
+        """
+        if isinstance(config, list):
+            config = {DEFAULT_REMOTE: config}
+        return [cls(name, [bytes.fromhex(address) for address in addresses]) for name, addresses in config.items()]
+
+
+def assign_pipes(remotes: [RfRemote]) -> list[tuple[int, bytes, RfRemote]]:
+    """
+    Distributes the addresses of the remotes over the six pipes of the nRF24, returning (pipe, address, remote).
+
+    Addresses are sent least significant byte first. Pipes 1 to 5 take the addresses sharing their upper four bytes
+    with the first address of the first remote, which usually covers both addresses of a remote. Pipe 0 takes the
+    first remaining address. Addresses that fit nowhere are skipped with a warning.
+    """
+    addresses = [(address, remote) for remote in remotes for address in remote.addresses]
+    if not addresses:
+        return []
+
+    shared = addresses[0][0][1:]
+    pipes = []
+    leftover = []
+    for address, remote in addresses:
+        if address[1:] == shared and len(pipes) < MAX_SHARED_PIPES:
+            pipes.append((len(pipes) + 1, address, remote))
+        else:
+            leftover.append((address, remote))
+
+    if leftover:
+        address, remote = leftover.pop(0)
+        pipes.append((0, address, remote))
+
+    for address, remote in leftover:
+        RfRemote.logger.warning(f"No RF pipe left for address {address.hex()} of remote {remote.name}, it will be ignored. "
+                       f"Only one address can differ in more than its first byte from the others.")
+
+    return pipes
@@ -0,0 +1,137 @@
+import threading
+import time
+
+from RfManager.RfCapture import read_capture
+
+
+class RfReplayIrq:
+    """
+    Calls func like a pigpio callback on the IRQ pin whenever a payload of replay becomes available.
+    """
+
+    def __init__(self, replay: "RfReplay", gpio: int, func):
+        self.replay = replay
+        self.gpio = gpio
+        self.func = func
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(name="replay_irq", target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.replay.started is None:
+            if self.cancelled.wait(0.001):
+                return
+        for index in range(len(self.replay.records)):
+            delay = self.replay.arrival(index) - time.perf_counter()
+            if self.cancelled.wait(max(0.0, delay)):
+                return
+            self.func(self.gpio, 0, 0)
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class RfReplay:
+    """
+    Stand-in for pyrf24.RF24 that delivers recorded payloads instead of receiving them.
+
+    Payloads become available at their recorded time once listening started, divided by speed. Without a speed,
+    they are all available right away. Used by RfManager.benchmark to drive RfManager without a radio.
+
+    It also stands in for the pigpio.pi the IRQ pin is read with, raising the IRQ whenever a payload becomes available.
+    """
+
+    # pigpio.pi
+    connected = True
+
+    def __init__(self, records: [tuple[float, int, bytes]], speed: float | None = 1.0):
+        self.records = records
+        self.speed = speed
+        self.position = 0
+        self.started: float | None = None
+        # Time (perf_counter) the last payload was read
+        self.finished: float | None = None
+        self.pipes: dict[int, bytes] = {}
+
+    @classmethod
+    def from_file(cls, path: str, speed: float | None = 1.0) -> "RfReplay":
+        return cls(read_capture(path), speed)
+
+    @classmethod
+    def synthetic(cls, payloads: [bytes], rate: float, pipe: int = 1) -> "RfReplay":
+        """
+        Replays the payloads evenly spaced at rate payloads per second.
+        """
+        return cls([(index / rate, pipe, payload) for index, payload in enumerate(payloads)])
+
+    def arrival(self, index: int) -> float:
+        """
+        Time (perf_counter) the payload at index becomes available.
+        """
+        if self.speed is None:
+            return self.started
+        return self.started + self.records[index][0] / self.speed
+
+    @property
+    def done(self) -> bool:
+        return self.position >= len(self.records)
+
+    def begin(self) -> bool:
+        return True
+
+    def setChannel(self, channel: int):
+        pass
+
+    def setDataRate(self, rate: int):
+        pass
+
+    def enableDynamicPayloads(self):
+        pass
+
+    def setCRCLength(self, length: int):
+        pass
+
+    def maskIRQ(self, tx_ok: bool, tx_fail: bool, rx_ready: bool):
+        pass
+
+    def powerUp(self):
+        pass
+
+    def powerDown(self):
+        pass
+
+    def openReadingPipe(self, pipe: int, address: bytes):
+        self.pipes[pipe] = address
+
+    def startListening(self):
+        self.started = time.perf_counter()
+
+    def available_pipe(self) -> tuple[bool, int]:
+        if self.started is None or self.done or time.perf_counter() < self.arrival(self.position):
+            return False, 0
+        return True, self.records[self.position][1]
+
+    def available(self) -> bool:
+        return self.available_pipe()[0]
+
+    def getDynamicPayloadSize(self) -> int:
+        return len(self.records[self.position][2])
+
+    def read(self, length: int) -> bytes:
+        payload = self.records[self.position][2][:length]
+        self.position += 1
+        if self.done:
+            self.finished = time.perf_counter()
+        return payload
+
+    def set_mode(self, gpio: int, mode: int):
+        pass
+
+    def set_pull_up_down(self, gpio: int, pud: int):
+        pass
+
+    def callback(self, gpio: int, edge: int, func) -> RfReplayIrq:
+        return RfReplayIrq(self, gpio, func)
+
+    def stop(self):
+        pass
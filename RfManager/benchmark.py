@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import bisect
+import logging
+import random
+import time
+import timeit
+from pathlib import Path
+
+from Api.models.Command import Command
+from Api.models.CommandGroupType import CommandGroupType
+from Api.models.CommandType import CommandType
+from Api.models.RemoteButton import RemoteButton
+from Api.models.RfEventType import RfEventType
+from Api.models.TaskLane import TaskLane
+from Metrics.LatencyStats import LatencyStats
+from RemoteController.AsyncQueueManager import AsyncQueueManager
+from RemoteController.CommandExecutor import CommandExecutor
+from RemoteController.EventShaper import EventShaper
+from RemoteController.RemoteContext import RemoteContext
+from RemoteController.RemoteController import RemoteController
+from RemoteController.RepositoryCache import RepositoryCache
+from RfManager.RfCapture import read_capture
+from RfManager.RfDecoder import RfDecoder, IDLE, REPEAT, RELEASE, BUTTON_RELEASED, SLEEP, WAKE
+from RfManager.RfManager import RfManager
+from RfManager.RfRemote import RfRemote
+from RfManager.RfReplay import RfReplay
+
+# Run with `python -m RfManager.benchmark` from the repository root.
+
+# GPIO RfReplay raises the IRQ on, when replaying with an IRQ
+REPLAY_IRQ_PIN = 25
+
+
+def payload(command: int, length: int = 5) -> bytes:
+    return bytes([0x00]) + command.to_bytes(3, "big") + bytes(length - 4)
+
+
+def synthetic_stream(known_commands: dict[int, str], presses: int, rng: random.Random) -> [bytes]:
+    """
+    Payloads as sent by a remote in use: idle packets, presses followed by repeats and releases, sleep and wake.
+    """
+    commands = list(known_commands) or [0xc3ec01]
+    stream = [payload(WAKE)]
+    for _ in range(presses):
+        stream += [payload(IDLE)] * rng.randrange(0, 4)
+        stream.append(payload(rng.choice(commands), 10))
+        stream += [payload(REPEAT)] * rng.randrange(0, 8)
+        stream += [payload(rng.choice(BUTTON_RELEASED)), payload(RELEASE)]
+    stream.append(payload(SLEEP))
+    return stream
+
+
+def timed_stream(known_commands: dict[int, str], presses: int, rate: float,
+                 rng: random.Random) -> list[tuple[float, int, bytes]]:
+    """
+    A synthetic capture with rate button presses per second, each spread evenly over its interval.
+    """
+    records = []
+    for index in range(presses):
+        payloads = synthetic_stream(known_commands, 1, rng)[1:-1]
+        for position, data in enumerate(payloads):
+            records.append(((index + position / len(payloads)) / rate, 1, data))
+    return records
+
+
+def sleep_cycle_stream(known_commands: dict[int, str], cycles: int, rng: random.Random,
+                       asleep: float = 8.0, wake_packet: bool = True) -> list[tuple[float, int, bytes]]:
+    """
+    A remote being picked up, used for a few presses, put down and left asleep, cycles times. Without wake_packet,
+    the remote's wake packet is missed and the first press arrives while the listener still sleeps.
+    """
+    records = []
+    start = 0.0
+    for _ in range(cycles):
+        if wake_packet:
+            records.append((start, 1, payload(WAKE)))
+        # The first press comes a while after the remote was picked up
+        for offset, pipe, data in timed_stream(known_commands, 4, 4, rng):
+            records.append((start + 0.5 + offset, pipe, data))
+        records.append((start + 1.75, 1, payload(SLEEP)))
+        start += 1.75 + asleep
+    # So the last sleep counts as well
+    records.append((start, 1, payload(IDLE)))
+    return records
+
+
+def first_presses(known_commands: dict[int, str], records: list[tuple[float, int, bytes]]) -> set[int]:
+    """
+    Positions of the first press payloads after the remote went to sleep, and of the very first one.
+    """
+    decoder = RfDecoder(known_commands)
+    first = set()
+    slept = True
+    for index, (_, _, data) in enumerate(records):
+        event = decoder.decode(data)
+        if event is None:
+            continue
+        if event.type == RfEventType.SLEEP:
+            slept = True
+        elif event.type == RfEventType.PRESS and slept:
+            first.add(index)
+            slept = False
+    return first
+
+
+def latency_stats(latencies) -> LatencyStats:
+    stats = LatencyStats(size=len(latencies) or 1)
+    for seconds in latencies:
+        stats.add(seconds)
+    return stats
+
+
+def legacy_decode(known_commands: dict[int, str]):
+    """
+    The byte shifting and elif chain RfManager._start_listening used before RfDecoder, without the logging.
+    """
+    last_key = None
+
+    def decode(payload):
+        nonlocal last_key
+        if len(payload) >= 5:
+            command = 0
+            for i in range(1, 4):
+                command <<= 8
+                command += payload[i]
+
+            recognized_command = known_commands.get(command)
+
+            if recognized_command:
+                last_key = recognized_command
+                return ("press", recognized_command)
+            elif command == 0x40044c:
+                pass
+            elif command == 0x4f0300:
+                return ("sleep", None)
+            elif command == 0x4f0700:
+                return ("wake", None)
+            elif command == 0x400028:
+                return ("repeat", last_key)
+            elif command == 0x4f0004:
+                return ("release", last_key)
+            elif command == 0xc10000 or command == 0xc30000:
+                pass
+            else:
+                return f"len: {len(payload)}, bytes: {':'.join(f'{i:02x}' for i in payload)}"
+        return None
+
+    return decode
+
+
+def bench(name: str, func, stream: [bytes], number: int) -> float:
+    seconds = min(timeit.repeat(lambda: [func(payload) for payload in stream], number=number, repeat=5)) / number
+    print(f"  {name:<32} {len(stream) / seconds / 1000:10.1f} k payloads/s")
+    return seconds
+
+
+def bench_decoder(known_commands: dict[int, str], streams: dict[str, list[bytes]], number: int):
+    print("Payload decoding")
+    for name, stream in streams.items():
+        print(f"{name} ({len(stream)} payloads)")
+        legacy = bench("shifting, elif chain", legacy_decode(known_commands), stream, number)
+        decoder = RfDecoder(known_commands)
+        current = bench("lookup table", decoder.decode, stream, number)
+        print(f"  speedup: {legacy / current:.1f}x")
+
+
+def replay_controller(known_commands: dict[int, str], remote: str) -> tuple[RemoteController, list[tuple[float, str]]]:
+    """
+    A controller with every button of remote bound to a network command, which is recorded instead of being sent.
+    Returns it and the list (time, button) of every command send that started.
+    """
+    controller = RemoteController()
+    controller.logger = logging.getLogger(RemoteController.__module__)
+    controller.is_dev = True
+    controller.event_shaper = EventShaper()
+    controller.queue = AsyncQueueManager()
+    controller.pending_tasks = set()
+    controller.executor = CommandExecutor()
+    controller.repository = RepositoryCache()
+
+    context = RemoteContext(remote)
+    context.keymap_name = "benchmark"
+    context.keymap = {}
+    for command_id, button in enumerate(sorted(set(known_commands.values())), start=1):
+        context.keymap[button] = command_id
+        controller.repository.commands[command_id] = Command(
+            id=command_id,
+            name=button,
+            button=RemoteButton.OTHER,
+            type=CommandType.NETWORK,
+            command_group=CommandGroupType.OTHER
+        )
+    controller.remotes = {remote: context}
+
+    sent: list[tuple[float, str]] = []
+
+    async def send_on_channel(command: Command, press_without_release=False):
+        sent.append((time.perf_counter(), command.name))
+
+    async def release_all():
+        pass
+
+    async def stop_current_scene(skip_power_down_for=None, remote=None):
+        pass
+
+    # There are no transports and no scenes, everything up to them runs like on the remote
+    controller._send_on_channel = send_on_channel
+    controller._release_all = release_all
+    controller.stop_current_scene = stop_current_scene
+    return controller, sent
+
+
+async def replay_latency(known_commands: dict[int, str], records: list[tuple[float, int, bytes]],
+                         speed: float | None = 1.0, low_power: bool = True,
+                         irq: bool = False) -> tuple[dict[int, float], float, int]:
+    """
+    Replays the records through RfManager into a RemoteController, and measures the time from each press payload
+    becoming available to the send of its command starting, by position of the press. That includes the listener,
+    the event shaper, the task queue and the command executor. Also returns the time the listener took to read all
+    payloads and how often it woke up meanwhile. With irq, the replay raises the IRQ instead of only being polled.
+    """
+    replay = RfReplay(records, speed)
+    if irq:
+        manager = RfManager(irq_pin=REPLAY_IRQ_PIN, rf=replay, low_power=low_power, pi=replay)
+    else:
+        manager = RfManager(irq_pin=None, rf=replay, low_power=low_power)
+    manager.decoder = RfDecoder(known_commands)
+    remote = RfRemote("replay", [bytes(5)])
+    controller, sent = replay_controller(known_commands, remote.name)
+
+    # Positions of the press payloads of every button, decoded once up front
+    decoder = RfDecoder(known_commands)
+    presses: dict[str, list[int]] = {}
+    for index, (_, _, data) in enumerate(records):
+        event = decoder.decode(data)
+        if event is not None and event.type == RfEventType.PRESS:
+            presses.setdefault(event.button, []).append(index)
+
+    handler = asyncio.create_task(controller.handle_rf_events(manager.subscribe()))
+    manager.start_listener([remote])
+    try:
+        while not replay.done:
+            await asyncio.sleep(0.001)
+        # Until the last events went through the queue
+        interactive = controller.queue.lanes[TaskLane.INTERACTIVE]
+        await asyncio.sleep(0.1)
+        while interactive.depth or interactive.running:
+            await asyncio.sleep(0.001)
+    finally:
+        manager.stop_listener()
+        handler.cancel()
+        controller.repository.close()
+
+    # Presses dropped by the event shaper don't send anything, every send belongs to the latest press of its button
+    latencies = {}
+    for time_sent, button in sent:
+        indices = presses.get(button, [])
+        arrivals = [replay.arrival(index) for index in indices]
+        latest = bisect.bisect_right(arrivals, time_sent) - 1
+        if latest >= 0:
+            latencies[indices[latest]] = time_sent - arrivals[latest]
+    return latencies, replay.finished - replay.started, manager.wakeups
+
+
+async def bench_latency(known_commands: dict[int, str], presses: int, captures: dict[str, list]):
+    print("Press to command latency (replayed through RfManager and RemoteController, polling)")
+    rng = random.Random(0)
+    scenarios = {
+        "realistic (4 presses/s)": timed_stream(known_commands, min(presses, 40), 4, rng),
+        "stress (500 presses/s)": timed_stream(known_commands, presses, 500, rng),
+    }
+    scenarios.update(captures)
+    for name, records in scenarios.items():
+        latencies, elapsed, _ = await replay_latency(known_commands, records)
+        summary = latency_stats(latencies.values()).summary()
+        print(f"  {name:<32} p50 {summary.p50_ms:7.3f} ms, p95 {summary.p95_ms:7.3f} ms, "
+              f"max {summary.max_ms:7.3f} ms, {summary.count} commands sent in {elapsed:.2f} s")
+
+    records = timed_stream(known_commands, presses, 1, rng)
+    latencies, elapsed, _ = await replay_latency(known_commands, records, speed=None)
+    print(f"  {'burst, all queued at once':<32} {len(records) / elapsed / 1000:7.1f} k payloads/s, "
+          f"{len(latencies)} commands sent for {presses} presses")
+
+
+async def bench_power(known_commands: dict[int, str], cycles: int):
+    print("Power profiles (remote picked up, used and left asleep for 8 s, its wake packet missed)")
+    records = sleep_cycle_stream(known_commands, cycles, random.Random(0), wake_packet=False)
+    first = first_presses(known_commands, records)
+    scenarios = {
+        "polling": (False, True),
+        "IRQ, always listening": (True, False),
+        "IRQ, low power": (True, True),
+    }
+    for name, (irq, low_power) in scenarios.items():
+        latencies, elapsed, wakeups = await replay_latency(known_commands, records, low_power=low_power, irq=irq)
+        summary = latency_stats(latencies.values()).summary()
+        first_summary = latency_stats([latencies[index] for index in first if index in latencies]).summary()
+        print(f"  {name:<32} {wakeups / elapsed * 60:7.0f} wakeups/min, mean press latency {summary.mean_ms:.3f} ms, "
+              f"p95 {summary.p95_ms:.3f} ms, first press after sleep max {first_summary.max_ms:.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("RfManager.benchmark")
+    parser.add_argument("--keymap", default="./config/remote_keymap.json", help="Remote keymap to decode with.")
+    parser.add_argument("-n", "--number", default=20, type=int, help="Iterations per measurement.")
+    parser.add_argument("-p", "--presses", default=1000, type=int, help="Button presses per replayed stream.")
+    parser.add_argument("--cycles", default=2, type=int, help="Sleep and wake cycles for the power profiles.")
+    parser.add_argument("--capture", action="append", default=[],
+                        help="Capture file (from RfManager.capture) to decode and replay, can be repeated.")
+    args = parser.parse_args()
+
+    # Unknown payloads are logged as warnings
+    logging.disable(logging.WARNING)
+
+    keymap_path = args.keymap if Path(args.keymap).exists() else "./Extras/Config Examples/remote_keymap.json"
+    commands = RfDecoder.load(keymap_path).known_commands
+
+    benchmark_rng = random.Random(0)
+    benchmark_streams = {
+        "synthetic": synthetic_stream(commands, 1000, benchmark_rng),
+        # Interference or another remote on the same address
+        "unknown payloads": [bytes(benchmark_rng.randrange(256) for _ in range(10)) for _ in range(5000)],
+    }
+    benchmark_captures = {Path(path).name: read_capture(path) for path in args.capture}
+    for capture_name, capture in benchmark_captures.items():
+        benchmark_streams[capture_name] = [data for _, _, data in capture]
+
+    bench_decoder(commands, benchmark_streams, args.number)
+    asyncio.run(bench_latency(commands, args.presses, benchmark_captures))
+    asyncio.run(bench_power(commands, args.cycles))
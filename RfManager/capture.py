@@ -0,0 +1,29 @@
+import argparse
+import json
+import logging
+import time
+
+from RfManager.RfManager import RfManager
+from RfManager.RfRemote import RfRemote
+
+# Run with `python -m RfManager.capture <file>` from the repository root, while Equilibrium is stopped.
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("RfManager.capture")
+    parser.add_argument("output", help="Capture file to write.")
+    parser.add_argument("-s", "--seconds", default=60, type=float, help="How long to capture for.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    with open("config/rf_addresses.json", "r") as file:
+        remotes = RfRemote.from_config(json.loads(file.read()))
+
+    manager = RfManager()
+    manager.start_capture(args.output)
+    manager.start_listener(remotes)
+    print(f"Capturing for {args.seconds:.0f} s, press some buttons on the remote.")
+    try:
+        time.sleep(args.seconds)
+    finally:
+        manager.stop_listener()
@@ -0,0 +1,84 @@
+"""Decoded recorded IR codes into ir_protocol, ir_address and ir_command
+
+Revision ID: f2a9d7c4b8e1
+Revises: e7b3c5a1f9d4
+Create Date: 2026-10-18 19:02:47.183204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+from IrManager.IrCompiler import compile_code, FREQ
+from IrManager.IrProtocols import compile_protocol, decode
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a9d7c4b8e1'
+down_revision: Union[str, Sequence[str], None] = 'e7b3c5a1f9d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def command_table() -> sa.Table:
+    return sa.table(
+        'command',
+        sa.column('id', sa.Integer),
+        sa.column('ir_action', sa.JSON),
+        sa.column('ir_protocol', sa.String),
+        sa.column('ir_address', sa.Integer),
+        sa.column('ir_command', sa.Integer),
+        sa.column('ir_compiled', sa.LargeBinary)
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Commands recorded before codes were decoded only have their raw timings. The timings are kept, so this can be
+    # undone, but the decoded code is what gets sent from now on.
+    command = command_table()
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(command.c.id, command.c.ir_action)
+        .where(command.c.ir_action.is_not(None), command.c.ir_protocol.is_(None))
+    )
+    for command_id, ir_action in rows.all():
+        if not ir_action:
+            continue
+        decoded = decode(ir_action)
+        if decoded is None:
+            continue
+        protocol, address, ir_command = decoded
+        connection.execute(command.update().where(command.c.id == command_id).values(
+            # Enums are stored by name
+            ir_protocol=protocol.name,
+            ir_address=address,
+            ir_command=ir_command,
+            ir_compiled=compile_protocol(protocol, address, ir_command).to_bytes()
+        ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Commands that still have their raw timings go back to them, those recorded after decoding was added don't
+    command = command_table()
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(command.c.id, command.c.ir_action)
+        .where(command.c.ir_action.is_not(None), command.c.ir_protocol.is_not(None))
+    )
+    for command_id, ir_action in rows.all():
+        if not ir_action:
+            continue
+        try:
+            compiled = compile_code(ir_action, FREQ).to_bytes()
+        except ValueError:
+            compiled = None
+        connection.execute(command.update().where(command.c.id == command_id).values(
+            ir_protocol=None,
+            ir_address=None,
+            ir_command=None,
+            ir_compiled=compiled
+        ))